@@ -156,15 +156,10 @@ export default function Assistant() {
     e.preventDefault();
     if (!question && !file) return;
     setLoading(true);
-    // 取最近5轮上下文
-    const context = history.slice(-10).map(msg => ({
-      role: msg.role === "user" ? "user" : "assistant",
-      content: msg.text
-    }));
+    // 上下文由服务端根据session_id重建，无需上传历史对话
     const formData = new FormData();
     formData.append("question", question);
     formData.append("mode", mode);
-    formData.append("context", JSON.stringify(context));
     if (sessionId) {
       formData.append("session_id", sessionId);
     }
@@ -174,20 +169,48 @@ export default function Assistant() {
     setFile(null);
     fileInput.current.value = "";
     try {
-      const res = await fetch(`${API_BASE_URL}/ask`, {
+      // 流式接口：边接收边渲染，首字延迟即上游首包延迟
+      const res = await fetch(`${API_BASE_URL}/ask/stream`, {
         method: "POST",
         headers: {
           Authorization: `Bearer ${token}`
         },
         body: formData,
       });
-      const data = await res.json();
-      if (res.ok) {
-        setHistory((h) => [...h, { role: "ai", text: data.answer, mode }]);
-        setSessionId(data.session_id); // 保存会话ID
-        setHistoryKey(k => k + 1); // 触发历史刷新
-      } else {
+      if (!res.ok) {
+        const data = await res.json();
         setHistory((h) => [...h, { role: "ai", text: data.msg || "AI接口错误", mode }]);
+      } else {
+        setHistory((h) => [...h, { role: "ai", text: "", mode }]);
+        const appendText = (delta) => setHistory((h) => {
+          const last = h[h.length - 1];
+          return [...h.slice(0, -1), { ...last, text: last.text + delta }];
+        });
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        for (;;) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+          // SSE事件以空行分隔
+          const events = buffer.split("\n\n");
+          buffer = events.pop();
+          for (const evt of events) {
+            const event = (evt.match(/^event: (.*)$/m) || [])[1];
+            const dataLine = (evt.match(/^data: (.*)$/m) || [])[1];
+            if (!dataLine) continue;
+            const data = JSON.parse(dataLine);
+            if (event === "done") {
+              setSessionId(data.session_id); // 保存会话ID
+              setHistoryKey(k => k + 1); // 触发历史刷新
+            } else if (event === "error") {
+              appendText(`\n\n${data.msg || "AI接口错误"}`);
+            } else if (data.delta) {
+              appendText(data.delta);
+            }
+          }
+        }
       }
     } catch (err) {
       setHistory((h) => [...h, { role: "ai", text: "网络错误", mode }]);
@@ -246,10 +246,21 @@ export default function Predict() {
     }));
   };
 
+  // 预览地址：图片直接返回原始字节（thumb为true时返回缓存的缩略图），浏览器可按ETag缓存
+  const previewUrl = (month, filename, thumb) =>
+    `/api/preview?month=${encodeURIComponent(month)}&filename=${encodeURIComponent(filename)}${thumb ? '&thumb=1' : ''}`;
+
   // 预览文件
   const handlePreview = async (month, filename, type) => {
     if (month.startsWith('VIRTUAL-')) return; // 虚拟节点不预览
-    const res = await axios.get(`/api/preview?month=${encodeURIComponent(month)}&filename=${encodeURIComponent(filename)}`);
+    if (type && type.startsWith('image')) {
+      // 图片由<img>直接加载，不再经JSON/base64中转
+      setPreviewData(previewUrl(month, filename));
+      setPreviewType(type);
+      setPreviewOpen(true);
+      return;
+    }
+    const res = await axios.get(previewUrl(month, filename));
     setPreviewData(res.data);
     setPreviewType(type);
     setPreviewOpen(true);
@@ -313,14 +324,22 @@ export default function Predict() {
       });
       formData.append('months', JSON.stringify(uploadedMonths));
       formData.append('baseMonth', baseMonth);
+      formData.append('async', '1');
       const token = localStorage.getItem('token');
-      const res = await axios.post('/api/ai_analyze', formData, {
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
-      });
-      console.log('AI接口返回：', res.data);
-      setAiResult(res.data);
+      const headers = { 'Authorization': `Bearer ${token}` };
+      // 提交后台分析任务，再轮询任务状态，避免长请求被代理超时断开
+      const submitRes = await axios.post('/api/ai_analyze', formData, { headers });
+      const jobId = submitRes.data.job_id;
+      let job = submitRes.data;
+      while (job.status !== 'done' && job.status !== 'failed') {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        job = (await axios.get(`/api/ai_analyze/${jobId}`, { headers })).data;
+      }
+      if (job.status === 'failed') {
+        throw { response: { data: { error: job.error } } };
+      }
+      console.log('AI接口返回：', job.result);
+      setAiResult(job.result);
     } catch (e) {
       console.log('后端返回错误：', e?.response?.data);
       setAiError(e?.response?.data?.error || 'AI分析失败');
@@ -622,6 +641,15 @@ export default function Predict() {
                               marginRight: 6,
                               flexShrink: 0
                             }} />
+                            {file.type && file.type.startsWith('image') && (
+                              <img
+                                src={previewUrl(m, file.name, true)}
+                                alt=""
+                                style={{ width: 24, height: 24, objectFit: 'cover', borderRadius: 2, marginRight: 6, cursor: 'pointer' }}
+                                onClick={() => handlePreview(m, file.name, file.type)}
+                                onError={e => { e.currentTarget.style.display = 'none'; }}
+                              />
+                            )}
                             <span style={{ cursor: 'pointer', textDecoration: 'underline' }} onClick={() => handlePreview(m, file.name, file.type)}>{file.name}</span>
                             <span style={{ marginLeft: 6, color: '#aaa', fontSize: 11 }}>{(file.size/1024).toFixed(1)}KB</span>
                             <span style={{ marginLeft: 8, color: '#faad14', cursor: 'pointer', fontWeight: 700 }} onClick={() => handleDelete(m, file.name)}>删除</span>
@@ -637,7 +665,7 @@ export default function Predict() {
                           {previewData && previewData.error && (
                             <div style={{ color: 'red' }}>{previewData.error}</div>
                           )}
-                          {previewType && previewType.startsWith('image') && typeof previewData === 'string' && previewData.startsWith('data:image') && (
+                          {previewType && previewType.startsWith('image') && typeof previewData === 'string' && (
                             <img src={previewData} alt="预览" style={{ maxWidth: 500, maxHeight: 400 }} />
                           )}
                           {previewType && Array.isArray(previewData) && previewData.length > 0 && (
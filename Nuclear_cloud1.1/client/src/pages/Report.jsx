@@ -524,6 +524,9 @@ export default function Report() {
                 <div key={sheet.name}>
                   <div style={{ cursor: 'pointer', background: '#f6f8fa', padding: 10, borderRadius: '6px', fontWeight: 500 }} onClick={() => toggleSheet(sheet.name)}>
                     {openSheet[sheet.name] ? '▼' : '▶'} {sheet.name}
+                    {sheet.total_rows > sheet.data.length && (
+                      <span style={{ marginLeft: 8, color: '#888', fontSize: 12, fontWeight: 400 }}>（约{sheet.total_rows}行，仅预览前{sheet.data.length}行）</span>
+                    )}
                     <button onClick={() => handleDeleteSheet(sheet.name)} style={{ marginLeft: 12, color: '#d00', background: 'none', border: 'none', cursor: 'pointer', fontSize: 13 }}>删除</button>
                   </div>
                   {openSheet[sheet.name] && (
@@ -0,0 +1,101 @@
+from functools import lru_cache
+
+from config import ACCOUNT_SYNONYMS, HEADER_ROLE_SYNONYMS
+
+# 每个匹配器缓存的不同名称数：同一科目名在明细账里大量重复出现
+MATCH_CACHE_SIZE = 65536
+
+
+def _normalize(text):
+    """名称转为字符串并去掉所有空白"""
+    if not isinstance(text, str):
+        text = '' if text is None else str(text)
+    return ''.join(text.split())
+
+
+class AhoCorasick:
+    """多模式串匹配自动机：对文本扫描一遍即可找出所有出现的模式串"""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(index)
+        # 按BFS顺序计算失败指针，并把失败指针上的输出合并到当前状态
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        # 把失败指针展开成完整的转移表（只含模式串中出现过的字符），扫描时每个字符只查一次表
+        # BFS顺序保证失败指针指向的（更浅的）状态已经展开
+        self._delta = [None] * len(self._goto)
+        self._delta[0] = dict(self._goto[0])
+        for state in queue:
+            self._delta[state] = {**self._delta[self._fail[state]], **self._goto[state]}
+
+    def find(self, text):
+        """返回文本中出现的模式串序号列表（按出现位置，同一模式串出现多次会重复）"""
+        delta, out = self._delta, self._out
+        state = 0
+        found = []
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                found.extend(out[state])
+        return found
+
+
+class TermMatcher:
+    """把名称（表头、科目名）归并到标准名：同义词表编译为一个自动机，一次扫描找出全部同义词
+
+    match返回最长同义词对应的标准名（长度相同时取同义词表中靠前的标准名），没有匹配返回None；
+    matches返回名称中出现的全部标准名；exact只在整个名称就是某个同义词时返回其标准名。名称中的空白会被忽略。
+    """
+
+    def __init__(self, synonyms):
+        self.names = list(synonyms)
+        terms = {}
+        for rank, (name, words) in enumerate(synonyms.items()):
+            for word in words:
+                # 同一个词出现在多个标准名下时归前面的标准名
+                terms.setdefault(_normalize(word), (rank, name))
+        self._exact = {word: name for word, (_, name) in terms.items()}
+        words = list(terms)
+        self._names = [terms[word][1] for word in words]
+        # 排序键：同义词越长越优先，其次标准名越靠前越优先
+        self._keys = [(-len(word), terms[word][0]) for word in words]
+        self._automaton = AhoCorasick(words)
+        self.match = lru_cache(maxsize=MATCH_CACHE_SIZE)(self._match)
+
+    def _match(self, text):
+        found = self._automaton.find(_normalize(text))
+        if not found:
+            return None
+        return self._names[min(found, key=self._keys.__getitem__)]
+
+    def exact(self, text):
+        return self._exact.get(_normalize(text))
+
+    def matches(self, text):
+        return {self._names[i] for i in self._automaton.find(_normalize(text))}
+
+
+header_roles = TermMatcher(HEADER_ROLE_SYNONYMS)
+accounts = TermMatcher(ACCOUNT_SYNONYMS)
@@ -1,27 +1,40 @@
 import os
-import time
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 import sqlite3
 from werkzeug.security import generate_password_hash, check_password_hash
-from config import DEEPSEEK_API_TOKEN, DATABASE_PATH, UPLOAD_FOLDER as CONFIG_UPLOAD_FOLDER
+from config import DATABASE_PATH, UPLOAD_FOLDER as CONFIG_UPLOAD_FOLDER
 UPLOAD_FOLDER = str(CONFIG_UPLOAD_FOLDER) if CONFIG_UPLOAD_FOLDER else 'uploads'
 from config import SECRET_KEY, JWT_SECRET_KEY
+from config import ANALYZE_WORKERS, ANALYZE_MAX_PENDING, JOB_STALE_SECONDS
+from config import FINANCE_MAP_REDUCE_MIN_MONTHS, FINANCE_MAP_REDUCE_MAX_CHARS, FINANCE_MAP_WORKERS
+from config import CONTEXT_TOKEN_BUDGET, CONTEXT_SUMMARY_MAX_CHARS
+from config import PDF_MAX_CHARS, THUMBNAIL_SIZE
 import pandas as pd
-import docx
 import PyPDF2
-import pdfplumber
-import pytesseract
-from PIL import Image
-import requests
+from llm_client import llm, LLMError
+from upstream_limiter import UpstreamBusy
+from jobs import JobQueue, QueueFull
+from json_stream import StreamingJSONParser, parse_model_json
+from file_parsers import read_table, columnar_table, columnar_tables, ingest_table, extract_text, parse_cache, ocr_stats
+from file_parsers import pdf_pages, iter_pdf_text
+from upload_store import UploadStore
+from fact_store import FactStore, PIVOT_COLUMNS
+from statement_tables import statement_header_row, extract_amount_rows, to_records
+from statement_normalizer import normalize_sheet, merge_metrics, metric_table_text, table_text, statement_company
+from account_taxonomy import header_roles, accounts
+from ratios import RATIOS, RATIO_NAMES, metric_cube, compute_ratios, to_lists
+from forecast import finance_series, series_table_text, predict_months as forecast_months
+from table_preview import preview_table
+from thumbnails import thumbnail_path
 from datetime import datetime
 import json
 import numpy as np
 import re
-import base64
 import traceback
-import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 app = Flask(__name__)
 # 增强CORS配置，允许Authorization头
 CORS(app, supports_credentials=True, resources={r"/api/*": {"origins": "*"}}, expose_headers=["Authorization"])
@@ -46,6 +59,13 @@ def invalid_token_callback(callback):
 def expired_token_callback(jwt_header, jwt_payload):
     return _jwt_error_response('Token has expired', 401)
 
+# 上游排队已满：快速返回503并告知客户端多久后重试
+@app.errorhandler(UpstreamBusy)
+def upstream_busy(e):
+    resp = jsonify({'msg': str(e), 'error': str(e), 'retry_after': e.retry_after})
+    resp.headers['Retry-After'] = str(e.retry_after)
+    return resp, 503
+
 # 确保数据库目录存在
 db_dir = os.path.dirname(DATABASE_PATH)
 if not os.path.exists(db_dir):
@@ -80,7 +100,9 @@ with sqlite3.connect(DATABASE_PATH) as conn:
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         user_id INTEGER NOT NULL,
         title TEXT,
-        created_at TEXT
+        created_at TEXT,
+        summary TEXT,
+        summary_upto INTEGER DEFAULT 0
     )''')
     
     # 创建conversations表，session_id允许为NULL
@@ -96,6 +118,28 @@ with sqlite3.connect(DATABASE_PATH) as conn:
     )''')
     conn.commit()
 
+# 上传文件统一存放在内容寻址存储中（相同内容只存一份），按 (owner, scope, 文件名) 映射：
+# 智能助手上传为 (用户ID, 'ask')，财务分析为 (用户ID, 'analyze/<批次>/<月份>')，
+# 月份文件接口（/api/upload等，无需登录）为 (PUBLIC_OWNER, 月份)
+PUBLIC_OWNER = 'public'
+upload_store = UploadStore(DATABASE_PATH, os.path.join(UPLOAD_FOLDER, 'blobs'))
+# 月份文件中抽取出的数据行（与/api/analyze的结果相同），上传时写入，供跨月份查询
+fact_store = FactStore(DATABASE_PATH)
+
+# 迁移旧版按 UPLOAD_FOLDER/<月份>/<文件名> 存放的文件
+for legacy_month in os.listdir(UPLOAD_FOLDER):
+    legacy_folder = os.path.join(UPLOAD_FOLDER, legacy_month)
+    if not re.match(r'^\d{4}-\d{2}$', legacy_month) or not os.path.isdir(legacy_folder):
+        continue
+    for legacy_name in os.listdir(legacy_folder):
+        legacy_path = os.path.join(legacy_folder, legacy_name)
+        if os.path.isfile(legacy_path):
+            with open(legacy_path, 'rb') as f:
+                upload_store.put(PUBLIC_OWNER, legacy_month, legacy_name, f)
+            os.remove(legacy_path)
+    if not os.listdir(legacy_folder):
+        os.rmdir(legacy_folder)
+
 # 注册接口
 @app.route('/api/register', methods=['POST'])
 def register():
@@ -146,12 +190,93 @@ def userinfo():
     user = get_jwt_identity()
     return jsonify({'user': user}), 200
 
-# 智能助手：支持文本+文件上传+思考模式+数学公式渲染指令+会话管理
-@app.route('/api/ask', methods=['POST'])
-@jwt_required()
-def ask():
-    user = get_jwt_identity()
-    user_id = user['id']
+# 粗略估算token数：中文等非ASCII字符约1个token，ASCII约4个字符1个token
+def _estimate_tokens(text):
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii) // 4 + 1
+
+# 把较早的对话合并进会话的滚动摘要
+def _fold_into_summary(summary, turns):
+    dialogue = "\n".join(f"用户：{q or ''}\n助手：{a or ''}" for q, a in turns)
+    messages = [
+        {"role": "system", "content": "你负责维护一段对话的摘要，供后续回答时参考。只输出摘要正文。"},
+        {"role": "user", "content": f"已有摘要：\n{summary or '（无）'}\n\n新增对话：\n{dialogue}\n\n请把新增对话合并进摘要，保留用户的关键问题、数据、结论和尚未解决的事项，不超过{CONTEXT_SUMMARY_MAX_CHARS}字。"}
+    ]
+    return llm.chat(messages, temperature=0.2, max_tokens=CONTEXT_SUMMARY_MAX_CHARS, endpoint='summary').strip()
+
+# 由服务端根据conversations表重建会话上下文：最近的若干轮原样保留（不超过token预算），
+# 更早的轮次折叠进sessions表中缓存的滚动摘要，每轮请求的上下文开销保持恒定
+def _session_context(session_id, user_id):
+    if not session_id:
+        return []
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        c = conn.cursor()
+        c.execute('''SELECT summary, summary_upto FROM sessions WHERE id=? AND user_id=?''', (session_id, user_id))
+        row = c.fetchone()
+        if not row:
+            return []
+        summary, summary_upto = row[0], row[1] or 0
+        c.execute('''SELECT id, question, answer FROM conversations WHERE session_id=? AND id>? ORDER BY id DESC''',
+                  (session_id, summary_upto))
+        turns = c.fetchall()
+    budget = CONTEXT_TOKEN_BUDGET - _estimate_tokens(summary)
+    used = 0
+    recent = []
+    for turn in turns:
+        used += _estimate_tokens(turn[1]) + _estimate_tokens(turn[2])
+        if used > budget:
+            break
+        recent.append(turn)
+    overflow = turns[len(recent):]
+    if overflow:
+        # 超出预算时一次折叠到只剩一半预算，避免之后每轮都要重新生成摘要
+        used = 0
+        keep = []
+        for turn in recent:
+            used += _estimate_tokens(turn[1]) + _estimate_tokens(turn[2])
+            if used > budget // 2:
+                break
+            keep.append(turn)
+        folded = list(reversed(turns[len(keep):]))
+        try:
+            summary = _fold_into_summary(summary, [(q, a) for _, q, a in folded])
+            with sqlite3.connect(DATABASE_PATH) as conn:
+                conn.execute('''UPDATE sessions SET summary=?, summary_upto=? WHERE id=? AND user_id=?''',
+                             (summary, folded[-1][0], session_id, user_id))
+                conn.commit()
+        except (LLMError, UpstreamBusy) as e:
+            # 摘要失败不影响本次回答，只是丢弃超出预算的旧对话
+            print(f'会话摘要生成失败: {e}')
+        recent = keep
+    messages = []
+    if summary:
+        messages.append({"role": "system", "content": f"此前对话的摘要：{summary}"})
+    for _, question, answer in reversed(recent):
+        messages.append({"role": "user", "content": question or ''})
+        messages.append({"role": "assistant", "content": answer or ''})
+    return messages
+
+# 解析/api/ask表单（文件+模式），结合服务端会话上下文组装发送给大模型的messages
+# 返回 (ctx, None) 或 (None, 错误响应)
+# 逐页读取PDF文本写入提问，超过PDF_MAX_CHARS字后停止（后面的页不再提取）
+def _pdf_prompt_text(path, spec):
+    total, pages = pdf_pages(path, spec)
+    parts = []
+    size = 0
+    included = []
+    for page, text in iter_pdf_text(path, pages):
+        if size and size + len(text) > PDF_MAX_CHARS:
+            break
+        parts.append(f'--- 第{page + 1}页 ---\n{text[:PDF_MAX_CHARS]}')
+        size += len(text)
+        included.append(page + 1)
+    if len(included) < total:
+        parts.insert(0, f'（PDF共{total}页，以下仅包含其中{len(included)}页）')
+    return '\n'.join(parts)
+
+def _build_ask_request(user_id):
     question = request.form.get('question', '')
     mode = request.form.get('mode', 'fast')
     session_id = request.form.get('session_id')  # 新增：会话ID
@@ -162,37 +287,24 @@ def ask():
     if file and file.filename:
         filename = file.filename
         ext = filename.rsplit('.', 1)[-1].lower()
-        save_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(save_path)
+        save_path = upload_store.blob_path(upload_store.put(user_id, 'ask', filename, file.stream))
         file_type = ext
         file_name = filename
         try:
             if ext in ['xlsx', 'csv']:
-                if ext == 'csv':
-                    df = pd.read_csv(save_path)
-                else:
-                    df = pd.read_excel(save_path)
+                df = read_table(save_path, ext)
                 file_content = df.to_string(index=False)
-            elif ext == 'docx':
-                doc = docx.Document(save_path)
-                file_content = '\n'.join([p.text for p in doc.paragraphs])
             elif ext == 'pdf':
-                with pdfplumber.open(save_path) as pdf:
-                    file_content = '\n'.join(page.extract_text() or '' for page in pdf.pages)
-            elif ext in ['png', 'jpg', 'jpeg']:
-                img = Image.open(save_path)
-                file_content = pytesseract.image_to_string(img)
+                # pages为可选的页码范围，如 1-10,15
+                file_content = _pdf_prompt_text(save_path, request.form.get('pages'))
+            elif ext in ['docx', 'png', 'jpg', 'jpeg']:
+                file_content = extract_text(save_path, ext)
             else:
-                return jsonify({'msg': '不支持的文件类型'}), 400
+                return None, (jsonify({'msg': '不支持的文件类型'}), 400)
         except Exception as e:
-            return jsonify({'msg': f'文件解析失败: {str(e)}'}), 400
-    context_json = request.form.get('context')
-    context_msgs = []
-    if context_json:
-        try:
-            context_msgs = json.loads(context_json)
-        except Exception:
-            context_msgs = []
+            return None, (jsonify({'msg': f'文件解析失败: {str(e)}'}), 400)
+    # 上下文由服务端根据会话记录重建，不再使用客户端传来的context
+    context_msgs = _session_context(session_id, user_id)
     prompt = question
     if file_content:
         prompt += f"\n\n以下是用户上传的{file_type}文件内容：\n{file_content}"
@@ -208,57 +320,114 @@ def ask():
     # 在system prompt后自动加一条隐藏指令，要求AI用标准Markdown数学公式语法输出所有公式
     math_tip = "对于数学公式，请用标准Markdown数学公式语法输出所有公式，行内公式用$...$，块级公式用$$...$$。"
     system_prompt = system_prompt + " " + math_tip
-    headers = {
-        "Authorization": f"Bearer {DEEPSEEK_API_TOKEN}",
-        "Content-Type": "application/json"
-    }
     # 组装messages
     messages = [
         {"role": "system", "content": system_prompt}
     ]
     messages.extend(context_msgs)
     messages.append({"role": "user", "content": prompt})
-    ds_payload = {
-        "model": "deepseek-chat",
-        "messages": messages,
-        "stream": False,
-        "temperature": temperature,
-        "max_tokens": max_tokens
-    }
+    return {
+        'question': question,
+        'session_id': session_id,
+        'file_name': file_name,
+        'messages': messages,
+        'temperature': temperature,
+        'max_tokens': max_tokens
+    }, None
+
+# 验证session_id是否属于当前用户
+def _session_belongs_to(c, session_id, user_id):
+    c.execute('''SELECT id FROM sessions WHERE id=? AND user_id=?''', (session_id, user_id))
+    return c.fetchone() is not None
+
+# 会话管理逻辑：没有session_id时创建新会话，然后写入对话记录
+# 返回最终的session_id；session_id不属于当前用户时返回None
+def _save_conversation(user_id, session_id, question, answer, file_name):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        c = conn.cursor()
+        current_time = datetime.now().isoformat()
+
+        # 如果没有session_id或session_id为空，创建新会话
+        if not session_id:
+            # 使用问题前20个字符作为会话标题
+            session_title = question[:20] + "..." if len(question) > 20 else question
+            c.execute('''INSERT INTO sessions (user_id, title, created_at) VALUES (?, ?, ?)''',
+                      (user_id, session_title, current_time))
+            session_id = c.lastrowid
+        elif not _session_belongs_to(c, session_id, user_id):
+            return None
+
+        # 写入对话记录
+        c.execute('''INSERT INTO conversations (session_id, user_id, question, answer, file_name, created_at) VALUES (?, ?, ?, ?, ?, ?)''',
+                  (session_id, user_id, question, answer, file_name, current_time))
+        conn.commit()
+    return session_id
+
+# 智能助手：支持文本+文件上传+思考模式+数学公式渲染指令+会话管理
+@app.route('/api/ask', methods=['POST'])
+@jwt_required()
+def ask():
+    user = get_jwt_identity()
+    user_id = user['id']
+    ctx, error = _build_ask_request(user_id)
+    if error:
+        return error
     try:
-        resp = requests.post("https://api.deepseek.com/chat/completions", json=ds_payload, headers=headers, timeout=60)
-        if resp.status_code == 200:
-            answer = resp.json()["choices"][0]["message"]["content"]
-            
-            # 会话管理逻辑
-            with sqlite3.connect(DATABASE_PATH) as conn:
-                c = conn.cursor()
-                current_time = datetime.now().isoformat()
-                
-                # 如果没有session_id或session_id为空，创建新会话
-                if not session_id:
-                    # 使用问题前20个字符作为会话标题
-                    session_title = question[:20] + "..." if len(question) > 20 else question
-                    c.execute('''INSERT INTO sessions (user_id, title, created_at) VALUES (?, ?, ?)''',
-                              (user_id, session_title, current_time))
-                    session_id = c.lastrowid
-                else:
-                    # 验证session_id是否属于当前用户
-                    c.execute('''SELECT id FROM sessions WHERE id=? AND user_id=?''', (session_id, user_id))
-                    if not c.fetchone():
-                        return jsonify({'msg': '无效的会话ID'}), 400
-                
-                # 写入对话记录
-                c.execute('''INSERT INTO conversations (session_id, user_id, question, answer, file_name, created_at) VALUES (?, ?, ?, ?, ?, ?)''',
-                          (session_id, user_id, question, answer, file_name, current_time))
-                conn.commit()
-            
-            return jsonify({'answer': answer, 'session_id': session_id})
-        else:
-            return jsonify({'msg': f'DeepSeek API错误: {resp.text}'}), 500
+        answer = llm.chat(ctx['messages'], ctx['temperature'], ctx['max_tokens'], endpoint='ask')
+        session_id = _save_conversation(user_id, ctx['session_id'], ctx['question'], answer, ctx['file_name'])
+        if session_id is None:
+            return jsonify({'msg': '无效的会话ID'}), 400
+        return jsonify({'answer': answer, 'session_id': session_id})
+    except LLMError as e:
+        return jsonify({'msg': f'DeepSeek API错误: {e.text}'}), 500
+    except UpstreamBusy:
+        raise
     except Exception as e:
         return jsonify({'msg': f'AI接口调用失败: {str(e)}'}), 500
 
+def _sse(data, event=None):
+    msg = f"event: {event}\n" if event else ""
+    return msg + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# 智能助手流式版本：以Server-Sent Events逐段转发大模型输出，结束后再写入会话记录
+# 事件格式：data: {"delta": "..."}；结束时 event: done，出错时 event: error
+@app.route('/api/ask/stream', methods=['POST'])
+@jwt_required()
+def ask_stream():
+    user = get_jwt_identity()
+    user_id = user['id']
+    ctx, error = _build_ask_request(user_id)
+    if error:
+        return error
+    # 流开始后无法再返回400，因此提前校验会话归属
+    if ctx['session_id']:
+        with sqlite3.connect(DATABASE_PATH) as conn:
+            if not _session_belongs_to(conn.cursor(), ctx['session_id'], user_id):
+                return jsonify({'msg': '无效的会话ID'}), 400
+    try:
+        resp = llm.open_stream(ctx['messages'], ctx['temperature'], ctx['max_tokens'], endpoint='ask')
+    except LLMError as e:
+        return jsonify({'msg': f'DeepSeek API错误: {e.text}'}), 500
+    except UpstreamBusy:
+        raise
+    except Exception as e:
+        return jsonify({'msg': f'AI接口调用失败: {str(e)}'}), 500
+
+    def generate():
+        parts = []
+        try:
+            for delta in llm.iter_deltas(resp):
+                parts.append(delta)
+                yield _sse({'delta': delta})
+        except Exception as e:
+            yield _sse({'msg': f'AI接口调用失败: {str(e)}'}, event='error')
+            return
+        session_id = _save_conversation(user_id, ctx['session_id'], ctx['question'], ''.join(parts), ctx['file_name'])
+        yield _sse({'session_id': session_id}, event='done')
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # /api/history分页查询 - 按会话分组
 @app.route('/api/history', methods=['GET'])
 @jwt_required()
@@ -318,7 +487,10 @@ def download_file(filename):
         c.execute('''SELECT COUNT(*) FROM conversations WHERE user_id=? AND file_name=?''', (user_id, filename))
         if c.fetchone()[0] == 0:
             return jsonify({'msg': '无权限下载此文件'}), 403
-    return send_from_directory(UPLOAD_FOLDER, filename, as_attachment=True)
+    file_path = upload_store.path(user_id, 'ask', filename)
+    if not file_path or not os.path.exists(file_path):
+        return jsonify({'msg': '文件不存在'}), 404
+    return send_file(file_path, as_attachment=True, download_name=filename)
 
 # /api/file/delete/<id>删除 - 支持删除会话
 @app.route('/api/file/delete/<int:session_id>', methods=['POST'])
@@ -342,14 +514,16 @@ def delete_session(session_id):
         c.execute('''DELETE FROM conversations WHERE session_id=?''', (session_id,))
         c.execute('''DELETE FROM sessions WHERE id=? AND user_id=?''', (session_id, user_id))
         conn.commit()
+        # 其他会话仍引用的同名文件保留
+        orphaned = []
+        for file_row in set(files):
+            c.execute('''SELECT COUNT(*) FROM conversations WHERE user_id=? AND file_name=?''', (user_id, file_row[0]))
+            if c.fetchone()[0] == 0:
+                orphaned.append(file_row[0])
     
     # 删除相关文件
-    for file_row in files:
-        file_name = file_row[0]
-        if file_name:
-            file_path = os.path.join(UPLOAD_FOLDER, file_name)
-            if os.path.exists(file_path):
-                os.remove(file_path)
+    for file_name in orphaned:
+        upload_store.delete(user_id, 'ask', file_name)
     
     return jsonify({'msg': '会话删除成功'})
 
@@ -371,10 +545,8 @@ def delete_file_by_name():
         # 删除数据库记录
         c.execute('''DELETE FROM conversations WHERE user_id=? AND file_name=?''', (user_id, filename))
         conn.commit()
-    # 删除物理文件
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    # 删除文件映射（内容块无其他引用时一并删除）
+    upload_store.delete(user_id, 'ask', filename)
     return jsonify({'msg': '文件删除成功'})
 
 @app.route('/api/report/upload', methods=['POST'])
@@ -387,77 +559,37 @@ def upload_report():
         return jsonify({'msg': '未选择文件'}), 400
     
     ext = file.filename.rsplit('.', 1)[-1].lower()
-    
-    # 创建临时文件路径
-    temp_filename = f"temp_{int(time.time())}_{file.filename}"
-    temp_path = os.path.join(UPLOAD_FOLDER, temp_filename)
+    if ext not in ['csv', 'xlsx', 'xls']:
+        return jsonify({'msg': '仅支持CSV或Excel文件'}), 400
     
     try:
-        # 保存文件到临时路径
-        file.save(temp_path)
-        
-        if ext == 'csv':
-            # 使用临时文件路径读取CSV
-            df = pd.read_csv(temp_path)
-            if df.empty or not list(df.columns):
-                os.remove(temp_path)  # 删除临时文件
-                return jsonify({'msg': '文件内容不规范，请上传标准表格文件'}), 400
-            data = df.head(100).replace({np.nan: None}).to_dict(orient='records')
+        # 直接从上传流（werkzeug已spool到内存/临时文件）读取表头和前100行，不再整表解析
+        sheets = []
+        for sheet_name, df, total_rows in preview_table(file.stream, ext):
+            if not isinstance(df, pd.DataFrame) or df.empty or not list(df.columns):
+                continue
+            data = df.replace({np.nan: None}).to_dict(orient='records')
             columns = list(df.columns)
-            # 新增：登记文件归属
-            with sqlite3.connect(DATABASE_PATH) as conn:
-                c = conn.cursor()
-                c.execute('''INSERT INTO conversations (user_id, file_name, created_at, question, answer, session_id) VALUES (?, ?, datetime('now'), NULL, NULL, NULL)''', (user_id, file.filename))
-                conn.commit()
-            
-            # 处理完成后删除临时文件
-            os.remove(temp_path)
-            return jsonify({'sheets': [{
-                'name': file.filename,
+            sheets.append({
+                'name': file.filename if ext == 'csv' else sheet_name,
                 'columns': columns,
-                'data': data
-            }], 'msg': '解析成功'})
-            
-        elif ext in ['xlsx', 'xls']:
-            # 使用 with 语句确保资源释放
-            with pd.ExcelFile(temp_path) as xls:
-                sheets = []
-                valid = False
-                for sheet_name in xls.sheet_names:
-                    df = xls.parse(sheet_name)
-                    if not isinstance(df, pd.DataFrame) or df.empty or not list(df.columns):
-                        continue
-                    data = df.head(100).replace({np.nan: None}).to_dict(orient='records')
-                    columns = list(df.columns)
-                    sheets.append({
-                        'name': sheet_name,
-                        'columns': columns,
-                        'data': data
-                    })
-                    valid = True
-            
-            if not sheets:
-                return jsonify({'msg': '未识别到有效表格，请检查文件内容'}), 400
-            
-            # 新增：登记文件归属
-            with sqlite3.connect(DATABASE_PATH) as conn:
-                c = conn.cursor()
-                c.execute('''INSERT INTO conversations (user_id, file_name, created_at, question, answer, session_id) VALUES (?, ?, datetime('now'), NULL, NULL, NULL)''', (user_id, file.filename))
-                conn.commit()
-            
-            # 处理完成后删除临时文件
-            os.remove(temp_path)
-            return jsonify({'sheets': sheets, 'msg': '解析成功'})
-            
-        else:
-            # 删除临时文件
-            os.remove(temp_path)
-            return jsonify({'msg': '仅支持CSV或Excel文件'}), 400
+                'data': data,
+                'total_rows': total_rows  # 估算的总行数，预览只包含前100行
+            })
+        
+        if not sheets:
+            if ext == 'csv':
+                return jsonify({'msg': '文件内容不规范，请上传标准表格文件'}), 400
+            return jsonify({'msg': '未识别到有效表格，请检查文件内容'}), 400
+        
+        # 新增：登记文件归属
+        with sqlite3.connect(DATABASE_PATH) as conn:
+            c = conn.cursor()
+            c.execute('''INSERT INTO conversations (user_id, file_name, created_at, question, answer, session_id) VALUES (?, ?, datetime('now'), NULL, NULL, NULL)''', (user_id, file.filename))
+            conn.commit()
+        return jsonify({'sheets': sheets, 'msg': '解析成功'})
             
     except Exception as e:
-        # 确保在异常情况下也删除临时文件
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.remove(temp_path)
         return jsonify({'msg': f'文件解析失败: {str(e)}'}), 400
     
 def extract_sheets_from_prompt(prompt):
@@ -478,56 +610,32 @@ def ai_analyze():
     data = request.get_json()
     prompt = data.get('prompt', '')
     # 直接调用大模型API
-    headers = {
-        "Authorization": f"Bearer {DEEPSEEK_API_TOKEN}",
-        "Content-Type": "application/json"
-    }
     messages = [
         {"role": "system", "content": "你是一个专业的财务分析师，请详细、条理清晰、专业地回答用户问题。对于数学公式，请用标准Markdown数学公式语法输出所有公式，行内公式用$...$，块级公式用$$...$$。"}
     ]
     messages.append({"role": "user", "content": prompt})
-    ds_payload = {
-        "model": "deepseek-chat",
-        "messages": messages,
-        "stream": False,
-        "temperature": 0.2,
-        "max_tokens": 2048
-    }
     try:
-        resp = requests.post("https://api.deepseek.com/chat/completions", json=ds_payload, headers=headers, timeout=60)
-        if resp.status_code == 200:
-            answer = resp.json()["choices"][0]["message"]["content"]
-            return jsonify({'result': answer})
-        else:
-            return jsonify({'msg': f'DeepSeek API错误: {resp.text}'}), 500
+        answer = llm.chat(messages, temperature=0.2, max_tokens=2048, endpoint='report')
+        return jsonify({'result': answer})
+    except LLMError as e:
+        return jsonify({'msg': f'DeepSeek API错误: {e.text}'}), 500
+    except UpstreamBusy:
+        raise
     except Exception as e:
         return jsonify({'msg': f'AI接口调用失败: {str(e)}'}), 500
 
-@app.route('/api/ai_analyze', methods=['POST'])
-@jwt_required()
-def ai_analyze_finance():
-    print('收到文件keys:', list(request.files.keys()))
-    for key in request.files:
-        print('key:', key, 'file:', request.files[key])
-    user = get_jwt_identity()
-    user_id = str(user['id']) if user and 'id' in user and user['id'] is not None else 'anonymous'
-    user_folder = os.path.join(str(UPLOAD_FOLDER), f'tmp_{user_id}')
-    if os.path.exists(user_folder):
-        shutil.rmtree(user_folder)
-    os.makedirs(user_folder, exist_ok=True)
+class FinanceAnalysisError(Exception):
+    """AI财务分析失败，raw为大模型原始返回（如有）"""
 
-    # 只处理本次上传的文件
-    files = request.files
-    if not files:
-        return jsonify({'error': 'No files uploaded'}), 400
-    # 支持multipart表单接收months和baseMonth
-    months = request.form.get('months')
-    if months:
-        import json as _json
-        months = _json.loads(months)
-    else:
-        months = []
-    base_month = request.form.get('baseMonth') or request.args.get('baseMonth')
+    def __init__(self, msg, raw=''):
+        super().__init__(msg)
+        self.raw = raw
+
+def _finance_scope(batch, month=''):
+    return f'analyze/{batch}/{month}'
+
+def _save_finance_uploads(files, owner, batch):
+    """把 files[YYYY-MM] 形式的上传文件按月份存入上传存储的本批次分组，返回月份列表"""
     months_list = []
     for key in files:
         # key格式: files[YYYY-MM]
@@ -537,51 +645,98 @@ def ai_analyze_finance():
                 continue
             if month not in months_list:
                 months_list.append(month)
-            f = files[key]
-            month_folder = os.path.join(str(user_folder), str(month))
-            os.makedirs(month_folder, exist_ok=True)
-            filename = f.filename if isinstance(f.filename, str) else str(f.filename)
-            f.save(os.path.join(month_folder, filename))
-    if not months_list:
-        shutil.rmtree(user_folder)
-        return jsonify({'error': 'No valid months'}), 400
+            # 同一月份可能上传多个文件
+            for f in files.getlist(key):
+                filename = f.filename if isinstance(f.filename, str) else str(f.filename)
+                upload_store.put(owner, _finance_scope(batch, month), filename, f.stream)
+    return months_list
+
+# 分月汇总（map）：把单个月份的原始文件内容压缩成该月关键指标摘要
+def _summarize_month(month, month_files):
+    content = "\n".join(month_files)
+    messages = [
+        {"role": "system", "content": "你是一个专业的财务分析师，擅长从财务报表中提取关键指标。只输出JSON，不要任何解释文字。"},
+        {"role": "user", "content": f"""以下是{month}的财务数据文件：
+
+{content}
+
+请提取该月的关键财务指标，输出一个紧凑的JSON对象，字段如下（金额单位为元，缺失的指标填null）：
+{{"month": "{month}", "收入": 0, "利润": 0, "净利润": 0, "期末现金余额": 0, "经营现金流": 0, "投资现金流": 0, "筹资现金流": 0, "备注": "一句话说明该月的异常或重要事项"}}"""}
+    ]
+    try:
+        return llm.chat(messages, temperature=0.1, max_tokens=512, endpoint='finance_map').strip()
+    except LLMError as e:
+        print("DeepSeek返回异常:", e.status_code, e.text)
+        raise FinanceAnalysisError(f"AI分析失败（{month}分月汇总）: {e.text}")
+
+# 月份多或内容过长时，先并行生成各月摘要，再用摘要代替原始文件内容做最终分析（reduce）
+def _map_month_summaries(month_files, progress):
+    months = list(month_files)
+    summaries = {}
+    with ThreadPoolExecutor(max_workers=FINANCE_MAP_WORKERS) as pool:
+        futures = {pool.submit(_summarize_month, m, month_files[m]): m for m in months}
+        for i, future in enumerate(as_completed(futures), 1):
+            summaries[futures[future]] = future.result()
+            progress(0.1 + 0.2 * i / len(months), f'分月汇总 {i}/{len(months)}')
+    return "\n".join(f"时间戳: {m}\n关键指标摘要:\n{summaries[m]}\n{'='*50}" for m in months)
 
+# 读取本批次各月份的文件，组装发送给大模型的messages，返回 (messages, 本地计算的图表序列或None)
+# 能识别的利润表/资产负债表/现金流量表在本地提取为月份×指标的紧凑表格，其余文件才发送内容
+def _build_finance_messages(owner, batch, months_list, base_month, progress):
+    progress(0.05, '解析上传文件')
     # 构造发送给大模型的数据
-    files_info = []
-    for month in months_list:
-        month_folder = os.path.join(str(user_folder), str(month))
-        if not os.path.exists(month_folder):
-            continue
-        for fname in os.listdir(month_folder):
-            fpath = os.path.join(month_folder, fname)
-            if not os.path.isfile(fpath):
-                continue
-            file_type = fname.split('.')[-1].lower() if '.' in fname else ''
-            if file_type in ['xlsx', 'xls', 'csv']:
-                try:
-                    if file_type == 'csv':
-                        df = pd.read_csv(fpath)
-                    else:
-                        df = pd.read_excel(fpath)
-                    content = df.to_string(index=False)
-                except Exception as e:
-                    with open(fpath, 'rb') as f:
-                        content = base64.b64encode(f.read()).decode()
+    metrics = {}
+    month_files = {}
+    entries = [(month, entry) for month in months_list for entry in upload_store.list(owner, _finance_scope(batch, month))]
+    file_types = [entry['name'].split('.')[-1].lower() if '.' in entry['name'] else '' for _, entry in entries]
+    # 所有月份的表格文件一次性提交并行获取列式副本，结果按文件顺序返回
+    parsed = iter(columnar_tables([(entry['path'], file_type) for (_, entry), file_type in zip(entries, file_types)
+                                   if file_type in ['xlsx', 'xls', 'csv']]))
+    for (month, entry), file_type in zip(entries, file_types):
+        fname = entry['name']
+        fpath = entry['path']
+        if file_type in ['xlsx', 'xls', 'csv']:
+            item = next(parsed)
+            if item['ok']:
+                recognized = False
+                for sheet in item['value'].sheets:
+                    if not sheet.nrows:
+                        continue
+                    kind, values = normalize_sheet(sheet.raw(), month)
+                    if kind:
+                        print(f'识别为{kind}: {fname}, 提取指标{len(values)}项')
+                        merge_metrics(metrics, month, values)
+                        recognized = True
+                if recognized:
+                    continue
+                content = table_text(item['value'].frame())
             else:
+                print(f'文件解析失败: {fname}, 错误: {item["error"]}')
+                content = '（文件无法解析，已省略）'
+        else:
+            try:
+                with open(fpath, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except UnicodeDecodeError:
                 try:
-                    with open(fpath, 'r', encoding='utf-8') as f:
+                    with open(fpath, 'r', encoding='gbk') as f:
                         content = f.read()
-                except UnicodeDecodeError:
-                    try:
-                        with open(fpath, 'r', encoding='gbk') as f:
-                            content = f.read()
-                    except:
-                        with open(fpath, 'rb') as f:
-                            content = base64.b64encode(f.read()).decode()
-            files_info.append(f"时间戳: {month}\n文件名: {fname}\n文件类型: {file_type}\n文件内容:\n{content}\n{'='*50}")
-    
-    files_content = "\n".join(files_info)
-    
+                except:
+                    content = '（二进制文件，已省略）'
+        file_info = f"时间戳: {month}\n文件名: {fname}\n文件类型: {file_type}\n文件内容:\n{content}\n{'='*50}"
+        month_files.setdefault(month, []).append(file_info)
+
+    other_content = "\n".join(info for infos in month_files.values() for info in infos)
+    if len(month_files) >= FINANCE_MAP_REDUCE_MIN_MONTHS or len(other_content) > FINANCE_MAP_REDUCE_MAX_CHARS:
+        progress(0.1, '分月汇总')
+        other_content = _map_month_summaries(month_files, progress)
+    parts = []
+    if metrics:
+        parts.append(f"各月财务报表关键指标（已从上传的报表中提取，金额单位为元，空白表示该月报表未提供此项）：\n{metric_table_text(metrics)}\n{'='*50}")
+    if other_content:
+        parts.append(other_content)
+    files_content = "\n".join(parts)
+
     # 设计合理的提示词
     base_month_str = f"基准月份为{base_month}，M0代表{base_month}，M+1为下一个月，以此类推。" if base_month else ""
     # 生成历史区间
@@ -589,15 +744,12 @@ def ai_analyze_finance():
     history_months_str = ", ".join(history_months)
     # 生成预测区间
     predict_count = 6 if len(months_list) > 12 else 3
-    predict_months = []
-    if base_month:
-        m0 = base_month
-        for i in range(1, predict_count + 1):
-            from datetime import datetime
-            from dateutil.relativedelta import relativedelta
-            dt = datetime.strptime(m0, "%Y-%m") + relativedelta(months=i)
-            predict_months.append(dt.strftime("%Y-%m"))
+    predict_months = forecast_months(base_month, predict_count) if base_month else []
     predict_months_str = ", ".join(predict_months)
+    if metrics:
+        # 识别出标准报表时，图表数据由本地模型计算，大模型只负责决策建议
+        series = finance_series(metrics, [m for m in history_months if re.match(r'^\d{4}-\d{2}$', m)], predict_months)
+        return _finance_advice_messages(base_month_str, files_content, series), series
     # 强化bar/area区间要求
     prompt = f"""
 你是一个专业的财务分析师，请根据以下财务数据文件进行智能分析和预测。
@@ -660,90 +812,243 @@ def ai_analyze_finance():
   }}
 }}"""
 
-    try:
-        headers = {
-            "Authorization": f"Bearer {DEEPSEEK_API_TOKEN}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": "deepseek-chat",
-            "messages": [
-                {"role": "system", "content": "你是一个专业的财务分析师，擅长从各种格式的财务文件中提取关键信息并进行趋势分析和预测。请严格按照要求的JSON格式输出结果，不要添加任何解释文字。特别注意：advice字段必须包含分析结论、关键风险预警、决策建议三个子字段，不能为空。"},
-                {"role": "user", "content": prompt}
-            ],
-            "stream": False,
-            "temperature": 0.1,  # 降低温度以获得更稳定的输出
-            "max_tokens": 4096   # 增加token限制以处理更多文件内容
+    return [
+        {"role": "system", "content": "你是一个专业的财务分析师，擅长从各种格式的财务文件中提取关键信息并进行趋势分析和预测。请严格按照要求的JSON格式输出结果，不要添加任何解释文字。特别注意：advice字段必须包含分析结论、关键风险预警、决策建议三个子字段，不能为空。"},
+        {"role": "user", "content": prompt}
+    ], None
+
+# 图表数据已在本地算好：把实际值与预测值交给大模型，只要求输出advice
+def _finance_advice_messages(base_month_str, files_content, series):
+    prompt = f"""
+你是一个专业的财务分析师，请根据以下财务数据给出决策建议。
+
+{base_month_str}
+
+{files_content}
+
+以下是根据历史数据计算的趋势与预测（type为history的是实际值，predict的是模型预测值；金额单位为元，净利润率为小数；经营/投资/筹资为三类现金流规模的占比）：
+{series_table_text(series)}
+
+请结合以上数据输出决策建议（要求专业、详细、可操作）：
+- **分析结论**：结合收入、利润、净利润率、现金流等主要指标和趋势，给出条理清晰、专业的分析结论，指出企业当前的经营状况、财务结构、成长性等。
+- **关键风险预警**：结合数据，具体指出潜在的财务风险点（如现金流断裂、盈利能力下滑、负债率过高、成本异常等），并说明预警理由。
+- **决策建议**：基于分析结论和风险预警，给出具体、可操作的改进措施或战略建议，建议尽量量化目标或给出管理建议。
+
+**重要要求**：
+- 只输出JSON格式，不要任何解释文字
+- 引用的数字以上述数据为准，不要自行重新预测
+- **advice字段必须包含三个子字段，不能为空**
+- 严格按照以下JSON结构输出：
+
+{{
+  "advice": {{
+    "分析结论": "基于历史数据分析，公司收入呈现稳定增长趋势，利润率保持稳定。",
+    "关键风险预警": "需要关注现金流波动和季节性影响。",
+    "决策建议": "建议加强现金流管理，优化投资结构。"
+  }}
+}}"""
+    return [
+        {"role": "system", "content": "你是一个专业的财务分析师，擅长根据财务指标和预测结果给出分析结论与决策建议。请严格按照要求的JSON格式输出结果，不要添加任何解释文字。特别注意：advice字段必须包含分析结论、关键风险预警、决策建议三个子字段，不能为空。"},
+        {"role": "user", "content": prompt}
+    ]
+
+def _last_history_month(months_list):
+    uploaded_months = sorted([m for m in months_list if re.match(r'^\d{4}-\d{2}$', m)])
+    return uploaded_months[-1] if uploaded_months else None
+
+# 自动补全line的type字段，区分历史和预测
+def _mark_line_type(item, last_history_month):
+    m = item.get('month')
+    if not m or not re.match(r'^\d{4}-\d{2}$', m):
+        return
+    if last_history_month and m <= last_history_month:
+        item['type'] = 'history'
+    else:
+        item['type'] = 'predict'
+
+def _finalize_finance_result(result, months_list):
+    # 确保advice字段存在且不为空
+    if 'advice' not in result or not result['advice']:
+        result['advice'] = {
+            "分析结论": "基于上传的财务数据进行分析，建议进一步补充更多历史数据以获得更准确的趋势分析。",
+            "关键风险预警": "数据量有限，预测准确性可能受到影响，建议持续监控关键财务指标。",
+            "决策建议": "建议增加数据收集频率，完善财务分析体系，定期进行财务健康检查。"
         }
-        resp = requests.post("https://api.deepseek.com/chat/completions", json=payload, headers=headers, timeout=120)
-        print('DeepSeek原始返回:', resp.status_code, resp.text)
-        resp_json = resp.json()
-        if "choices" not in resp_json:
-            print("DeepSeek返回异常:", resp_json)
-            return jsonify({'error': f"AI分析失败: {resp_json.get('error', resp_json)}"}), 500
-        ds_result = resp_json["choices"][0]["message"]["content"]
-        print('大模型原始返回内容:', ds_result)
-        
-        # 健壮处理：去除代码块标记，自动提取第一个合法JSON对象
-        ds_result = ds_result.strip()
-        if ds_result.startswith('```'):
-            ds_result = re.sub(r'^```[a-zA-Z]*\s*', '', ds_result)
-            ds_result = re.sub(r'```$', '', ds_result)
-            ds_result = ds_result.strip()
-        
-        try:
-            result = json.loads(ds_result)
-        except Exception:
-            # 自动提取第一个合法JSON对象
-            match = re.search(r'({[\s\S]*})', ds_result)
-            if not match:
-                match = re.search(r'(\[[\s\S]*\])', ds_result)
-            if match:
-                json_str = match.group(1)
-                try:
-                    result = json.loads(json_str)
-                except Exception as e:
-                    print('二次提取后解析失败:', e)
-                    print('原始内容:', ds_result)
-                    raise
-            else:
-                print('未找到合法JSON片段')
-                print('原始内容:', ds_result)
-                raise
-        
-        # 确保advice字段存在且不为空
-        if 'advice' not in result or not result['advice']:
-            result['advice'] = {
-                "分析结论": "基于上传的财务数据进行分析，建议进一步补充更多历史数据以获得更准确的趋势分析。",
-                "关键风险预警": "数据量有限，预测准确性可能受到影响，建议持续监控关键财务指标。",
-                "决策建议": "建议增加数据收集频率，完善财务分析体系，定期进行财务健康检查。"
-            }
-        else:
-            # 确保advice包含所有必需字段
-            required_fields = ["分析结论", "关键风险预警", "决策建议"]
-            for field in required_fields:
-                if field not in result['advice'] or not result['advice'][field]:
-                    result['advice'][field] = f"需要补充{field}内容"
-        # 自动补全line的type字段，区分历史和预测
-        if 'line' in result and isinstance(result['line'], list):
-            uploaded_months = sorted([m for m in months_list if re.match(r'^\d{4}-\d{2}$', m)])
-            last_history_month = uploaded_months[-1] if uploaded_months else None
-            for item in result['line']:
-                m = item.get('month')
-                if not m or not re.match(r'^\d{4}-\d{2}$', m):
-                    continue
-                if last_history_month and m <= last_history_month:
-                    item['type'] = 'history'
-                else:
-                    item['type'] = 'predict'
-        
-        # 分析结束后清理临时目录
-        shutil.rmtree(user_folder)
-        return jsonify(result)
+    else:
+        # 确保advice包含所有必需字段
+        required_fields = ["分析结论", "关键风险预警", "决策建议"]
+        for field in required_fields:
+            if field not in result['advice'] or not result['advice'][field]:
+                result['advice'][field] = f"需要补充{field}内容"
+    if 'line' in result and isinstance(result['line'], list):
+        last_history_month = _last_history_month(months_list)
+        for item in result['line']:
+            _mark_line_type(item, last_history_month)
+    return result
+
+def run_finance_analysis(owner, batch, months_list, base_month, progress=None):
+    """读取本批次各月份的文件，调用大模型做趋势分析与预测，返回结构化结果"""
+    if progress is None:
+        progress = lambda pct, message: None
+    messages, series = _build_finance_messages(owner, batch, months_list, base_month, progress)
+    progress(0.3, '等待大模型分析')
+    try:
+        # 降低温度以获得更稳定的输出；增加token限制以处理更多文件内容
+        ds_result = llm.chat(messages, temperature=0.1, max_tokens=4096, endpoint='finance')
+    except LLMError as e:
+        print("DeepSeek返回异常:", e.status_code, e.text)
+        raise FinanceAnalysisError(f"AI分析失败: {e.text}")
+    print('大模型原始返回内容:', ds_result)
+    progress(0.9, '整理分析结果')
+
+    try:
+        # 健壮处理：忽略代码块标记和前后的说明文字，取出第一个完整的JSON对象
+        result = parse_model_json(ds_result)
+        if series:
+            result = {**series, 'advice': result.get('advice')}
+        return _finalize_finance_result(result, months_list)
     except Exception as e:
-        print('大模型原始返回:', ds_result if 'ds_result' in locals() else '无')
+        print('大模型原始返回:', ds_result)
         print(traceback.format_exc())
-        return jsonify({'error': f'AI分析失败: {str(e)}', 'raw': ds_result if 'ds_result' in locals() else ''}), 500
+        raise FinanceAnalysisError(f'AI分析失败: {str(e)}', raw=ds_result)
+
+# 后台任务：执行完毕（无论成败）释放本批次的上传文件
+def _finance_job(params, progress):
+    owner, batch = params['owner'], params['batch']
+    if not upload_store.scopes(owner, _finance_scope(batch)):
+        raise FinanceAnalysisError('任务的上传文件已丢失，请重新提交')
+    try:
+        return run_finance_analysis(owner, batch, params['months'], params['base_month'], progress)
+    finally:
+        upload_store.delete_scope(owner, _finance_scope(batch))
+
+analysis_jobs = JobQueue(DATABASE_PATH, workers=ANALYZE_WORKERS, max_pending=ANALYZE_MAX_PENDING,
+                         stale_seconds=JOB_STALE_SECONDS)
+analysis_jobs.register('finance', _finance_job)
+
+# 财务分析：默认同步返回结果；表单或查询参数带async=1时只提交后台任务，立即返回job_id，
+# 再通过 GET /api/ai_analyze/<job_id> 轮询状态、进度和结果
+@app.route('/api/ai_analyze', methods=['POST'])
+@jwt_required()
+def ai_analyze_finance():
+    print('收到文件keys:', list(request.files.keys()))
+    for key in request.files:
+        print('key:', key, 'file:', request.files[key])
+    user = get_jwt_identity()
+    user_id = str(user['id']) if user and 'id' in user and user['id'] is not None else 'anonymous'
+    # 每次请求使用独立批次，同一用户的并发请求/后台任务互不覆盖
+    batch = uuid.uuid4().hex
+
+    # 只处理本次上传的文件
+    files = request.files
+    if not files:
+        return jsonify({'error': 'No files uploaded'}), 400
+    base_month = request.form.get('baseMonth') or request.args.get('baseMonth')
+    months_list = _save_finance_uploads(files, user_id, batch)
+    if not months_list:
+        return jsonify({'error': 'No valid months'}), 400
+
+    if (request.form.get('async') or request.args.get('async')) == '1':
+        params = {'owner': user_id, 'batch': batch, 'months': months_list, 'base_month': base_month}
+        try:
+            job_id = analysis_jobs.submit('finance', user_id, params)
+        except QueueFull:
+            upload_store.delete_scope(user_id, _finance_scope(batch))
+            return jsonify({'error': '分析任务排队过多，请稍后重试'}), 503
+        return jsonify({'job_id': job_id, 'status': 'queued'}), 202
+
+    try:
+        result = run_finance_analysis(user_id, batch, months_list, base_month)
+    except FinanceAnalysisError as e:
+        return jsonify({'error': str(e), 'raw': e.raw}), 500
+    finally:
+        # 分析结束后释放本批次的上传文件
+        upload_store.delete_scope(user_id, _finance_scope(batch))
+    return jsonify(result)
+
+@app.route('/api/ai_analyze/<job_id>', methods=['GET'])
+@jwt_required()
+def ai_analyze_job(job_id):
+    user = get_jwt_identity()
+    user_id = str(user['id']) if user and 'id' in user and user['id'] is not None else 'anonymous'
+    job = analysis_jobs.get(job_id, user_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+# 财务分析流式版本：边接收大模型输出边增量解析JSON，line/bar/area的每个元素、
+# advice的每个字段一旦完整就立即推送，图表无需等待建议文字生成完毕即可开始绘制
+# 事件：item {"series", "index", "data"}；advice {"field", "text"}；done 补全后的完整结果；error
+@app.route('/api/ai_analyze/stream', methods=['POST'])
+@jwt_required()
+def ai_analyze_finance_stream():
+    user = get_jwt_identity()
+    user_id = str(user['id']) if user and 'id' in user and user['id'] is not None else 'anonymous'
+    batch = uuid.uuid4().hex
+    files = request.files
+    if not files:
+        return jsonify({'error': 'No files uploaded'}), 400
+    base_month = request.form.get('baseMonth') or request.args.get('baseMonth')
+    try:
+        months_list = _save_finance_uploads(files, user_id, batch)
+        if not months_list:
+            return jsonify({'error': 'No valid months'}), 400
+        # 提示词组装完成后上传文件就不再需要了
+        messages, series = _build_finance_messages(user_id, batch, months_list, base_month, lambda pct, message: None)
+    except FinanceAnalysisError as e:
+        return jsonify({'error': str(e), 'raw': e.raw}), 500
+    finally:
+        upload_store.delete_scope(user_id, _finance_scope(batch))
+    try:
+        resp = llm.open_stream(messages, temperature=0.1, max_tokens=4096, endpoint='finance')
+    except LLMError as e:
+        print("DeepSeek返回异常:", e.status_code, e.text)
+        return jsonify({'error': f"AI分析失败: {e.text}"}), 500
+
+    def generate():
+        parser = StreamingJSONParser(max_depth=2)
+        last_history_month = _last_history_month(months_list)
+        parts = []
+        try:
+            if series:
+                # 本地计算的图表数据不必等待大模型，先全部推送
+                for name in ('line', 'bar', 'area'):
+                    for index, value in enumerate(series[name]):
+                        yield _sse({'series': name, 'index': index, 'data': value}, event='item')
+            for delta in llm.iter_deltas(resp):
+                parts.append(delta)
+                for path, value in parser.feed(delta):
+                    if len(path) != 2:
+                        continue
+                    if path[0] in ('line', 'bar', 'area') and not series:
+                        if path[0] == 'line' and isinstance(value, dict):
+                            _mark_line_type(value, last_history_month)
+                        yield _sse({'series': path[0], 'index': path[1], 'data': value}, event='item')
+                    elif path[0] == 'advice':
+                        yield _sse({'field': path[1], 'text': value}, event='advice')
+            if not parser.done:
+                raise ValueError('未找到完整的JSON内容')
+            root = {**series, 'advice': parser.root.get('advice')} if series else parser.root
+            result = _finalize_finance_result(root, months_list)
+        except Exception as e:
+            print('大模型原始返回:', ''.join(parts))
+            print(traceback.format_exc())
+            yield _sse({'error': f'AI分析失败: {str(e)}', 'raw': ''.join(parts)}, event='error')
+            return
+        yield _sse(result, event='done')
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# DeepSeek调用统计（缓存命中/未命中等）
+@app.route('/api/llm/stats', methods=['GET'])
+@jwt_required()
+def llm_stats():
+    stats = llm.stats()
+    stats['parse_cache'] = parse_cache.stats()
+    stats['ocr'] = ocr_stats.stats()
+    stats['upload_store'] = upload_store.stats()
+    return jsonify(stats)
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
@@ -756,33 +1061,30 @@ def upload_file():
     if not isinstance(month, str) or not re.match(r'^\d{4}-\d{2}$', month):
         return jsonify({'error': f'Invalid month format: {month}. Expected YYYY-MM format'}), 400
     
-    assert isinstance(UPLOAD_FOLDER, str)
-    month_folder = os.path.join(str(UPLOAD_FOLDER), str(month))
-    os.makedirs(month_folder, exist_ok=True)
     for f in files:
-        assert isinstance(month_folder, str)
         assert isinstance(f.filename, str)
-        f.save(os.path.join(month_folder, f.filename))
+        digest = upload_store.put(PUBLIC_OWNER, month, f.filename, f.stream)
+        # 同名文件被替换时旧文件的数据行作废
+        fact_store.remove(PUBLIC_OWNER, month, f.filename)
+        ext = f.filename.rsplit('.', 1)[-1].lower()
+        if ext in ['xlsx', 'xls', 'csv']:
+            # 后台生成列式副本（预览和分析时内存映射读取），并抽取数据行写入事实表
+            _ingest_month_file(month, f.filename, digest, ext)
     return jsonify({'success': True})
 
 @app.route('/api/files', methods=['GET'])
 def list_uploaded_files():
     result = {}
-    if not os.path.exists(UPLOAD_FOLDER):
-        return jsonify(result)
-    for month in os.listdir(UPLOAD_FOLDER):
-        month_folder = os.path.join(UPLOAD_FOLDER, month)
-        if os.path.isdir(month_folder):
-            files = []
-            for fname in os.listdir(month_folder):
-                fpath = os.path.join(month_folder, fname)
-                if os.path.isfile(fpath):
-                    files.append({
-                        'name': fname,
-                        'size': os.path.getsize(fpath),
-                        'type': fname.split('.')[-1] if '.' in fname else ''
-                    })
-            result[month] = files
+    for month in upload_store.scopes(PUBLIC_OWNER):
+        files = []
+        for entry in upload_store.list(PUBLIC_OWNER, month):
+            fname = entry['name']
+            files.append({
+                'name': fname,
+                'size': entry['size'],
+                'type': fname.split('.')[-1] if '.' in fname else ''
+            })
+        result[month] = files
     return jsonify(result)
 
 @app.route('/api/preview', methods=['GET'])
@@ -796,24 +1098,28 @@ def preview_file():
     if not isinstance(month, str) or not re.match(r'^\d{4}-\d{2}$', month):
         return jsonify({'error': f'Invalid month format: {month}. Expected YYYY-MM format'}), 400
     
-    fpath = os.path.join(UPLOAD_FOLDER, str(month), filename)
-    if not os.path.exists(fpath):
+    fpath = upload_store.path(PUBLIC_OWNER, month, filename)
+    if not fpath or not os.path.exists(fpath):
         return jsonify({'error': 'File not found'}), 404
     ext = filename.rsplit('.', 1)[-1].lower()
     if ext in ['xlsx', 'xls', 'csv']:
         try:
-            if ext == 'csv':
-                df = pd.read_csv(fpath)
-            else:
-                df = pd.read_excel(fpath)
-            data = df.head(20).fillna('').values.tolist()
+            df = columnar_table(fpath, ext).frame(nrows=20)
+            data = df.fillna('').values.tolist()
             return jsonify(data)
         except Exception as e:
             return jsonify({'error': f'解析失败: {str(e)}'}), 400
     elif ext in ['png', 'jpg', 'jpeg', 'bmp', 'gif']:
-        with open(fpath, 'rb') as f:
-            b64 = base64.b64encode(f.read()).decode()
-        return jsonify(f'data:image/{ext};base64,{b64}')
+        # 直接返回图片字节：文件名即内容哈希，用作ETag，支持304和Range；thumb=1时返回缓存的缩略图
+        etag = os.path.basename(fpath)
+        mimetype = 'image/jpeg' if ext in ['jpg', 'jpeg'] else f'image/{ext}'
+        if request.args.get('thumb'):
+            try:
+                fpath, mimetype = thumbnail_path(fpath, THUMBNAIL_SIZE)
+            except Exception as e:
+                return jsonify({'error': f'缩略图生成失败: {str(e)}'}), 400
+            etag = f'{etag}-thumb{THUMBNAIL_SIZE}'
+        return send_file(fpath, mimetype=mimetype, conditional=True, etag=etag, max_age=0)
     else:
         return jsonify({'error': '暂不支持预览该类型'}), 400
 
@@ -828,104 +1134,220 @@ def delete_file():
     if not isinstance(month, str) or not re.match(r'^\d{4}-\d{2}$', month):
         return jsonify({'error': f'Invalid month format: {month}. Expected YYYY-MM format'}), 400
     
-    fpath = os.path.join(UPLOAD_FOLDER, str(month), filename)
-    if os.path.exists(fpath):
-        os.remove(fpath)
+    upload_store.delete(PUBLIC_OWNER, month, filename)
+    fact_store.remove(PUBLIC_OWNER, month, filename)
     return jsonify({'success': True})
 
 @app.route('/api/clear_files', methods=['POST'])
 def clear_all_files():
-    if not os.path.exists(UPLOAD_FOLDER):
-        return jsonify({'success': True})
-    for month in os.listdir(UPLOAD_FOLDER):
-        month_folder = os.path.join(UPLOAD_FOLDER, month)
-        if os.path.isdir(month_folder):
-            for fname in os.listdir(month_folder):
-                fpath = os.path.join(month_folder, fname)
-                if os.path.isfile(fpath):
-                    os.remove(fpath)
-            os.rmdir(month_folder)
+    upload_store.delete_scope(PUBLIC_OWNER, '')
+    fact_store.remove_all(PUBLIC_OWNER)
     return jsonify({'success': True})
 
-def analyze_month_logic(month):
-    """分析指定月份的数据，返回结构化数据"""
+ANALYZE_COLUMNS = ['file', 'sheet', 'subject', 'account', 'amount', 'date']
+
+def _table_rows(fname, table):
+    """一个表格文件（列式副本）各sheet中有金额的数据行，返回DataFrame列表，列同ANALYZE_COLUMNS"""
+    frames = []
+    for sheet in table.sheets:
+        if not sheet.header_fixed and not sheet.nrows:
+            continue
+        sheet_name = sheet.name
+        # 各sheet自动检测表头（优先找包含“项目”和“金额”的行），只需读取前几行
+        header_row = statement_header_row(sheet)
+        columns = sheet.columns(header_row)
+        print(f'文件: {fname}, sheet: {sheet_name}, 表头: {columns}')
+        col_map = {}
+        for col in columns:
+            # 每个表头归为subject（主体）/amount（金额）/date（日期）之一，同一角色取靠后的列
+            role = header_roles.match(str(col))
+            if role:
+                col_map[role] = col
+        print(f'字段映射: {col_map}')
+        if not col_map.get('subject') or not col_map.get('amount'):
+            print('字段不全，跳过')
+            continue
+        # 只读取用到的列，提取有amount的有效数据行（按列整体过滤，不再逐行处理）
+        df = sheet.frame(header_row, list(dict.fromkeys(col_map.values())))
+        rows = extract_amount_rows(df, col_map['subject'], col_map['amount'], col_map.get('date'))
+        rows.insert(1, 'account', rows['subject'].map(accounts.match))
+        rows.insert(0, 'sheet', sheet_name)
+        rows.insert(0, 'file', fname)
+        frames.append(rows)
+    return frames
+
+def analyze_month_logic(month, columnar=False, errors=None):
+    """分析指定月份的数据，返回结构化数据：默认为逐行的记录列表，columnar=True时返回 {列名: 数组}
+
+    account为科目名按 config.ACCOUNT_SYNONYMS 归并的标准科目，未能归并时为None
+
+    解析失败的文件不影响其他文件，传入errors列表时会追加 {'file', 'error'}
+    """
     if not month:
         return None
-    month_folder = os.path.join(str(UPLOAD_FOLDER), str(month))
-    if not os.path.exists(month_folder):
+    month_files = upload_store.list(PUBLIC_OWNER, str(month))
+    if not month_files:
         return None
-    results = []
-    for fname in os.listdir(month_folder):
-        fpath = os.path.join(month_folder, fname)
-        ext = fname.rsplit('.', 1)[-1].lower()
+    table_files = []
+    for entry in month_files:
+        ext = entry['name'].rsplit('.', 1)[-1].lower()
+        if ext in ['csv', 'xlsx', 'xls']:
+            table_files.append((entry, ext))
+    # 各文件的列式副本（缺失时在子进程中并行生成），结果按文件顺序返回
+    parsed = columnar_tables([(entry['path'], ext) for entry, ext in table_files])
+    frames = []
+    for (entry, ext), item in zip(table_files, parsed):
+        fname = entry['name']
+        fpath = entry['path']
+        if not item['ok']:
+            print(f'文件解析失败: {fpath}, 错误: {item["error"]}')
+            if errors is not None:
+                errors.append({'file': fname, 'error': item['error']})
+            continue
         try:
-            if ext == 'csv':
-                df = pd.read_csv(fpath)
-            elif ext in ['xlsx', 'xls']:
-                # 自动检测表头行：优先找包含“项目”和“金额”的行
-                header_row = None
-                for i in range(6):  # 前6行内查找
-                    try:
-                        row = pd.read_excel(fpath, header=None, nrows=1, skiprows=i).iloc[0].astype(str).tolist()
-                        if any('项目' in c or '科目' in c or '摘要' in c for c in row) and any('金额' in c or '余额' in c or '收入' in c or '支出' in c for c in row):
-                            header_row = i
-                            break
-                    except Exception as e:
-                        continue
-                if header_row is not None:
-                    df = pd.read_excel(fpath, header=header_row)
-                else:
-                    df = pd.read_excel(fpath)  # 回退默认
-            else:
-                continue
-            print(f'文件: {fname}, 表头: {df.columns.tolist()}')
-            col_map = {}
-            for col in df.columns:
-                # 主体字段
-                if any(key in str(col) for key in ['科目', '项目', '摘要', '资产', '负债', '所有者权益']):
-                    col_map['subject'] = col
-                # 金额字段
-                if any(key in str(col) for key in ['金额', '余额', '收入', '支出', '本期金额', '本月金额', '本年金额', '上期金额', '上年同期']):
-                    col_map['amount'] = col
-                # 日期字段
-                if any(key in str(col) for key in ['日期', '时间', '年', '月']):
-                    col_map['date'] = col
-            print(f'字段映射: {col_map}')
-            if not col_map.get('subject') or not col_map.get('amount'):
-                print('字段不全，跳过')
-                continue
-            for _, row in df.iterrows():
-                subject = row.get(col_map['subject'], '')
-                amount = row.get(col_map['amount'], '')
-                date = row.get(col_map['date'], '') if col_map.get('date') else ''
-                print(f'提取行: subject={subject}, amount={amount}, date={date}')
-                # 只提取有amount的有效数据行
-                if amount != '' and isinstance(amount, (int, float, str)):
-                    try:
-                        if not pd.isna(amount):
-                            results.append({
-                                'file': fname,
-                                'subject': subject,
-                                'amount': amount,
-                                'date': date
-                            })
-                    except Exception as e:
-                        print(f'判断amount isna出错: {e}, amount={amount}')
+            frames.extend(_table_rows(fname, item['value']))
         except Exception as e:
             print(f'文件解析失败: {fpath}, 错误: {e}')
+            if errors is not None:
+                errors.append({'file': fname, 'error': str(e)})
             continue
+    results = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ANALYZE_COLUMNS)
     print(f'分析结果条数: {len(results)}')
-    return results
+    if columnar:
+        return {col: results[col].tolist() for col in ANALYZE_COLUMNS}
+    return to_records(results, ANALYZE_COLUMNS)
+
+def _ingest_month_file(month, fname, digest, ext):
+    """后台生成月份文件的列式副本，并把抽取出的数据行写入事实表（解析失败时记录错误）"""
+    def on_done(table, error):
+        frames = []
+        if table is not None:
+            try:
+                frames = _table_rows(fname, table)
+            except Exception as e:
+                print(f'文件解析失败: {fname}, 错误: {e}')
+                error = str(e)
+        rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ANALYZE_COLUMNS)
+        try:
+            if not fact_store.replace(PUBLIC_OWNER, month, fname, digest, rows, error=error):
+                print(f'文件已删除或被替换，跳过写入事实表: {month}/{fname}')
+        except Exception as e:
+            print(f'事实表写入失败: {month}/{fname}, 错误: {e}')
+
+    ingest_table(upload_store.blob_path(digest), ext, on_done=on_done)
+
+def _month_param(name):
+    value = request.args.get(name)
+    if value and not re.match(r'^\d{4}-\d{2}$', value):
+        raise ValueError(f'Invalid {name} format: {value}. Expected YYYY-MM format')
+    return value or None
+
+def _list_param(name):
+    return [v.strip() for v in request.args.get(name, '').split(',') if v.strip()] or None
+
+@app.route('/api/facts', methods=['GET'])
+def query_facts():
+    """按月份区间查询上传时抽取的数据行，不再读取文件
+
+    参数：from/to 月份区间（YYYY-MM，含两端，可省略一端）；account 标准科目、subject 科目名（逗号分隔，精确匹配）；
+    pivot=account/subject/file/sheet 时返回按该维度×月份汇总的金额，否则返回数据行（最多limit行，默认1000）。
+    pending为区间内还没有抽取完的表格文件数，errors为抽取失败的文件。
+    """
+    try:
+        start, end = _month_param('from'), _month_param('to')
+        limit = int(request.args.get('limit', 1000))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    pivot = request.args.get('pivot')
+    if pivot and pivot not in PIVOT_COLUMNS:
+        return jsonify({'error': f'Invalid pivot: {pivot}. Expected one of {", ".join(PIVOT_COLUMNS)}'}), 400
+    accounts_filter, subjects_filter = _list_param('account'), _list_param('subject')
+    months = [m for m in upload_store.scopes(PUBLIC_OWNER) if (not start or m >= start) and (not end or m <= end)]
+    pending = [(month, name) for month, name, _ in fact_store.unindexed(PUBLIC_OWNER, months)
+               if name.rsplit('.', 1)[-1].lower() in ['csv', 'xlsx', 'xls']]
+    result = {'pending': len(pending), 'errors': fact_store.errors(PUBLIC_OWNER, start, end)}
+    if pivot:
+        result['months'], result['data'] = fact_store.pivot(PUBLIC_OWNER, pivot, start, end, accounts_filter, subjects_filter)
+    else:
+        result['data'] = fact_store.query(PUBLIC_OWNER, start, end, accounts_filter, subjects_filter, limit=max(limit, 0))
+    return jsonify(result)
 
 @app.route('/api/analyze', methods=['GET'])
 def analyze_month():
     month = request.args.get('month')
     if not month:
         return jsonify({'error': 'No month'}), 400
-    results = analyze_month_logic(month)
+    # format=columns 时按列返回数组，大账簿下比逐行记录更紧凑
+    errors = []
+    results = analyze_month_logic(month, columnar=request.args.get('format') == 'columns', errors=errors)
     if results is None:
         return jsonify({'error': 'No data for this month'}), 404
-    return jsonify({'data': results})
+    return jsonify({'data': results, 'errors': errors})
+
+def _uploaded_statement_metrics(months, errors):
+    """公共上传区各月份报表的标准指标，按文件名推断的公司分组：{公司: {月份: {指标名: 数值}}}"""
+    table_files = []
+    for month in months:
+        for entry in upload_store.list(PUBLIC_OWNER, month):
+            ext = entry['name'].rsplit('.', 1)[-1].lower()
+            if ext in ['csv', 'xlsx', 'xls']:
+                table_files.append((month, entry, ext))
+    parsed = columnar_tables([(entry['path'], ext) for _, entry, ext in table_files])
+    data = {}
+    for (month, entry, ext), item in zip(table_files, parsed):
+        fname = entry['name']
+        if not item['ok']:
+            errors.append({'file': fname, 'error': item['error']})
+            continue
+        try:
+            for sheet in item['value'].sheets:
+                if not sheet.nrows:
+                    continue
+                kind, values = normalize_sheet(sheet.raw(), month)
+                if kind:
+                    merge_metrics(data.setdefault(statement_company(fname), {}), month, values)
+        except Exception as e:
+            print(f'文件解析失败: {entry["path"]}, 错误: {e}')
+            errors.append({'file': fname, 'error': str(e)})
+    return data
+
+# 财务比率：GET按公共上传区的报表计算（months为逗号分隔的月份，默认全部月份；公司按文件名区分），
+# POST传 {"companies": {公司: {月份: {指标名: 数值}}}} 直接计算，多家公司的看板一次算出
+@app.route('/api/ratios', methods=['GET', 'POST'])
+def financial_ratios():
+    errors = []
+    if request.method == 'POST':
+        data = (request.get_json(silent=True) or {}).get('companies')
+        if not isinstance(data, dict) or not data:
+            return jsonify({'error': 'No companies'}), 400
+    else:
+        months = [m for m in (request.args.get('months') or '').split(',') if m] or upload_store.scopes(PUBLIC_OWNER)
+        invalid = [m for m in months if not re.match(r'^\d{4}-\d{2}$', m)]
+        if invalid:
+            return jsonify({'error': f'Invalid month format: {invalid[0]}. Expected YYYY-MM format'}), 400
+        data = _uploaded_statement_metrics(months, errors)
+        if not data:
+            return jsonify({'error': 'No statements for these months', 'errors': errors}), 404
+    try:
+        companies, months, cube = metric_cube(data)
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({'error': f'数据格式错误: {str(e)}'}), 400
+    ratios = compute_ratios(cube)
+    return jsonify({
+        'companies': companies,
+        'months': months,
+        'ratios': {name: to_lists(ratios[name]) for name in RATIO_NAMES},
+        'definitions': dict(RATIOS),
+        'errors': errors,
+    })
+
+# 恢复上次退出时未完成的后台任务
+analysis_jobs.resume()
+# 补建事实表：事实表上线前上传的、或上次退出时还没有抽取完的月份文件
+for fact_month, fact_name, fact_digest in fact_store.unindexed(PUBLIC_OWNER):
+    fact_ext = fact_name.rsplit('.', 1)[-1].lower()
+    if fact_ext in ['xlsx', 'xls', 'csv']:
+        _ingest_month_file(fact_month, fact_name, fact_digest, fact_ext)
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""科目/表头匹配基准：标注样例上的精确率、准确率（与原来的子串关键字判断对比），以及大科目表上的匹配吞吐量
+
+用法（在server目录下）：python benchmarks/bench_account_matcher.py [--labels 科目名数量] [--extra-synonyms 扩充的同义词数] [--accuracy-only]
+精确率、准确率低于MIN_PRECISION/MIN_ACCURACY或低于原写法，或几种写法的匹配结果不一致时，以非0状态退出。
+吞吐量对比：逐个同义词做子串查找取最长的朴素写法、Aho-Corasick自动机（不用缓存）、自动机+缓存；
+场景：名称各不相同的大科目表（默认同义词表 / 扩充后的同义词表），以及科目名大量重复的明细账。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from account_taxonomy import TermMatcher, accounts, header_roles  # noqa: E402
+from config import ACCOUNT_SYNONYMS  # noqa: E402
+
+# (表头, 期望角色)
+HEADER_CASES = [
+    ('科目', 'subject'), ('项目', 'subject'), ('摘要', 'subject'), ('科目名称', 'subject'), ('资产', 'subject'),
+    ('负债和所有者权益', 'subject'), ('科目\\时间', 'subject'),
+    ('本期金额', 'amount'), ('本年金额', 'amount'), ('本月金额', 'amount'), ('上期金额', 'amount'),
+    ('上年同期', 'amount'), ('期末余额', 'amount'), ('年初余额', 'amount'), ('收入', 'amount'), ('支出', 'amount'),
+    ('年初数', 'amount'), ('期末数', 'amount'), ('本年累计', 'amount'),
+    ('日期', 'date'), ('记账日期', 'date'), ('会计期间', 'date'), ('月份', 'date'), ('年度', 'date'), ('时间', 'date'),
+    ('凭证号', None), ('备注', None), ('序号', None), ('行次', None), ('附注', None), ('2024-09-30', None),
+    ('单位：元', None), ('编制单位', None),
+]
+# (科目名, 期望的标准科目)
+ACCOUNT_CASES = [
+    ('6001 主营业务收入', '营业收入'), ('6051 其他业务收入', '营业收入'), ('6301 营业外收入', '营业外收入'),
+    ('6401 主营业务成本', '营业成本'), ('6402 其他业务成本', '营业成本'), ('6403 税金及附加', '税金及附加'),
+    ('6601 销售费用-广告费', '销售费用'), ('6602 管理费用-办公费', '管理费用'), ('6603 财务费用-利息收入', '财务费用'),
+    ('6111 投资收益', '投资收益'), ('6711 营业外支出', '营业外支出'), ('6801 所得税费用', '所得税费用'),
+    ('1001 库存现金', '货币资金'), ('1002 银行存款-工商银行', '货币资金'), ('1012 其他货币资金', '货币资金'),
+    ('1121 应收票据', '应收票据'), ('1122 应收账款-客户A', '应收账款'), ('1123 预付账款', '预付账款'),
+    ('1221 其他应收款-员工借款', '其他应收款'), ('1403 原材料', '存货'), ('1405 库存商品', '存货'),
+    ('1511 长期股权投资', '长期股权投资'), ('1601 固定资产', '固定资产'), ('1602 累计折旧', '累计折旧'),
+    ('1604 在建工程', '在建工程'), ('1606 固定资产清理', '固定资产清理'), ('1701 无形资产', '无形资产'),
+    ('1702 累计摊销', '累计摊销'), ('2001 短期借款', '短期借款'), ('2201 应付票据', '应付票据'),
+    ('2202 应付账款-供应商B', '应付账款'), ('2203 预收账款', '预收账款'), ('2211 应付职工薪酬-工资', '应付职工薪酬'),
+    ('2221 应交税费-应交增值税', '应交税费'), ('2221 应交税费-应交所得税', '应交税费'), ('2241 其他应付款', '其他应付款'),
+    ('2501 长期借款', '长期借款'), ('4001 实收资本', '实收资本'), ('4002 资本公积', '资本公积'),
+    ('4101 盈余公积', '盈余公积'), ('4104 利润分配-未分配利润', '未分配利润'),
+    ('营业利润', '营业利润'), ('利润总额', '利润总额'), ('归属于母公司所有者的净利润', '归母净利润'),
+    ('1811 递延所得税资产', None), ('5001 生产成本', None), ('5101 制造费用', None), ('1231 坏账准备', None),
+]
+# 自动机在标注样例上至少要达到的精确率（给出的标准名中正确的比例）与准确率（与期望完全一致的比例）
+MIN_PRECISION = 0.98
+MIN_ACCURACY = 0.95
+# 原来 analyze_month_logic 中的表头关键字
+OLD_HEADER_KEYS = {
+    'subject': ['科目', '项目', '摘要', '资产', '负债', '所有者权益'],
+    'amount': ['金额', '余额', '收入', '支出', '本期金额', '本月金额', '本年金额', '上期金额', '上年同期'],
+    'date': ['日期', '时间', '年', '月'],
+}
+
+
+def old_header_role(header):
+    """原写法：逐个角色做子串判断，一个表头可能同时被当成多个角色；多于一个或没有时记为判断错误/无"""
+    roles = [role for role, keys in OLD_HEADER_KEYS.items() if any(key in header for key in keys)]
+    return roles[0] if len(roles) == 1 else ('多个角色' if roles else None)
+
+
+def naive_account(label):
+    """朴素写法：按标准科目顺序取第一个子串命中的"""
+    for name, words in ACCOUNT_SYNONYMS.items():
+        if any(word in label for word in words):
+            return name
+    return None
+
+
+def naive_longest(label, synonyms):
+    best = None
+    for name, words in synonyms.items():
+        for word in words:
+            if word in label and (best is None or len(word) > best[0]):
+                best = (len(word), name)
+    return best[1] if best else None
+
+
+def accuracy(cases, func):
+    wrong = [(text, expected, func(text)) for text, expected in cases if func(text) != expected]
+    return 1 - len(wrong) / len(cases), wrong
+
+
+def precision(cases, func):
+    """给出了结果（不为None）的样例中结果正确的比例；一个都没有给出时为1"""
+    predicted = [(func(text), expected) for text, expected in cases if func(text) is not None]
+    return sum(got == expected for got, expected in predicted) / len(predicted) if predicted else 1.0
+
+
+def extend_synonyms(count, rng):
+    """在默认同义词表后追加count个随机的四字科目名，模拟企业自定义的大科目体系"""
+    synonyms = dict(ACCOUNT_SYNONYMS)
+    chars = [chr(c) for c in range(0x4e00, 0x4e00 + 600)]
+    for k in range(count):
+        synonyms[f'自定义{k}'] = [''.join(rng.choice(chars) for _ in range(4))]
+    return synonyms
+
+
+def throughput(title, labels, synonyms, matcher):
+    print(f'\n{title}：{len(labels)}个科目名（{len(set(labels))}个不同），同义词{sum(map(len, synonyms.values()))}个')
+    results = []
+    for name, func in (('逐个同义词子串查找', lambda label: naive_longest(label, synonyms)),
+                       ('Aho-Corasick', matcher._match), ('Aho-Corasick+缓存', matcher.match)):
+        matcher.match.cache_clear()
+        start = time.perf_counter()
+        results.append([func(label) for label in labels])
+        elapsed = time.perf_counter() - start
+        print(f'  {name:<16}{elapsed * 1000:>10.1f} ms  {len(labels) / elapsed / 1000:>8.0f}千个/秒')
+    same = results[0] == results[1] == results[2]
+    print(f'  三种写法结果{"一致" if same else "不同"}')
+    return same
+
+
+def make_labels(count, rng):
+    words = [word for synonyms in ACCOUNT_SYNONYMS.values() for word in synonyms]
+    others = ['递延所得税资产', '生产成本', '制造费用', '坏账准备', '待摊费用', '专项储备', '内部往来']
+    suffixes = ['', '', '-客户{}', '-供应商{}', '-{}部门', '-项目{}']
+    labels = []
+    for _ in range(count):
+        base = rng.choice(words) if rng.random() < 0.85 else rng.choice(others)
+        suffix = rng.choice(suffixes).format(rng.randint(1, 5000))
+        labels.append(f'{rng.randint(1000, 6999)} {base}{suffix}')
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--labels', type=int, default=200_000)
+    parser.add_argument('--extra-synonyms', type=int, default=1000)
+    parser.add_argument('--accuracy-only', action='store_true', help='只检查标注样例，不测吞吐量')
+    args = parser.parse_args()
+    failures = []
+
+    for title, cases, old, new in (('表头角色', HEADER_CASES, old_header_role, header_roles.match),
+                                   ('标准科目', ACCOUNT_CASES, naive_account, accounts.match)):
+        old_acc, old_wrong = accuracy(cases, old)
+        new_acc, new_wrong = accuracy(cases, new)
+        old_prec, new_prec = precision(cases, old), precision(cases, new)
+        print(f'{title}：{len(cases)}个样例，原写法精确率 {old_prec:.1%}、准确率 {old_acc:.1%}，'
+              f'自动机精确率 {new_prec:.1%}、准确率 {new_acc:.1%}')
+        for text, expected, got in old_wrong:
+            print(f'    原写法错误：{text} -> {got}（应为{expected}）')
+        for text, expected, got in new_wrong:
+            print(f'    自动机错误：{text} -> {got}（应为{expected}）')
+        if new_prec < max(MIN_PRECISION, old_prec):
+            failures.append(f'{title}精确率 {new_prec:.1%} 低于 {max(MIN_PRECISION, old_prec):.1%}')
+        if new_acc < max(MIN_ACCURACY, old_acc):
+            failures.append(f'{title}准确率 {new_acc:.1%} 低于 {max(MIN_ACCURACY, old_acc):.1%}')
+
+    if not args.accuracy_only:
+        rng = random.Random(0)
+        labels = make_labels(args.labels, rng)
+        extended = extend_synonyms(args.extra_synonyms, rng)
+        ledger = [rng.choice(labels[:3000]) for _ in range(args.labels)]
+        for title, names, synonyms, matcher in (('大科目表', labels, ACCOUNT_SYNONYMS, accounts),
+                                                ('大科目表+扩充同义词表', labels, extended, TermMatcher(extended)),
+                                                ('明细账（科目名重复）', ledger, ACCOUNT_SYNONYMS, accounts)):
+            if not throughput(title, names, synonyms, matcher):
+                failures.append(f'{title}：几种写法的匹配结果不一致')
+
+    if failures:
+        print('\n检查不通过：')
+        for failure in failures:
+            print(f'  {failure}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""列式副本基准：对比重复分析时每次重新解析xlsx/csv与内存映射读取列式副本的耗时，并校验结果一致
+
+用法（在server目录下）：python benchmarks/bench_columnar_reads.py [文件 ...] [-n 重复次数] [--rows 合成大表行数]
+默认使用项目根目录下的样例报表，另外生成一个合成的大表（xlsx和csv各一份，带两行标题）。
+每个文件输出：一次性生成副本的耗时、重新解析整个工作簿的耗时、读取副本全部列/只读分析用到的列的耗时。
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from columnar_store import ColumnarTable, columnar_dir, write_columnar  # noqa: E402
+from statement_tables import statement_header_row  # noqa: E402
+from table_engines import read_spreadsheet  # noqa: E402
+
+SAMPLE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_synthetic(rows, folder):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        '科目': rng.choice(['营业收入', '营业成本', '销售费用', '管理费用', '财务费用'], rows),
+        '本期金额': rng.normal(1e5, 3e4, rows).round(2),
+        '上期金额': rng.normal(1e5, 3e4, rows).round(2),
+        '日期': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D'),
+        '部门': rng.choice(['财务部', '销售部', '生产部'], rows),
+        '备注': rng.choice(['', '调整', '重分类'], rows),
+    })
+    xlsx = os.path.join(folder, f'synthetic_{rows}.xlsx')
+    csv = os.path.join(folder, f'synthetic_{rows}.csv')
+    with pd.ExcelWriter(xlsx) as writer:
+        pd.DataFrame([['利润明细表'], ['单位：元']]).to_excel(writer, index=False, header=False)
+        df.to_excel(writer, index=False, startrow=2)
+    df.to_csv(csv, index=False)
+    return [xlsx, csv]
+
+
+def best_of(repeat, func):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_file(fpath, folder, repeat):
+    ext = fpath.rsplit('.', 1)[-1].lower()
+    directory = columnar_dir(os.path.join(folder, os.path.basename(fpath)))
+    if ext == 'csv':
+        parse = lambda: read_spreadsheet(fpath, ext)
+        build = lambda: write_columnar(directory, [(None, parse())], header_fixed=True)
+    else:
+        parse = lambda: read_spreadsheet(fpath, ext, header=None, sheet_name=None)
+        build = lambda: write_columnar(directory, list(parse().items()))
+    t_build, _ = best_of(1, build)
+    t_parse, _ = best_of(repeat, parse)
+
+    def read_all():
+        table = ColumnarTable.open(directory)
+        return [sheet.frame(statement_header_row(sheet)) for sheet in table.sheets if sheet.nrows]
+
+    def read_used():
+        # 与analyze_month_logic相同：检测表头后只读取科目、金额两列
+        table = ColumnarTable.open(directory)
+        frames = []
+        for sheet in table.sheets:
+            if not sheet.nrows:
+                continue
+            header_row = statement_header_row(sheet)
+            columns = sheet.columns(header_row)
+            frames.append(sheet.frame(header_row, columns[:2]))
+        return frames
+
+    t_all, frames = best_of(repeat, read_all)
+    t_used, used = best_of(repeat, read_used)
+    same = all(f[u.columns].equals(u) for f, u in zip(frames, used))
+    return t_build, t_parse, t_all, t_used, same
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('-n', '--repeat', type=int, default=3)
+    parser.add_argument('--rows', type=int, default=200_000, help='合成大表的行数，0表示不生成')
+    args = parser.parse_args()
+    files = args.files or sorted(glob.glob(os.path.join(SAMPLE_DIR, '*.xlsx')))
+    with tempfile.TemporaryDirectory() as folder:
+        if not args.files and args.rows:
+            files += make_synthetic(args.rows, folder)
+        print(f'{"文件":<36}{"生成副本":>10}{"重新解析":>10}{"读全部列":>10}{"读用到的列":>10}{"加速":>8}')
+        for fpath in files:
+            t_build, t_parse, t_all, t_used, same = bench_file(fpath, folder, args.repeat)
+            print(f'{os.path.basename(fpath)[:34]:<36}{t_build * 1000:>10.1f}{t_parse * 1000:>10.1f}'
+                  f'{t_all * 1000:>10.1f}{t_used * 1000:>10.1f}{t_parse / t_used:>7.1f}x  {"一致" if same else "结果不同"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""事实表基准：N个月×每月F个文件×每个文件R行写入事实表后，跨月份查询（按科目筛选、按科目/科目名×月份透视）的耗时，
+与不走索引的全表扫描对比，并校验结果一致
+
+用法（在server目录下）：python benchmarks/bench_facts.py [--months N] [--files F] [--rows R]
+"""
+import argparse
+import io
+import math
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from account_taxonomy import accounts  # noqa: E402
+from config import ACCOUNT_SYNONYMS  # noqa: E402
+from fact_store import FactStore  # noqa: E402
+from upload_store import UploadStore  # noqa: E402
+
+OWNER = 'public'
+
+
+def make_rows(count, rng, words):
+    subjects = [f'{rng.randint(1000, 6999)} {rng.choice(words)}' for _ in range(count)]
+    return pd.DataFrame({
+        'sheet': 'Sheet1',
+        'subject': subjects,
+        'account': [accounts.match(s) for s in subjects],
+        'amount': [round(rng.uniform(-1e6, 1e6), 2) for _ in range(count)],
+        'date': '',
+    })
+
+
+def timed(func, repeat=5):
+    """取repeat次中最快的一次，返回 (结果, 毫秒)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--months', type=int, default=36)
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=1500)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    words = [word for synonyms in ACCOUNT_SYNONYMS.values() for word in synonyms] + ['生产成本', '制造费用']
+    months = [f'{2020 + j // 12:04d}-{j % 12 + 1:02d}' for j in range(args.months)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        uploads = UploadStore(db_path, os.path.join(tmp, 'blobs'))
+        facts = FactStore(db_path)
+        frames = [make_rows(args.rows, rng, words) for _ in range(args.files)]
+        start = time.perf_counter()
+        for month in months:
+            for k, frame in enumerate(frames):
+                name = f'账簿{k}.csv'
+                digest = uploads.put(OWNER, month, name, io.BytesIO(f'{month}/{name}'.encode()))
+                facts.replace(OWNER, month, name, digest, frame)
+        t_write = time.perf_counter() - start
+        total = args.months * args.files * args.rows
+        print(f'{args.months}个月 × {args.files}个文件 × {args.rows}行 = {total}行，'
+              f'写入 {t_write:.1f} s（{total / t_write / 1000:.0f}千行/秒）')
+
+        start_month, end_month = months[len(months) // 3], months[-1]
+        conn = sqlite3.connect(db_path)
+        subject = frames[0]['subject'][0]
+        cases = [
+            ('一个科目跨月份明细（前1000行）',
+             lambda: facts.query(OWNER, start_month, end_month, ['营业收入'], limit=1000),
+             '''SELECT COUNT(*) FROM (SELECT 1 FROM facts NOT INDEXED WHERE owner=? AND month>=? AND month<=?
+                AND canonical_account='营业收入' ORDER BY month, file, row LIMIT 1000)''', ()),
+            ('两个科目×月份透视',
+             lambda: facts.pivot(OWNER, 'account', start_month, end_month, ['营业收入', '货币资金']),
+             '''SELECT canonical_account, month, SUM(amount) FROM facts NOT INDEXED WHERE owner=? AND month>=?
+                AND month<=? AND canonical_account IN ('营业收入', '货币资金') GROUP BY canonical_account, month''', ()),
+            ('全部科目×月份透视',
+             lambda: facts.pivot(OWNER, 'account', start_month, end_month),
+             '''SELECT canonical_account, month, SUM(amount) FROM facts NOT INDEXED WHERE owner=? AND month>=?
+                AND month<=? GROUP BY canonical_account, month''', ()),
+            ('一个科目名×月份透视',
+             lambda: facts.pivot(OWNER, 'subject', start_month, end_month, subjects=[subject]),
+             '''SELECT subject, month, SUM(amount) FROM facts NOT INDEXED WHERE owner=? AND month>=?
+                AND month<=? AND subject=? GROUP BY subject, month''', (subject,)),
+        ]
+        print(f'查询区间 {start_month} ~ {end_month}')
+        for title, indexed, scan_sql, extra in cases:
+            result, t_indexed = timed(indexed)
+            params = (OWNER, start_month, end_month) + extra
+            scanned, t_scan = timed(lambda: conn.execute(scan_sql, params).fetchall())
+            if isinstance(result, tuple):
+                rows = {(row['key'], month): value for row in result[1] for month, value in zip(result[0], row['values'])
+                        if value is not None}
+                same = rows.keys() == {(key, month) for key, month, _ in scanned} and all(
+                    math.isclose(rows[(key, month)], value, rel_tol=1e-9, abs_tol=1e-6) for key, month, value in scanned)
+            else:
+                same = len(result) == scanned[0][0]
+            print(f'  {title:<20}索引 {t_indexed:>8.1f} ms  全表扫描 {t_scan:>8.1f} ms  '
+                  f'加速 {t_scan / t_indexed:>5.1f}x  结果{"一致" if same else "不同"}')
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
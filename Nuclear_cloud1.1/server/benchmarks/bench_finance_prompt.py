@@ -0,0 +1,68 @@
+"""财务分析提示词体积：对比把报表原样 to_string 发送与本地提取为月份×指标表格后的字符数，并列出提取到的指标
+
+用法（在server目录下）：python benchmarks/bench_finance_prompt.py [文件:YYYY-MM ...] [--months 模拟月数]
+默认使用项目根目录下的三张样例报表（利润表2024-09、资产负债表2024-12、现金流量表2025-03），
+--months 大于1时把每张报表复制到连续多个月，模拟一年的上传量。
+"""
+import argparse
+import os
+import re
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from statement_normalizer import METRIC_NAMES, merge_metrics, metric_table_text, normalize_sheet  # noqa: E402
+
+SAMPLE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SAMPLES = [('2024.9利润表（无时间）.xlsx', '2024-09'), ('2024.12资产负债表（无时间）.xlsx', '2024-12'),
+           ('2025.3现金流量表（无时间）.xlsx', '2025-03')]
+
+
+def shift_month(month, n):
+    year, mon = map(int, month.split('-'))
+    total = year * 12 + mon - 1 + n
+    return f'{total // 12:04d}-{total % 12 + 1:02d}'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='*', help='文件:YYYY-MM')
+    parser.add_argument('--months', type=int, default=1)
+    args = parser.parse_args()
+    if args.files:
+        items = [tuple(arg.rsplit(':', 1)) for arg in args.files]
+    else:
+        items = [(os.path.join(SAMPLE_DIR, name), month) for name, month in SAMPLES]
+    raw_chars = 0
+    metrics = {}
+    for fpath, month in items:
+        # 原来的做法：默认参数读取第一个sheet后整表to_string
+        if fpath.endswith('.csv'):
+            dump = pd.read_csv(fpath).to_string(index=False)
+            raw = {None: pd.read_csv(fpath, header=None)}
+        else:
+            dump = pd.read_excel(fpath).to_string(index=False)
+            raw = pd.read_excel(fpath, header=None, sheet_name=None)
+        found = {}
+        kinds = []
+        for df in raw.values():
+            kind, values = normalize_sheet(df, month)
+            if kind:
+                kinds.append(kind)
+                found.update({k: v for k, v in values.items() if k not in found})
+        print(f'{os.path.basename(fpath)[:30]:<32}{month:<9}{"/".join(kinds) or "未识别":<8}'
+              f'{len(found):>3}项  {", ".join(n for n in METRIC_NAMES if n in found)}')
+        for i in range(args.months):
+            shifted = shift_month(month, -i)
+            raw_chars += len(f'时间戳: {shifted}\n文件名: {os.path.basename(fpath)}\n文件类型: xlsx\n文件内容:\n{dump}\n{"=" * 50}')
+            merge_metrics(metrics, shifted, found)
+    table = metric_table_text(metrics)
+    print()
+    print(table if len(table) < 2000 else re.sub(r'\n.*', '', table) + f'\n...（共{len(metrics)}个月）')
+    print()
+    print(f'原始内容 {raw_chars} 字符，指标表格 {len(table)} 字符，缩小 {raw_chars / len(table):.1f} 倍')
+
+
+if __name__ == '__main__':
+    main()
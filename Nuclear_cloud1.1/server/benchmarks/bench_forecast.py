@@ -0,0 +1,99 @@
+"""本地预测引擎基准：耗时，以及留出最后几个月回测时与“沿用最后一个值”相比的平均绝对百分比误差（MAPE）
+
+用法（在server目录下）：python benchmarks/bench_forecast.py [-n 每种序列的样本数] [--horizon 预测月数]
+合成序列：线性增长、带季节波动的增长（12/24/36个月）、季度报表（每3个月一个点）。
+另有几条短序列的回归检查（两个点、震荡、线性），不通过时以非0状态退出。
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from forecast import finance_series, forecast_series, holt_forecast, month_index, month_str, predict_months  # noqa: E402
+
+START = month_index('2022-01')
+
+
+def make_series(kind, length, rng):
+    t = np.arange(length + 6)
+    base = 1e6 * (1 + 0.02 * t)
+    if kind == 'seasonal':
+        base *= 1 + 0.15 * np.sin(2 * np.pi * t / 12)
+    values = base * (1 + rng.normal(0, 0.03, len(t)))
+    step = 3 if kind == 'quarterly' else 1
+    return {month_str(START + i): float(values[i]) for i in range(0, len(t), step)}
+
+
+def mape(pred, actual):
+    pairs = [(pred[m], v) for m, v in actual.items() if pred.get(m) is not None]
+    return float(np.mean([abs(p - v) / abs(v) for p, v in pairs])) if pairs else float('nan')
+
+
+def regression_checks():
+    """短序列的预测不应外推失控：两个点沿用最后一个值，震荡序列不越出历史区间太多，线性序列仍沿趋势增长"""
+    failures = []
+
+    def check(ok, message):
+        print(f'  {"通过" if ok else "失败"}：{message}')
+        if not ok:
+            failures.append(message)
+
+    print('回归检查')
+    pred = holt_forecast(np.array([54.7, 22.4]), 3)
+    check(np.allclose(pred, 22.4), f'两个点 [54.7, 22.4] 沿用最后一个值（实际为{np.round(pred, 1).tolist()}）')
+    pred, method = forecast_series({'2024-08': 54.7, '2024-09': 22.4}, predict_months('2024-09', 3))
+    check(method == 'flat' and all(v == 22.4 for v in pred.values()),
+          f'两个月的观测值按flat预测（实际为{method}、{list(pred.values())}）')
+    y = np.array([100.0, 110.0, 100.0, 110.0])
+    pred = holt_forecast(y, 3)
+    limit = y.max() + 0.1 * (y.max() - y.min())
+    check(pred.max() <= limit and pred.min() >= y.min(),
+          f'震荡序列 {y.tolist()} 的预测在 [{y.min()}, {limit}] 内（实际为{np.round(pred, 1).tolist()}）')
+    y = np.arange(100.0, 160.0, 10.0)
+    pred = holt_forecast(y, 3)
+    check(y[-1] < pred[0] < pred[1] < pred[2] <= y[-1] + 3 * 10,
+          f'线性序列 {y.tolist()} 的预测继续增长且不超过线性外推（实际为{np.round(pred, 1).tolist()}）')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=200)
+    parser.add_argument('--horizon', type=int, default=3)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    print(f'{"序列":<16}{"方法":<10}{"平均耗时ms":>12}{"引擎MAPE":>10}{"沿用末值MAPE":>14}')
+    for kind, length in [('linear', 12), ('seasonal', 12), ('seasonal', 24), ('seasonal', 36), ('quarterly', 12)]:
+        errors, naive, times, method = [], [], [], None
+        for _ in range(args.n):
+            points = make_series(kind, length, rng)
+            history = {m: v for m, v in points.items() if month_index(m) < START + length}
+            last = max(history)
+            future = predict_months(last, args.horizon)
+            actual = {m: points[m] for m in future if m in points}
+            start = time.perf_counter()
+            pred, method = forecast_series(history, future)
+            times.append(time.perf_counter() - start)
+            errors.append(mape(pred, actual))
+            naive.append(mape({m: history[last] for m in future}, actual))
+        print(f'{kind + str(length):<16}{method:<10}{np.mean(times) * 1000:>12.2f}'
+              f'{np.nanmean(errors):>10.1%}{np.nanmean(naive):>14.1%}')
+
+    # 一次完整的图表计算（6个序列，24个月历史）
+    metrics = {month_str(START + i): {'营业收入': 1e6 + i * 1e4, '净利润': 1e5 + i * 1e3, '期末现金余额': 5e5,
+                                      '经营现金流': 2e5, '投资现金流': -1e5, '筹资现金流': -5e4} for i in range(24)}
+    months = sorted(metrics)
+    start = time.perf_counter()
+    for _ in range(args.n):
+        finance_series(metrics, months, predict_months(months[-1], 6))
+    print(f'\nfinance_series（24个月历史，预测6个月）：{(time.perf_counter() - start) / args.n * 1000:.2f} ms/次\n')
+
+    if regression_checks():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""表头检测基准：旧版逐行探测（最多6次read_excel + 1次全量读取）对比单次解析后在内存中检测
+
+用法（在server目录下）：python benchmarks/bench_header_detection.py [xlsx文件 ...] [-n 重复次数]
+默认使用项目根目录下的 利润表/资产负债表/现金流量表 样例文件。不经过解析缓存，测的是纯解析开销。
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from statement_tables import HEADER_SCAN_ROWS, detect_header_row, apply_header  # noqa: E402
+
+SAMPLE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def legacy_parse(fpath):
+    """旧版analyze_month_logic的读取方式，返回 (DataFrame, read_excel调用次数)"""
+    opens = 0
+    header_row = None
+    for i in range(HEADER_SCAN_ROWS):
+        try:
+            opens += 1
+            row = pd.read_excel(fpath, header=None, nrows=1, skiprows=i).iloc[0].astype(str).tolist()
+            if any('项目' in c or '科目' in c or '摘要' in c for c in row) and any('金额' in c or '余额' in c or '收入' in c or '支出' in c for c in row):
+                header_row = i
+                break
+        except Exception:
+            continue
+    opens += 1
+    if header_row is not None:
+        return pd.read_excel(fpath, header=header_row), opens
+    return pd.read_excel(fpath), opens
+
+
+def single_pass_parse(fpath):
+    """新版：整个工作簿只解析一次，返回第一个sheet的DataFrame"""
+    raw = next(iter(pd.read_excel(fpath, header=None, sheet_name=None).values()))
+    header_row = detect_header_row(raw)
+    return apply_header(raw, header_row if header_row is not None else 0), 1
+
+
+def bench(func, fpath, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(fpath)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('-n', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+    files = args.files or sorted(glob.glob(os.path.join(SAMPLE_DIR, '*.xlsx')))
+    if not files:
+        print('未找到样例文件')
+        return
+    total_old = total_new = 0
+    print(f"{'文件':<30}{'旧版(ms)':>10}{'打开次数':>8}{'新版(ms)':>10}{'加速':>8}  结果一致")
+    for fpath in files:
+        t_old, (df_old, opens) = bench(legacy_parse, fpath, args.repeat)
+        t_new, (df_new, _) = bench(single_pass_parse, fpath, args.repeat)
+        same = list(map(str, df_old.columns)) == list(map(str, df_new.columns)) and \
+            df_old.astype(str).values.tolist() == df_new.astype(str).values.tolist()
+        total_old += t_old
+        total_new += t_new
+        print(f'{os.path.basename(fpath):<30}{t_old * 1000:>10.1f}{opens:>8}{t_new * 1000:>10.1f}{t_old / t_new:>7.1f}x  {same}')
+    print(f"{'合计':<30}{total_old * 1000:>10.1f}{'':>8}{total_new * 1000:>10.1f}{total_old / total_new:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""财务比率基准：M家公司×N个月一次性向量化计算，与逐家公司、逐月份用Python计算对比耗时，并校验结果一致
+
+用法（在server目录下）：python benchmarks/bench_ratios.py [--companies M] [--months N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ratios import RATIO_NAMES, compute_ratios, metric_cube  # noqa: E402
+from statement_normalizer import METRIC_NAMES  # noqa: E402
+
+
+def make_data(companies, months, rng):
+    data = {}
+    for i in range(companies):
+        by_month = {}
+        for j in range(months):
+            values = {name: float(v) for name, v in zip(METRIC_NAMES, rng.normal(1e8, 3e7, len(METRIC_NAMES)))}
+            # 部分月份缺少某张报表
+            if rng.random() < 0.1:
+                for name in ('经营现金流', '投资现金流', '筹资现金流', '现金净增加额', '期末现金余额'):
+                    values.pop(name)
+            by_month[f'{2020 + j // 12:04d}-{j % 12 + 1:02d}'] = values
+        data[f'公司{i:04d}'] = by_month
+    return data
+
+
+def div(a, b):
+    return a / b if a is not None and b else None
+
+
+def loop_ratios(data):
+    """逐家公司、逐月份计算，作为对照"""
+    out = {name: [] for name in RATIO_NAMES}
+    for company in sorted(data):
+        rows = {name: [] for name in RATIO_NAMES}
+        prev_revenue = prev_profit = None
+        for month in sorted(data[company]):
+            v = data[company][month]
+            g = v.get
+            revenue = g('营业收入') if g('营业收入') is not None else g('营业总收入')
+            current = g('流动资产合计')
+            quick = current - g('存货') if current is not None and g('存货') is not None else None
+            rows['毛利率'].append(div(revenue - g('营业成本'), revenue) if revenue is not None and g('营业成本') is not None else None)
+            rows['营业利润率'].append(div(g('营业利润'), revenue))
+            rows['净利润率'].append(div(g('净利润'), revenue))
+            rows['流动比率'].append(div(current, g('流动负债合计')))
+            rows['速动比率'].append(div(quick, g('流动负债合计')))
+            rows['现金比率'].append(div(g('货币资金'), g('流动负债合计')))
+            rows['资产负债率'].append(div(g('负债合计'), g('资产合计')))
+            rows['权益乘数'].append(div(g('资产合计'), g('所有者权益合计')))
+            rows['ROE'].append(div(g('净利润'), g('所有者权益合计')))
+            rows['ROA'].append(div(g('净利润'), g('资产合计')))
+            rows['净现比'].append(div(g('经营现金流'), g('净利润')))
+            rows['收入增长率'].append(div(revenue - prev_revenue, abs(prev_revenue)) if revenue is not None and prev_revenue else None)
+            rows['净利润增长率'].append(div(g('净利润') - prev_profit, abs(prev_profit)) if g('净利润') is not None and prev_profit else None)
+            prev_revenue, prev_profit = revenue, g('净利润')
+        for name in RATIO_NAMES:
+            out[name].append(rows[name])
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--companies', type=int, default=1000)
+    parser.add_argument('--months', type=int, default=36)
+    args = parser.parse_args()
+    data = make_data(args.companies, args.months, np.random.default_rng(0))
+
+    start = time.perf_counter()
+    _, _, cube = metric_cube(data)
+    t_cube = time.perf_counter() - start
+    start = time.perf_counter()
+    ratios = compute_ratios(cube)
+    t_vector = time.perf_counter() - start
+    start = time.perf_counter()
+    expected = loop_ratios(data)
+    t_loop = time.perf_counter() - start
+
+    same = all(np.allclose(ratios[name], np.array(expected[name], dtype=float), equal_nan=True) for name in RATIO_NAMES)
+    print(f'{args.companies}家公司 × {args.months}个月，{len(RATIO_NAMES)}个比率')
+    print(f'组装数组 {t_cube * 1000:.1f} ms，向量化计算 {t_vector * 1000:.1f} ms，逐家逐月计算 {t_loop * 1000:.1f} ms，'
+          f'计算部分加速 {t_loop / t_vector:.0f}x，结果{"一致" if same else "不同"}')
+
+
+if __name__ == '__main__':
+    main()
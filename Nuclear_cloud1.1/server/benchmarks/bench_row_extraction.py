@@ -0,0 +1,82 @@
+"""明细行提取基准：旧版iterrows逐行判断对比向量化的extract_amount_rows + to_records
+
+新版耗时包含组装成记录列表（/api/analyze默认返回格式）；列式耗时为format=columns时的开销。
+
+用法（在server目录下）：python benchmarks/bench_row_extraction.py [-r 行数 ...] [--legacy-max 行数]
+使用合成账簿（金额列混有数字、空字符串、空值和日期），同时校验两种方式结果一致。
+旧版在大行数下非常慢，超过--legacy-max的规模只测新版。
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from statement_tables import extract_amount_rows, to_records  # noqa: E402
+
+
+def make_ledger(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    amounts = rng.normal(1e5, 3e4, rows).round(2).astype(object)
+    kind = rng.integers(0, 20, rows)
+    amounts[kind == 0] = ''
+    amounts[kind == 1] = None
+    amounts[kind == 2] = '1,234.00'
+    amounts[kind == 3] = datetime(2024, 9, 30)
+    return pd.DataFrame({
+        '科目': rng.choice(['营业收入', '营业成本', '销售费用', '管理费用', '财务费用'], rows),
+        '本期金额': amounts,
+        '日期': pd.date_range('2020-01-01', periods=rows, freq='min').strftime('%Y-%m-%d'),
+    })
+
+
+def legacy_extract(df, subject_col, amount_col, date_col):
+    results = []
+    for _, row in df.iterrows():
+        subject = row.get(subject_col, '')
+        amount = row.get(amount_col, '')
+        date = row.get(date_col, '') if date_col else ''
+        if amount != '' and isinstance(amount, (int, float, str)):
+            try:
+                if not pd.isna(amount):
+                    results.append({'subject': subject, 'amount': amount, 'date': date})
+            except Exception:
+                pass
+    return results
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-r', '--rows', type=int, nargs='*', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--legacy-max', type=int, default=100_000)
+    args = parser.parse_args()
+    print(f"{'行数':>10}{'旧版(s)':>10}{'新版(s)':>10}{'列式(s)':>10}{'新版行/秒':>14}{'加速':>8}  结果一致")
+    for rows in args.rows:
+        df = make_ledger(rows)
+        start = time.perf_counter()
+        rows_df = extract_amount_rows(df, '科目', '本期金额', '日期')
+        t_extract = time.perf_counter() - start
+        new = to_records(rows_df, ['subject', 'amount', 'date'])
+        t_new = time.perf_counter() - start
+        t_columnar = t_extract + _timed(lambda: {col: rows_df[col].tolist() for col in rows_df.columns})
+        if rows <= args.legacy_max:
+            start = time.perf_counter()
+            old = legacy_extract(df, '科目', '本期金额', '日期')
+            t_old = time.perf_counter() - start
+            print(f'{rows:>10}{t_old:>10.3f}{t_new:>10.3f}{t_columnar:>10.3f}{rows / t_new:>14,.0f}{t_old / t_new:>7.1f}x  {old == new}')
+        else:
+            print(f"{rows:>10}{'-':>10}{t_new:>10.3f}{t_columnar:>10.3f}{rows / t_new:>14,.0f}{'-':>8}  -")
+
+
+if __name__ == '__main__':
+    main()
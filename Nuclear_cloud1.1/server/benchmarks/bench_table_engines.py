@@ -0,0 +1,130 @@
+"""表格读取引擎基准：对比各Excel/CSV引擎在报表文件上的解析耗时，并校验结果与基准引擎一致
+
+用法（在server目录下）：python benchmarks/bench_table_engines.py [文件 ...] [-n 重复次数] [--rows 合成大表行数]
+默认使用项目根目录下的 利润表/资产负债表/现金流量表 样例，另外生成一个合成的大表（xlsx和csv各一份），
+以及一个含日期、空值、缺失金额等写法的明细账csv，用于核对各CSV引擎的读取结果是否与c引擎一致。
+结果用于选择 config.py 中 EXCEL_ENGINES / CSV_ENGINES 的默认顺序；“结果不同”时会列出第一处差异。
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from table_engines import EXCEL_ENGINE_EXTS, engine_available  # noqa: E402
+
+SAMPLE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+EXCEL_CANDIDATES = ['openpyxl', 'calamine', 'xlrd']
+CSV_CANDIDATES = ['c', 'pyarrow', 'python']
+
+
+def make_synthetic(rows, folder):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        '科目': rng.choice(['营业收入', '营业成本', '销售费用', '管理费用', '财务费用'], rows),
+        '本期金额': rng.normal(1e5, 3e4, rows).round(2),
+        '上期金额': rng.normal(1e5, 3e4, rows).round(2),
+        '备注': rng.choice(['', '调整', '重分类'], rows),
+    })
+    xlsx = os.path.join(folder, f'synthetic_{rows}.xlsx')
+    csv = os.path.join(folder, f'synthetic_{rows}.csv')
+    df.to_excel(xlsx, index=False)
+    df.to_csv(csv, index=False)
+    return [xlsx, csv]
+
+
+# 明细账中常见的写法：日期列、空金额、“--”、NA/空字符串、带前导零的编码
+LEDGER_CSV = """科目,科目编码,金额,日期,备注
+6001 主营业务收入,0600101,1200.50,2024-09-01,
+1002 银行存款,01002,,2024-09-02,NA
+6602 管理费用,06602,--,2024-09-03,调整
+2221 应交税费,02221,-35.2,,N/A
+合计,,1165.3,2024-09-30,
+"""
+
+
+def make_ledger_csv(folder):
+    path = os.path.join(folder, 'ledger_parity.csv')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(LEDGER_CSV)
+    return path
+
+
+def frame_diff(a, b):
+    """两个读取结果的第一处差异（含列名、类型），相同时返回None"""
+    if isinstance(a, dict):
+        if a.keys() != b.keys():
+            return f'sheet不同: {list(a)} / {list(b)}'
+        return next((diff for k in a for diff in [frame_diff(a[k], b[k])] if diff), None)
+    if list(map(str, a.columns)) != list(map(str, b.columns)):
+        return f'列名不同: {list(a.columns)} / {list(b.columns)}'
+    if a.shape != b.shape:
+        return f'形状不同: {a.shape} / {b.shape}'
+    for col in a.columns:
+        left, right = a[col].tolist(), b[col].tolist()
+        for i, (x, y) in enumerate(zip(left, right)):
+            if not (pd.isna(x) and pd.isna(y)) and (type(x) is not type(y) or x != y):
+                return f'列{col}第{i}行: {x!r}（{type(x).__name__}） / {y!r}（{type(y).__name__}）'
+    return None
+
+
+def bench_file(fpath, repeat):
+    ext = fpath.rsplit('.', 1)[-1].lower()
+    if ext == 'csv':
+        reader, engines, kwargs = pd.read_csv, CSV_CANDIDATES, {}
+    else:
+        reader, engines, kwargs = pd.read_excel, [e for e in EXCEL_CANDIDATES if ext in EXCEL_ENGINE_EXTS[e]], {'sheet_name': None}
+    rows = []
+    baseline = None
+    for engine in engines:
+        if not engine_available(engine):
+            rows.append((engine, None, '未安装'))
+            continue
+        best = float('inf')
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = reader(fpath, engine=engine, **kwargs)
+                best = min(best, time.perf_counter() - start)
+        except Exception as e:
+            rows.append((engine, None, f'失败: {e}'))
+            continue
+        if baseline is None:
+            baseline = result
+            rows.append((engine, best, '基准'))
+        else:
+            diff = frame_diff(baseline, result)
+            rows.append((engine, best, f'结果不同: {diff}' if diff else '一致'))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('-n', '--repeat', type=int, default=3)
+    parser.add_argument('--rows', type=int, default=100_000, help='合成大表的行数，0表示不生成')
+    args = parser.parse_args()
+    files = args.files or sorted(glob.glob(os.path.join(SAMPLE_DIR, '*.xlsx')))
+    with tempfile.TemporaryDirectory() as folder:
+        if not args.files and args.rows:
+            files += make_synthetic(args.rows, folder)
+        if not args.files:
+            files.append(make_ledger_csv(folder))
+        for fpath in files:
+            print(os.path.basename(fpath))
+            rows = bench_file(fpath, args.repeat)
+            base = next((t for _, t, note in rows if note == '基准'), None)
+            for engine, t, note in rows:
+                if t is None:
+                    print(f'  {engine:<10}{"-":>12}{"":>8}  {note}')
+                else:
+                    print(f'  {engine:<10}{t * 1000:>10.1f}ms{base / t:>7.1f}x  {note}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""OCR进程池的错误隔离检查：识别失败的图片（如未安装tesseract）、子进程抛出无法反序列化的异常时，
+调用方应得到带原异常类型名的RuntimeError，进程池不被重建，同时在执行的其他调用不受影响
+
+用法（在server目录下）：python benchmarks/check_ocr_pool.py，检查不通过时以非0状态退出
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+from PIL import Image
+
+
+# 子进程在导入file_parsers时fork，要在子进程中执行的函数需定义在导入之前
+class UnpicklableError(Exception):
+    """构造参数与args不一致，反序列化时会失败（与pytesseract.TesseractNotFoundError相同）"""
+
+    def __init__(self):
+        super().__init__('无法反序列化的异常')
+
+
+def raise_unpicklable():
+    raise UnpicklableError()
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from file_parsers import ocr_pool  # noqa: E402
+from ocr import ocr_image  # noqa: E402
+
+
+def main():
+    failures = []
+
+    def check(ok, message):
+        print(f'  {"通过" if ok else "失败"}：{message}')
+        if not ok:
+            failures.append(message)
+
+    workers = ocr_pool._get_pool()
+    folder = tempfile.mkdtemp()
+    try:
+        image = os.path.join(folder, 'blank.png')
+        Image.new('RGB', (400, 200), 'white').save(image)
+        cases = [('无法反序列化的异常', raise_unpicklable, ())]
+        if shutil.which('tesseract') is None:
+            cases.append(('未安装tesseract时识别图片', ocr_image, (image,)))
+        else:
+            print('已安装tesseract，跳过未安装时的检查')
+        for title, func, args in cases:
+            print(title)
+            results = {}
+
+            def call(name, f, a):
+                try:
+                    results[name] = ('ok', ocr_pool.run(f, *a))
+                except Exception as e:
+                    results[name] = (type(e).__name__, str(e))
+
+            # 失败的调用与其他调用同时执行
+            threads = [threading.Thread(target=call, args=('failing', func, args))]
+            threads += [threading.Thread(target=call, args=(f'other{i}', os.getpid, ())) for i in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            kind, message = results['failing']
+            check(kind == 'RuntimeError', f'失败的调用抛出RuntimeError（实际为{kind}: {message}）')
+            others = [results[f'other{i}'][0] for i in range(4)]
+            check(others == ['ok'] * 4, f'同时执行的其他调用都成功（实际为{others}）')
+            check(ocr_pool._get_pool() is workers and not workers.retired, '进程池没有被终止或重建')
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""报表指标提取检查：statement_normalizer经account_taxonomy.accounts归并科目名后，示例报表提取的指标与数值不变，
+带序号、前缀、单位的项目名和“其中”明细行能正确归并，带编码的明细账不被当成报表
+
+用法（在server目录下）：python benchmarks/check_statement_normalizer.py，检查不通过时以非0状态退出
+"""
+import glob
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from account_taxonomy import accounts  # noqa: E402
+from statement_normalizer import METRIC_NAMES, clean_label, normalize_sheet  # noqa: E402
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+# 项目根目录下的示例报表：文件名关键字 -> (报表类型, 指标)
+SAMPLES = {
+    '利润表': ('利润表', {
+        '营业总收入': 290122946680, '营业收入': 290122946680, '营业成本': 214646146400, '营业利润': 21950481850,
+        '利润总额': 23418484600, '净利润': 18972914600, '归母净利润': 8338223900}),
+    '资产负债表': ('资产负债表', {
+        '货币资金': 54712783700, '存货': 2462505100, '流动资产合计': 158807525600, '资产合计': 672836701600,
+        '流动负债合计': 265979677600, '负债合计': 304048390400, '所有者权益合计': 368788311300}),
+    '现金流量表': ('现金流量表', {
+        '经营现金流': 7846183100, '投资现金流': -10385648553, '筹资现金流': -3570876530,
+        '现金净增加额': -6108587300, '期末现金余额': 22377977900}),
+}
+# (报表中的项目名, 期望的标准指标)；不是标准指标的项目期望为None
+LABEL_CASES = [
+    ('一、营业总收入', '营业总收入'), ('营业收入（元）', '营业收入'), ('其中：主营业务收入', '营业收入'),
+    ('减：营业成本', '营业成本'), ('二、营业利润（亏损以“－”号填列）', '营业利润'), ('三、利润总额', '利润总额'),
+    ('四、净利润（万元）', '净利润'), ('归属于母公司所有者的净利润', '归母净利润'),
+    ('归属于母公司股东的净利润', '归母净利润'), ('1、货币资金', '货币资金'), ('存货', '存货'),
+    ('流动资产合计', '流动资产合计'), ('资产总计', '资产合计'), ('流动负债合计', '流动负债合计'),
+    ('负债合计', '负债合计'), ('所有者权益（或股东权益）合计', '所有者权益合计'), ('股东权益合计', '所有者权益合计'),
+    ('经营活动产生的现金流量净额', '经营现金流'), ('投资活动产生的现金流量净额', '投资现金流'),
+    ('筹资活动产生的现金流量净额', '筹资现金流'), ('五、现金及现金等价物净增加额', '现金净增加额'),
+    ('六、期末现金及现金等价物余额', '期末现金余额'),
+    ('非流动资产合计', None), ('非流动负债合计', None), ('应收账款', None), ('固定资产', None),
+    ('递延所得税资产', None), ('销售费用', None), ('基本每股收益', None), ('项目', None),
+]
+MONTH = '2024-09'
+
+
+def metric(text):
+    """项目名归并到的标准指标，不是标准指标时为None"""
+    name = accounts.match(clean_label(text)[0])
+    return name if name in METRIC_NAMES else None
+
+
+def sheet(header, rows):
+    return pd.DataFrame([header] + [list(row) for row in rows])
+
+
+def main():
+    failures = []
+
+    def check(ok, message):
+        print(f'  {"通过" if ok else "失败"}：{message}')
+        if not ok:
+            failures.append(message)
+
+    print('示例报表')
+    for keyword, expected in SAMPLES.items():
+        paths = glob.glob(os.path.join(SAMPLE_DIR, f'*{keyword}*.xlsx'))
+        if not paths:
+            print(f'  没有找到{keyword}示例文件，跳过')
+            continue
+        raw = pd.read_excel(paths[0], header=None)
+        got = normalize_sheet(raw, MONTH)
+        check(got == expected, f'{os.path.basename(paths[0])} 提取 {len(got[1])} 项指标，与预期一致'
+                               if got == expected else f'{os.path.basename(paths[0])} 提取结果为 {got}')
+
+    print('项目名归并')
+    wrong = [(text, expected, metric(text)) for text, expected in LABEL_CASES if metric(text) != expected]
+    for text, expected, got in wrong:
+        print(f'    {text}: 期望 {expected}，实际 {got}')
+    check(not wrong, f'{len(LABEL_CASES) - len(wrong)}/{len(LABEL_CASES)} 个项目名归并正确')
+
+    print('合成报表')
+    income = sheet(['项目', '2024年9月', '2024年8月'], [
+        ('一、营业总收入（万元）', 1.2, 1.1), ('营业收入', 10000, 9000), ('其中：主营业务收入', 8000, 7000),
+        ('其他业务收入', 2000, 2000), ('减：营业成本', 6000, 5000), ('三、营业利润', 3000, 2500),
+        ('四、净利润', 2000, 1800), ('其中：持续经营净利润', 2000, 1800)])
+    check(normalize_sheet(income, MONTH) == ('利润表', {
+        '营业总收入': 12000, '营业收入': 10000, '营业成本': 6000, '营业利润': 3000, '净利润': 2000}),
+        '“其中”明细行不与指标行冲突，单位换算、按月份取金额列')
+    check(normalize_sheet(income, '2024-08')[1].get('营业收入') == 9000, '按表头月份取上月金额列')
+    detail_only = sheet(['项目', '本期金额'], [('其中：主营业务收入', 8000), ('减：营业成本', 6000)])
+    check(normalize_sheet(detail_only, MONTH) == ('利润表', {'营业收入': 8000, '营业成本': 6000}),
+          '没有“营业收入”行时取同义词“主营业务收入”')
+    balance = sheet(['资产', '期末余额'], [
+        ('1、货币资金', 500), ('流动资产合计', 3000), ('非流动资产合计', 5000), ('资产总计', 8000),
+        ('流动负债合计', 2000), ('非流动负债合计', 1000), ('负债合计', 3000)])
+    check(normalize_sheet(balance, MONTH) == ('资产负债表', {
+        '货币资金': 500, '流动资产合计': 3000, '资产合计': 8000, '流动负债合计': 2000, '负债合计': 3000}),
+        '“非流动资产合计”等不归入“流动资产合计”')
+    conflict = sheet(['科目', '金额'], [('货币资金', 500), ('存货', 300), ('存货', 400)])
+    check(normalize_sheet(conflict, MONTH) == ('资产负债表', {'货币资金': 500}), '同一指标数值不同时不采用')
+    ledger = sheet(['科目', '金额'], [('1002 银行存款-工商银行', 500), ('1405 库存商品', 300),
+                                    ('6001 主营业务收入', 900), ('6401 主营业务成本', 600)])
+    check(normalize_sheet(ledger, MONTH) == (None, {}), '带编码的明细账不当成报表')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+import os
+import pickle
+import shutil
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+
+from statement_tables import HEADER_SCAN_ROWS, header_names
+
+# 列式副本保存在原文件旁的 <原文件>.columnar/ 目录，随原文件一起删除
+COLUMNAR_SUFFIX = '.columnar'
+# 2：CSV默认改回c引擎读取，之前由pyarrow引擎生成的副本（日期列为日期对象）需要重建
+FORMAT_VERSION = 2
+# 每个sheet的前HEAD_ROWS行（表头检测范围）单独保存为Python对象，其余数据行按列存为Arrow IPC文件
+HEAD_ROWS = HEADER_SCAN_ROWS
+
+
+def columnar_dir(path):
+    return path + COLUMNAR_SUFFIX
+
+
+def _arrow_columns(body):
+    """把数据行转换为Arrow表（列名为列序号）；Arrow无法原样往返的列（如数字与文字混排）单独返回，以pickle保存"""
+    arrow = []
+    mixed = {}
+    for j in range(body.shape[1]):
+        col = body.iloc[:, j]
+        try:
+            back = pa.Table.from_pandas(col.to_frame('v'), preserve_index=False).to_pandas()['v']
+            if back.dtype == col.dtype and back.equals(col):
+                arrow.append(j)
+                continue
+        except (pa.ArrowException, TypeError, ValueError):
+            pass
+        mixed[j] = col.tolist()
+    columns = body.iloc[:, arrow]
+    columns.columns = [str(j) for j in arrow]
+    return pa.Table.from_pandas(columns, preserve_index=False), mixed
+
+
+def _cell(value):
+    # 与pandas的Excel引擎一致：整数值的浮点单元格为int（原始表格中因同列有小数被转成了float）
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _infer_body(raw_body):
+    """按数据行本身推断各列类型，与 pd.read_excel(header=...) 只根据表头之后的数据推断一致"""
+    columns = {}
+    for j in range(raw_body.shape[1]):
+        col = raw_body.iloc[:, j]
+        if pd.api.types.is_float_dtype(col) and len(col) and col.notna().all() and (col % 1 == 0).all():
+            col = col.astype('int64')
+        elif not pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_datetime64_any_dtype(col):
+            # 文字列可能只是因为表头是文字，去掉表头后重新推断
+            col = col.astype(object).infer_objects()
+        columns[j] = col
+    return pd.DataFrame(columns, index=raw_body.index)
+
+
+def write_columnar(directory, sheets, header_fixed=False):
+    """把 [(sheet名, DataFrame)] 写为列式副本
+
+    header_fixed=False时DataFrame为header=None读出的原始表格，读取时再指定表头行；
+    header_fixed=True时（csv）DataFrame已带表头，原样保存。先写临时目录再整体改名，读者不会看到写了一半的副本。
+    """
+    tmp = f'{directory}.{uuid.uuid4().hex}.tmp'
+    os.makedirs(tmp)
+    try:
+        manifest = {'version': FORMAT_VERSION, 'header_fixed': header_fixed, 'sheets': []}
+        for i, (name, df) in enumerate(sheets):
+            if header_fixed:
+                head = None
+                body = df.reset_index(drop=True)
+            else:
+                head = [[_cell(v) for v in row] for row in df.iloc[:HEAD_ROWS].astype(object).values.tolist()]
+                body = _infer_body(df.iloc[HEAD_ROWS:].reset_index(drop=True))
+            table, mixed = _arrow_columns(body)
+            with pa.OSFile(os.path.join(tmp, f'{i}.arrow'), 'wb') as sink:
+                # 不压缩，读取时可直接内存映射
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            if mixed:
+                with open(os.path.join(tmp, f'{i}.mixed.pkl'), 'wb') as f:
+                    pickle.dump(mixed, f, protocol=pickle.HIGHEST_PROTOCOL)
+            manifest['sheets'].append({
+                'name': name,
+                'columns': list(df.columns) if header_fixed else None,
+                'ncols': df.shape[1],
+                'head': head,
+                'body_rows': len(body),
+                'mixed': sorted(mixed),
+            })
+        with open(os.path.join(tmp, 'manifest.pkl'), 'wb') as f:
+            pickle.dump(manifest, f, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            os.replace(tmp, directory)
+        except OSError:
+            # 其他进程已写好同一份副本
+            if not os.path.isdir(directory):
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _combine(head_values, body):
+    """表头之后、HEAD_ROWS之内的几行与数据行拼成一列，与pd.read_excel一样按表头之后的全部数据推断类型"""
+    if not head_values:
+        # 表头之后没有数据时与pd.read_excel一样为object列
+        return body if len(body) else body.astype(object)
+    head = pd.Series(head_values, dtype=object)
+    if not len(body):
+        return head.infer_objects()
+    if body.dtype == object:
+        # 写入时已对数据行推断过类型，仍为object说明整列混合类型
+        return pd.concat([head, body], ignore_index=True)
+    typed = head.infer_objects()
+    if typed.dtype == body.dtype or (
+            pd.api.types.is_numeric_dtype(typed) and not pd.api.types.is_bool_dtype(typed)
+            and pd.api.types.is_numeric_dtype(body) and not pd.api.types.is_bool_dtype(body)):
+        # 同类型（或都是数值）时直接拼接，不必把整列转成Python对象
+        return pd.concat([typed, body], ignore_index=True)
+    return pd.concat([head, body.astype(object)], ignore_index=True).infer_objects()
+
+
+class ColumnarSheet:
+    def __init__(self, directory, index, meta):
+        self.name = meta['name']
+        self.header_fixed = meta['columns'] is not None
+        self.ncols = meta['ncols']
+        self.nrows = (0 if self.header_fixed else len(meta['head'])) + meta['body_rows']
+        self._meta = meta
+        self._path = os.path.join(directory, f'{index}.arrow')
+        self._mixed_path = os.path.join(directory, f'{index}.mixed.pkl')
+        self._table = None
+
+    @property
+    def head(self):
+        """前HEAD_ROWS行的原始表格（header=None读出的形式），用于检测表头"""
+        if self.header_fixed:
+            return pd.DataFrame()
+        return pd.DataFrame(self._meta['head'], columns=range(self.ncols), dtype=object)
+
+    def columns(self, header_row=0):
+        if self.header_fixed:
+            return list(self._meta['columns'])
+        if header_row >= len(self._meta['head']):
+            return []
+        return header_names(self._meta['head'][header_row])
+
+    def _body_table(self):
+        if self._table is None:
+            # 内存映射读取：只有实际访问到的列才会从磁盘读入
+            self._table = pa.ipc.open_file(pa.memory_map(self._path, 'r')).read_all()
+        return self._table
+
+    def _body_columns(self, positions, nrows):
+        arrow = [p for p in positions if p not in self._meta['mixed']]
+        result = {}
+        if arrow:
+            table = self._body_table().select([str(p) for p in arrow])
+            if nrows is not None:
+                table = table.slice(0, nrows)
+            df = table.to_pandas()
+            for p in arrow:
+                result[p] = df[str(p)]
+        if len(arrow) < len(positions):
+            with open(self._mixed_path, 'rb') as f:
+                mixed = pickle.load(f)
+            for p in positions:
+                if p in mixed:
+                    values = mixed[p] if nrows is None else mixed[p][:nrows]
+                    result[p] = pd.Series(values, dtype=object)
+        return result
+
+    def raw(self):
+        """header=None形式的原始表格（列名为列序号，首行起为表格内容），用于按版式识别报表"""
+        positions = list(range(self.ncols))
+        body = self._body_columns(positions, None)
+        body = pd.DataFrame({p: body[p] for p in positions}, columns=positions)
+        if self.header_fixed:
+            head = pd.DataFrame([self._meta['columns']], columns=positions, dtype=object)
+        else:
+            head = pd.DataFrame(self._meta['head'], columns=positions, dtype=object)
+        return pd.concat([head, body], ignore_index=True)
+
+    def frame(self, header_row=0, columns=None, nrows=None):
+        """返回与 apply_header(原始表格, header_row) 相同的DataFrame，只读取columns指定的列、前nrows行
+
+        header_fixed的sheet忽略header_row。
+        """
+        names = self.columns(header_row)
+        if not names:
+            return pd.DataFrame()
+        positions = list(range(len(names))) if columns is None else [names.index(c) for c in columns]
+        head_rows = [] if self.header_fixed else self._meta['head'][header_row + 1:]
+        # 表头后的几行始终全部参与类型推断；数据行至少读1行，保留其类型
+        body = self._body_columns(positions, None if nrows is None else max(nrows - len(head_rows), 1))
+        df = pd.DataFrame({names[p]: _combine([row[p] for row in head_rows], body[p]) for p in positions},
+                          columns=[names[p] for p in positions])
+        return df if nrows is None else df.head(nrows)
+
+
+class ColumnarTable:
+    """一个表格文件的列式副本，sheets按工作簿中的顺序排列（csv只有一个name为None的sheet）"""
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.sheets = [ColumnarSheet(directory, i, meta) for i, meta in enumerate(manifest['sheets'])]
+
+    @classmethod
+    def open(cls, directory):
+        """副本不存在或格式版本不符时返回None"""
+        try:
+            with open(os.path.join(directory, 'manifest.pkl'), 'rb') as f:
+                manifest = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if manifest.get('version') != FORMAT_VERSION:
+            return None
+        return cls(directory, manifest)
+
+    def frame(self, nrows=None):
+        """与 pd.read_excel(path) / pd.read_csv(path) 默认读取结果相同：第一个sheet，首行为表头"""
+        if not self.sheets:
+            return pd.DataFrame()
+        return self.sheets[0].frame(0, nrows=nrows)
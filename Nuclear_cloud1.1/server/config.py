@@ -2,4 +2,152 @@ DEEPSEEK_API_TOKEN = "your-deepseek-api-token"
 DATABASE_PATH = "db/app.db"
 UPLOAD_FOLDER = "uploads" 
 SECRET_KEY = 'your-very-secret-key-123456'
-JWT_SECRET_KEY = 'your-very-secret-key-123456' 
\ No newline at end of file
+JWT_SECRET_KEY = 'your-very-secret-key-123456' 
+
+# DeepSeek 接口配置：共享连接池大小（同时也是上游并发上限）与各接口超时（秒）
+DEEPSEEK_API_URL = "https://api.deepseek.com/chat/completions"
+DEEPSEEK_MODEL = "deepseek-chat"
+LLM_POOL_SIZE = 10
+LLM_CONNECT_TIMEOUT = 5
+LLM_TIMEOUTS = {
+    'ask': 60,
+    'report': 60,
+    'finance': 120,
+    'finance_map': 60,
+    'summary': 30,
+}
+
+# DeepSeek 响应缓存：内存LRU + SQLite磁盘层，仅对列出的接口生效
+LLM_CACHE_ENDPOINTS = ['finance', 'finance_map']
+LLM_CACHE_PATH = "db/llm_cache.db"
+LLM_CACHE_MEMORY_ITEMS = 256
+LLM_CACHE_TTL = 7 * 24 * 3600
+LLM_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# 后台分析任务：并发worker数、排队上限，以及执行进程在其他主机上（无法判断是否存活）时多久没有心跳的running任务视为中断
+ANALYZE_WORKERS = 2
+ANALYZE_MAX_PENDING = 20
+JOB_STALE_SECONDS = 600
+
+# DeepSeek 上游限流：并发上限、令牌桶速率/突发、排队上限与排队超时（秒）
+LLM_MAX_CONCURRENCY = 8
+LLM_RATE_PER_SECOND = 5
+LLM_BURST = 10
+LLM_MAX_QUEUE = 50
+LLM_QUEUE_TIMEOUT = 30
+# 429/5xx 重试：最多重试次数，指数退避的基数和上限（秒），优先遵循Retry-After
+LLM_MAX_RETRIES = 3
+LLM_BACKOFF_BASE = 1
+LLM_BACKOFF_MAX = 30
+
+# 相同payload的并发请求合并为一次上游调用（single-flight），仅对列出的接口生效
+LLM_COALESCE_ENDPOINTS = ['report', 'finance', 'finance_map']
+
+# 财务分析map-reduce：月份数或原始内容长度超过阈值时，先按月并行汇总再做最终分析
+FINANCE_MAP_REDUCE_MIN_MONTHS = 6
+FINANCE_MAP_REDUCE_MAX_CHARS = 60000
+FINANCE_MAP_WORKERS = 4
+
+# 智能助手会话上下文：最近对话的token预算，超出部分折叠为滚动摘要（摘要最大字数）
+CONTEXT_TOKEN_BUDGET = 3000
+CONTEXT_SUMMARY_MAX_CHARS = 500
+
+# 上传文件解析结果缓存（按文件内容SHA-256），内存与磁盘层的容量上限（字节）
+PARSE_CACHE_DIR = "cache/parsed"
+PARSE_CACHE_MEMORY_BYTES = 256 * 1024 * 1024
+PARSE_CACHE_DISK_BYTES = 2 * 1024 * 1024 * 1024
+
+# 多文件上传的并行解析：子进程数与单个文件的解析超时（秒）
+PARSE_WORKERS = 4
+PARSE_TIMEOUT = 60
+
+# 表格读取引擎：按顺序尝试，未安装或不支持该文件/参数时回退到下一个
+# calamine需安装python-calamine，pyarrow需安装pyarrow；默认值依据 benchmarks/bench_table_engines.py 的结果
+# CSV默认用pandas的c引擎：pyarrow引擎会把日期样式的列读成日期对象、空值的表示也不同，
+# 会改变分析结果中的date等字段；可改为 ['pyarrow', 'c'] 换取更快的大文件读取
+EXCEL_ENGINES = ['calamine', 'openpyxl', 'xlrd']
+CSV_ENGINES = ['c']
+
+# 图片OCR：独立的子进程池（不占用表格解析的子进程），单张图片的识别超时（秒）
+OCR_WORKERS = 2
+OCR_TIMEOUT = 120
+# OCR前的预处理：缩小到目标DPI（不放大，0表示不缩放）、灰度化、二值化（Otsu阈值）
+OCR_TARGET_DPI = 300
+OCR_GRAYSCALE = True
+OCR_BINARIZE = True
+
+# PDF文本提取：默认最多提取的页数（0表示不限）、每个子进程任务的页数、写入提问的最大字数
+PDF_MAX_PAGES = 50
+PDF_PAGES_PER_TASK = 8
+PDF_MAX_CHARS = 60000
+
+# 图片预览缩略图的长边像素数（/api/preview?thumb=1），首次请求时生成并缓存在原文件旁
+THUMBNAIL_SIZE = 256
+
+# 科目/表头同义词表：编译为Aho-Corasick自动机（account_taxonomy.py），一次扫描完成匹配
+# 一个名称包含多个同义词时取最长的；长度相同时取排在前面的标准名
+# 表头角色：subject为科目列，amount为金额列，date为日期列（不用单字“年”“月”，避免“本年金额”被当成日期列）
+HEADER_ROLE_SYNONYMS = {
+    'subject': ['科目', '项目', '摘要', '资产', '负债', '所有者权益'],
+    'amount': ['金额', '余额', '收入', '支出', '本期金额', '本月金额', '本年金额', '上期金额', '上年同期',
+               '期末数', '期初数', '年初数', '本年累计'],
+    'date': ['日期', '时间', '年月', '月份', '期间', '年度'],
+}
+# 标准科目：明细账、科目余额表中的科目名（可带编码、明细后缀），以及三张报表的项目名归并到的标准科目
+# statement_normalizer.METRICS中的指标名都是这里的标准科目；“非流动资产合计”等单独列出，避免被更短的“流动资产合计”匹配
+ACCOUNT_SYNONYMS = {
+    '营业总收入': ['营业总收入'],
+    '营业收入': ['营业收入', '主营业务收入', '其他业务收入', '销售收入'],
+    '营业成本': ['营业成本', '主营业务成本', '其他业务成本', '销售成本'],
+    '税金及附加': ['税金及附加', '营业税金及附加'],
+    '销售费用': ['销售费用', '营业费用'],
+    '管理费用': ['管理费用'],
+    '研发费用': ['研发费用', '研发支出'],
+    '财务费用': ['财务费用'],
+    '投资收益': ['投资收益'],
+    '营业外收入': ['营业外收入'],
+    '营业外支出': ['营业外支出'],
+    '所得税费用': ['所得税费用'],
+    '营业利润': ['营业利润'],
+    '利润总额': ['利润总额'],
+    '净利润': ['净利润'],
+    '归母净利润': ['归属于母公司所有者的净利润', '归属于母公司股东的净利润'],
+    '货币资金': ['货币资金', '库存现金', '银行存款', '其他货币资金'],
+    '应收票据': ['应收票据'],
+    '应收账款': ['应收账款'],
+    '预付账款': ['预付账款', '预付款项'],
+    '其他应收款': ['其他应收款'],
+    '存货': ['存货', '库存商品', '原材料', '在产品', '周转材料'],
+    '长期股权投资': ['长期股权投资'],
+    '固定资产': ['固定资产'],
+    '累计折旧': ['累计折旧'],
+    '固定资产清理': ['固定资产清理'],
+    '在建工程': ['在建工程'],
+    '无形资产': ['无形资产'],
+    '累计摊销': ['累计摊销'],
+    '短期借款': ['短期借款'],
+    '应付票据': ['应付票据'],
+    '应付账款': ['应付账款'],
+    '预收账款': ['预收账款', '预收款项'],
+    '合同负债': ['合同负债'],
+    '应付职工薪酬': ['应付职工薪酬'],
+    '应交税费': ['应交税费'],
+    '其他应付款': ['其他应付款'],
+    '长期借款': ['长期借款'],
+    '实收资本': ['实收资本', '股本'],
+    '资本公积': ['资本公积'],
+    '盈余公积': ['盈余公积'],
+    '未分配利润': ['未分配利润', '利润分配'],
+    '流动资产合计': ['流动资产合计'],
+    '非流动资产合计': ['非流动资产合计'],
+    '资产合计': ['资产合计', '资产总计'],
+    '流动负债合计': ['流动负债合计'],
+    '非流动负债合计': ['非流动负债合计'],
+    '负债合计': ['负债合计'],
+    '所有者权益合计': ['所有者权益（或股东权益）合计', '所有者权益合计', '股东权益合计'],
+    '经营现金流': ['经营活动产生的现金流量净额'],
+    '投资现金流': ['投资活动产生的现金流量净额'],
+    '筹资现金流': ['筹资活动产生的现金流量净额'],
+    '现金净增加额': ['现金及现金等价物净增加额'],
+    '期末现金余额': ['期末现金及现金等价物余额'],
+}
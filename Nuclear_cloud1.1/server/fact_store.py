@@ -0,0 +1,203 @@
+import sqlite3
+import time
+
+import pandas as pd
+
+from statement_normalizer import to_number
+
+# 可作为透视维度的字段 -> facts表的列
+PIVOT_COLUMNS = {'account': 'canonical_account', 'subject': 'subject', 'file': 'file', 'sheet': 'sheet'}
+
+
+def _text(value):
+    """单元格转为字符串，空值和空字符串为None"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)) or value == '':
+        return None
+    return str(value)
+
+
+class FactStore:
+    """上传表格中抽取出的数据行（事实表），按月份、标准科目建索引，跨月查询不必再读取文件
+
+    与UploadStore共用同一个SQLite数据库：
+      facts        每行一条 (owner, month, file, file_hash, sheet, row, subject, canonical_account, amount, date)，
+                   amount为数值（无法转为数值的金额为NULL），row为该行在文件中的顺序
+      fact_totals  每个文件各sheet、各标准科目的金额合计，与facts在同一事务中写入；
+                   按科目/文件/sheet透视且不按科目名筛选时直接汇总这张小表，不必扫描明细行
+      fact_files   已抽取的逻辑文件及其内容哈希、行数、错误信息，用于判断哪些文件还没有抽取
+    写入时在同一事务中核对upload_files，抽取期间文件已被删除或替换时放弃写入。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''CREATE TABLE IF NOT EXISTS facts (
+                owner TEXT NOT NULL,
+                month TEXT NOT NULL,
+                file TEXT NOT NULL,
+                file_hash TEXT NOT NULL,
+                sheet TEXT,
+                row INTEGER NOT NULL,
+                subject TEXT,
+                canonical_account TEXT,
+                amount REAL,
+                date TEXT
+            )''')
+            # 按科目名、标准科目筛选的索引带上amount，汇总时只读索引不回表
+            c.execute('CREATE INDEX IF NOT EXISTS idx_facts_file ON facts (owner, month, file)')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_facts_account ON facts (owner, canonical_account, month, amount)')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_facts_subject ON facts (owner, subject, month, amount)')
+            c.execute('''CREATE TABLE IF NOT EXISTS fact_totals (
+                owner TEXT NOT NULL,
+                month TEXT NOT NULL,
+                file TEXT NOT NULL,
+                sheet TEXT,
+                canonical_account TEXT,
+                amount REAL,
+                rows INTEGER NOT NULL
+            )''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_fact_totals ON fact_totals (owner, month, file)')
+            c.execute('''CREATE TABLE IF NOT EXISTS fact_files (
+                owner TEXT NOT NULL,
+                month TEXT NOT NULL,
+                file TEXT NOT NULL,
+                file_hash TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                error TEXT,
+                indexed_at REAL NOT NULL,
+                PRIMARY KEY (owner, month, file)
+            )''')
+            conn.commit()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def replace(self, owner, month, name, digest, rows, error=None):
+        """写入一个逻辑文件抽取出的数据行（DataFrame，含sheet/subject/account/amount/date列），替换该文件原有的行
+
+        文件当前的内容哈希不是digest（已删除或被同名文件替换）时不写入，返回是否写入。
+        """
+        values = [(str(owner), month, name, digest, _text(sheet), i, _text(subject), _text(account),
+                   to_number(amount), _text(date))
+                  for i, (sheet, subject, account, amount, date) in enumerate(
+                      zip(rows['sheet'], rows['subject'], rows['account'], rows['amount'], rows['date']))]
+        totals = {}
+        for value in values:
+            total = totals.setdefault((value[4], value[7]), [None, 0])
+            if value[8] is not None:
+                total[0] = value[8] if total[0] is None else total[0] + value[8]
+            total[1] += 1
+        conn = self._connect()
+        try:
+            c = conn.cursor()
+            c.execute('BEGIN IMMEDIATE')
+            try:
+                c.execute('SELECT hash FROM upload_files WHERE owner=? AND scope=? AND name=?', (str(owner), month, name))
+                row = c.fetchone()
+                if not row or row[0] != digest:
+                    c.execute('ROLLBACK')
+                    return False
+                c.execute('DELETE FROM facts WHERE owner=? AND month=? AND file=?', (str(owner), month, name))
+                c.execute('DELETE FROM fact_totals WHERE owner=? AND month=? AND file=?', (str(owner), month, name))
+                c.executemany('''INSERT INTO facts (owner, month, file, file_hash, sheet, row, subject,
+                                 canonical_account, amount, date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', values)
+                c.executemany('''INSERT INTO fact_totals (owner, month, file, sheet, canonical_account, amount, rows)
+                                 VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                              [(str(owner), month, name, sheet, account, amount, count)
+                               for (sheet, account), (amount, count) in totals.items()])
+                c.execute('''INSERT OR REPLACE INTO fact_files (owner, month, file, file_hash, rows, error, indexed_at)
+                             VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                          (str(owner), month, name, digest, len(values), error, time.time()))
+                c.execute('COMMIT')
+            except Exception:
+                c.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+        return True
+
+    def _delete_where(self, where, args):
+        conn = self._connect()
+        try:
+            c = conn.cursor()
+            c.execute('BEGIN IMMEDIATE')
+            try:
+                for table in ('facts', 'fact_totals', 'fact_files'):
+                    c.execute(f'DELETE FROM {table} WHERE {where}', args)
+                c.execute('COMMIT')
+            except Exception:
+                c.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+
+    def remove(self, owner, month, name):
+        self._delete_where('owner=? AND month=? AND file=?', (str(owner), month, name))
+
+    def remove_all(self, owner):
+        self._delete_where('owner=?', (str(owner),))
+
+    def unindexed(self, owner, months=None):
+        """还没有抽取（或抽取后被替换）的逻辑文件：[(month, name, hash)]，months为None时不限月份"""
+        sql = '''SELECT u.scope, u.name, u.hash FROM upload_files u
+                 LEFT JOIN fact_files f ON f.owner=u.owner AND f.month=u.scope AND f.file=u.name AND f.file_hash=u.hash
+                 WHERE u.owner=? AND f.file IS NULL'''
+        args = [str(owner)]
+        if months is not None:
+            sql += f' AND u.scope IN ({",".join("?" * len(months))})'
+            args += list(months)
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(sql + ' ORDER BY u.scope, u.created_at', args).fetchall()
+
+    def errors(self, owner, start=None, end=None):
+        where, args = self._where(owner, start, end)
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(f'SELECT month, file, error FROM fact_files WHERE {where} AND error IS NOT NULL', args)
+            return [{'month': month, 'file': name, 'error': error} for month, name, error in rows.fetchall()]
+
+    @staticmethod
+    def _where(owner, start=None, end=None, accounts=None, subjects=None):
+        where = ['owner=?']
+        args = [str(owner)]
+        if start:
+            where.append('month>=?')
+            args.append(start)
+        if end:
+            where.append('month<=?')
+            args.append(end)
+        for column, values in (('canonical_account', accounts), ('subject', subjects)):
+            if values:
+                where.append(f'{column} IN ({",".join("?" * len(values))})')
+                args += list(values)
+        return ' AND '.join(where), args
+
+    def query(self, owner, start=None, end=None, accounts=None, subjects=None, limit=1000):
+        """按月份区间（含两端）、标准科目、科目名筛选数据行，按月份、文件、行序返回，最多limit行"""
+        where, args = self._where(owner, start, end, accounts, subjects)
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.execute(f'''SELECT month, file, sheet, subject, canonical_account, amount, date FROM facts
+                                 WHERE {where} ORDER BY month, file, row LIMIT ?''', args + [limit])
+            return [{'month': month, 'file': name, 'sheet': sheet, 'subject': subject, 'account': account,
+                     'amount': amount, 'date': date} for month, name, sheet, subject, account, amount, date in c.fetchall()]
+
+    def pivot(self, owner, by='account', start=None, end=None, accounts=None, subjects=None):
+        """按 by（account/subject/file/sheet）× 月份汇总金额，返回 (月份列表, [{'key': 维度值, 'values': [各月合计]}])
+
+        没有数据的月份为None；未能归并到标准科目等维度值为空的行汇总在key为None的一行（排在最后）
+        """
+        column = PIVOT_COLUMNS[by]
+        where, args = self._where(owner, start, end, accounts, subjects)
+        # 科目名不在fact_totals中，按科目名透视或筛选时才汇总明细行
+        table = 'facts' if by == 'subject' or subjects else 'fact_totals'
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.execute(f'''SELECT {column}, month, SUM(amount) FROM {table} WHERE {where}
+                                 GROUP BY {column}, month''', args)
+            cells = c.fetchall()
+        months = sorted({month for _, month, _ in cells})
+        position = {month: j for j, month in enumerate(months)}
+        grid = {}
+        for key, month, total in cells:
+            grid.setdefault(key, [None] * len(months))[position[month]] = total
+        keys = sorted(grid, key=lambda k: (k is None, k or ''))
+        return months, [{'key': key, 'values': grid[key]} for key in keys]
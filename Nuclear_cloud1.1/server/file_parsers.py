@@ -0,0 +1,147 @@
+import os
+import shutil
+
+import docx
+
+from config import PARSE_CACHE_DIR, PARSE_CACHE_MEMORY_BYTES, PARSE_CACHE_DISK_BYTES
+from config import PARSE_WORKERS, PARSE_TIMEOUT
+from config import OCR_WORKERS, OCR_TIMEOUT, OCR_TARGET_DPI, OCR_GRAYSCALE, OCR_BINARIZE
+from config import PDF_MAX_PAGES, PDF_PAGES_PER_TASK
+from columnar_store import ColumnarTable, columnar_dir, write_columnar
+from ocr import OcrStats, ocr_image
+from parse_cache import ParseCache
+from parse_pool import ParsePool
+from pdf_pages import extract_pages, page_count, parse_page_ranges
+from single_flight import SingleFlight
+from table_engines import read_spreadsheet
+
+parse_cache = ParseCache(PARSE_CACHE_DIR, memory_bytes=PARSE_CACHE_MEMORY_BYTES, disk_bytes=PARSE_CACHE_DISK_BYTES)
+parse_pool = ParsePool(workers=PARSE_WORKERS, timeout=PARSE_TIMEOUT)
+# 图片OCR单独一个进程池，大图识别不会占满表格解析的子进程
+ocr_pool = ParsePool(workers=OCR_WORKERS, timeout=OCR_TIMEOUT)
+ocr_stats = OcrStats()
+_columnar_flight = SingleFlight()
+
+
+def _write_columnar(path, ext):
+    # 模块级函数，在解析子进程中完整解析一次文件并写出列式副本，只把完成信号传回主进程
+    directory = columnar_dir(path)
+    if os.path.isdir(directory):
+        # 格式版本过旧或不完整的副本
+        shutil.rmtree(directory, ignore_errors=True)
+    if ext == 'csv':
+        write_columnar(directory, [(None, read_spreadsheet(path, ext))], header_fixed=True)
+    else:
+        write_columnar(directory, list(read_spreadsheet(path, ext, header=None, sheet_name=None).items()))
+
+
+def columnar_table(path, ext):
+    """返回表格文件的列式副本（ColumnarTable，内存映射读取），副本不存在时先在子进程中生成"""
+    directory = columnar_dir(path)
+    table = ColumnarTable.open(directory)
+    if table is not None:
+        return table
+
+    def build():
+        table = ColumnarTable.open(directory)
+        if table is None:
+            parse_pool.run(_write_columnar, path, ext)
+            table = ColumnarTable.open(directory)
+        return table
+
+    return _columnar_flight.do(directory, build)
+
+
+def columnar_tables(items):
+    """并行获取多个表格文件的列式副本，items为 [(path, ext)]，按输入顺序返回 [{'ok': True, 'value': ColumnarTable} 或 {'ok': False, 'error': ...}]"""
+    return parse_pool.map([lambda path=path, ext=ext: columnar_table(path, ext) for path, ext in items])
+
+
+def ingest_table(path, ext, on_done=None):
+    """上传后在后台生成列式副本，之后的预览/分析直接内存映射读取，不再重新解析xlsx/csv
+
+    传入on_done时，副本生成后在同一后台线程中调用 on_done(ColumnarTable, None)，失败时调用 on_done(None, 错误信息)
+    """
+    def build():
+        try:
+            table = columnar_table(path, ext)
+        except Exception as e:
+            print(f'列式副本生成失败: {path}, 错误: {e}')
+            if on_done:
+                on_done(None, str(e))
+            return
+        if on_done:
+            on_done(table, None)
+
+    parse_pool.submit(build)
+
+
+def read_table(path, ext):
+    """读取csv/xlsx/xls（第一个sheet）为DataFrame，走列式副本"""
+    return columnar_table(path, ext).frame()
+
+
+def _ocr_text(path):
+    """在OCR子进程中预处理并识别图片，结果按图片内容和预处理参数缓存，同一张图片再次提问时直接返回"""
+    options = (OCR_TARGET_DPI, OCR_GRAYSCALE, OCR_BINARIZE)
+    computed = []
+
+    def parse():
+        result = ocr_pool.run(ocr_image, path, *options)
+        computed.append(result)
+        return result
+
+    result = parse_cache.get_or_parse(path, 'ocr:' + repr(options), parse)
+    if computed:
+        print(f'OCR完成: {path}, 尺寸: {result["size"]}, 耗时(ms): {result["timings"]}')
+    ocr_stats.record(result['timings'] if computed else None)
+    return result['text']
+
+
+def pdf_pages(path, spec=None):
+    """按页码范围（如 '1-10,15'，为空时从第1页起）选择要提取的页，最多PDF_MAX_PAGES页，返回 (总页数, 从0开始的页号列表)"""
+    total = page_count(path)
+    return total, parse_page_ranges(spec, total, PDF_MAX_PAGES)
+
+
+def iter_pdf_text(path, pages):
+    """按页序逐页产出 (页号, 文本)
+
+    页按PDF_PAGES_PER_TASK分块，各块同时在解析子进程中提取，每块结果按文件内容缓存；
+    调用方可以边取边用，提前停止迭代时尚未开始的块不再提取。
+    """
+    chunks = [pages[i:i + PDF_PAGES_PER_TASK] for i in range(0, len(pages), PDF_PAGES_PER_TASK)]
+
+    def call(chunk):
+        parse = lambda: parse_pool.run(extract_pages, path, chunk)
+        return lambda: parse_cache.get_or_parse(path, 'pdf:' + repr(chunk), parse)
+
+    futures = [parse_pool.submit(call(chunk)) for chunk in chunks]
+    try:
+        for chunk, future in zip(chunks, futures):
+            yield from zip(chunk, future.result())
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def extract_text(path, ext):
+    """提取docx/pdf/图片（OCR）中的文本，结果按文件内容缓存"""
+    if ext in ['png', 'jpg', 'jpeg']:
+        return _ocr_text(path)
+    if ext == 'pdf':
+        _, pages = pdf_pages(path)
+        return '\n'.join(text for _, text in iter_pdf_text(path, pages))
+
+    def parse():
+        if ext == 'docx':
+            doc = docx.Document(path)
+            return '\n'.join([p.text for p in doc.paragraphs])
+        raise ValueError(f'不支持的文件类型: {ext}')
+
+    return parse_cache.get_or_parse(path, f'text:{ext}', parse)
+
+
+# 所有模块级解析函数定义完成后再fork解析子进程
+parse_pool.start()
+ocr_pool.start()
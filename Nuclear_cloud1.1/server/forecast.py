@@ -0,0 +1,170 @@
+import numpy as np
+
+# 阻尼Holt线性趋势法的参数网格：对所有 (phi, alpha, beta) 组合同时递推，取一步预测误差平方和最小的一组
+# phi为趋势阻尼系数，预测越远趋势越弱；误差相同时取阻尼最强的一组。趋势从0开始，由数据逐步学到，
+# 第一步的误差也计入评分，因此震荡的序列不会被当成趋势外推；少于HOLT_MIN_POINTS个点时不估计趋势，沿用最后一个值
+HOLT_PHIS = np.array([0.8, 0.9, 0.98])
+HOLT_ALPHAS = np.linspace(0.1, 0.9, 9)
+HOLT_BETAS = np.linspace(0.05, 0.5, 10)
+HOLT_MIN_POINTS = 3
+# 观测到的月份数不少于此值时改用“线性趋势+月度季节项”
+SEASONAL_MIN_POINTS = 24
+# 不会为负的指标，预测值外推到0以下时取0
+NON_NEGATIVE = ('收入', '余额', '经营', '投资', '筹资')
+
+
+def month_index(month):
+    year, mon = month.split('-')
+    return int(year) * 12 + int(mon) - 1
+
+
+def month_str(index):
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def predict_months(base_month, count):
+    """基准月份之后的count个月"""
+    start = month_index(base_month)
+    return [month_str(start + i) for i in range(1, count + 1)]
+
+
+def holt_forecast(y, horizon):
+    """阻尼Holt线性趋势指数平滑，y为等间隔的序列，返回之后horizon期的预测值（少于HOLT_MIN_POINTS个点时为最后一个值）"""
+    if len(y) < HOLT_MIN_POINTS:
+        return np.full(horizon, float(y[-1]))
+    phi, a, b = (g.ravel() for g in np.meshgrid(HOLT_PHIS, HOLT_ALPHAS, HOLT_BETAS, indexing='ij'))
+    level = np.full(a.shape, float(y[0]))
+    trend = np.zeros(a.shape)
+    sse = np.zeros(a.shape)
+    for value in y[1:]:
+        pred = level + phi * trend
+        sse += (value - pred) ** 2
+        new_level = a * value + (1 - a) * pred
+        trend = b * (new_level - level) + (1 - b) * phi * trend
+        level = new_level
+    best = int(np.argmin(sse))
+    damping = np.cumsum(phi[best] ** np.arange(1, horizon + 1))
+    return level[best] + damping * trend[best]
+
+
+def seasonal_forecast(y, start, horizon):
+    """线性趋势+按自然月的加性季节项，y为从月份序号start开始的逐月序列"""
+    t = np.arange(len(y))
+    slope, intercept = np.polyfit(t, y, 1)
+    resid = y - (slope * t + intercept)
+    calendar = (start + t) % 12
+    season = np.array([resid[calendar == m].mean() if (calendar == m).any() else 0.0 for m in range(12)])
+    future = np.arange(len(y), len(y) + horizon)
+    return slope * future + intercept + season[(start + future) % 12]
+
+
+def forecast_series(points, months):
+    """points为 {YYYY-MM: 数值}（可不连续），返回 ({月份: 预测值}, 方法名)，months为需要预测的月份
+
+    观测值少于HOLT_MIN_POINTS个时沿用最后一个值（两个点无法区分趋势和波动）；
+    观测值之间缺失的月份先线性插值成逐月序列再建模。
+    """
+    observed = sorted((month_index(m), float(v)) for m, v in points.items() if v is not None)
+    if not observed or not months:
+        return {m: None for m in months}, None
+    last = observed[-1][0]
+    targets = [month_index(m) for m in months]
+    if len(observed) < HOLT_MIN_POINTS:
+        return {m: observed[-1][1] if i > last else float(np.interp(i, [x for x, _ in observed], [v for _, v in observed]))
+                for m, i in zip(months, targets)}, 'flat'
+    x = np.array([i for i, _ in observed])
+    grid = np.arange(x[0], last + 1)
+    y = np.interp(grid, x, [v for _, v in observed])
+    horizon = max(max(targets) - last, 1)
+    if len(observed) >= SEASONAL_MIN_POINTS:
+        values, method = seasonal_forecast(y, int(grid[0]), horizon), 'seasonal'
+    else:
+        values, method = holt_forecast(y, horizon), 'holt'
+    # 预测月份早于最后一个观测月时（基准月份在历史区间内）按插值取值
+    return {m: float(values[i - last - 1]) if i > last else float(np.interp(i, x, [v for _, v in observed]))
+            for m, i in zip(months, targets)}, method
+
+
+def _first(values, names):
+    for name in names:
+        if values.get(name) is not None:
+            return values[name]
+    return None
+
+
+def _money(value):
+    return None if value is None else round(float(value), 2)
+
+
+def _ratio(profit, revenue):
+    if profit is None or not revenue:
+        return None
+    return round(profit / revenue, 4)
+
+
+def _shares(flows):
+    """经营/投资/筹资现金流按绝对值计算占比，总和为1；全部缺失或为0时返回None"""
+    if any(v is None for v in flows):
+        return None
+    magnitude = np.abs(np.array(flows, dtype=float))
+    total = magnitude.sum()
+    if not total:
+        return None
+    shares = np.round(magnitude / total, 4)
+    shares[-1] = round(1 - shares[:-1].sum(), 4)
+    return [float(s) for s in shares]
+
+
+def finance_series(metrics, history_months, future_months):
+    """由各月标准指标（见statement_normalizer）计算图表的line/bar/area序列，历史取实际值，预测用本地模型
+
+    收入取营业收入（没有时取营业总收入），利润为净利润，净利润率=利润/收入；余额取期末现金余额（没有时取货币资金）；
+    经营/投资/筹资为三类现金流净额绝对值的占比。返回 {'line', 'bar', 'area', 'forecast'}，forecast为各指标使用的预测方法。
+    """
+    sources = {
+        '收入': ['营业收入', '营业总收入'],
+        '利润': ['净利润'],
+        '余额': ['期末现金余额', '货币资金'],
+        '经营': ['经营现金流'],
+        '投资': ['投资现金流'],
+        '筹资': ['筹资现金流'],
+    }
+    history = {key: {m: _first(metrics.get(m, {}), names) for m in history_months} for key, names in sources.items()}
+    future = {}
+    methods = {}
+    for key, points in history.items():
+        if key in ('经营', '投资', '筹资'):
+            # 占比按各类现金流的规模预测，符号不影响占比
+            points = {m: None if v is None else abs(v) for m, v in points.items()}
+        future[key], methods[key] = forecast_series(points, future_months)
+        if key in NON_NEGATIVE:
+            future[key] = {m: v if v is None else max(v, 0.0) for m, v in future[key].items()}
+
+    line, bar, area = [], [], []
+    for months, source, kind in ((history_months, history, 'history'), (future_months, future, 'predict')):
+        for m in months:
+            revenue, profit = source['收入'][m], source['利润'][m]
+            line.append({'month': m, '收入': _money(revenue), '利润': _money(profit),
+                         '净利润率': _ratio(profit, revenue), 'type': kind})
+            bar.append({'month': m, '余额': _money(source['余额'][m]), 'type': kind})
+            shares = _shares([source[k][m] for k in ('经营', '投资', '筹资')])
+            area.append({'month': m, '经营': shares and shares[0], '投资': shares and shares[1],
+                         '筹资': shares and shares[2], 'type': kind})
+    return {'line': line, 'bar': bar, 'area': area, 'forecast': {k: v for k, v in methods.items() if v}}
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if abs(value) < 1:
+        return f'{value:g}'
+    return f'{value:.2f}'.rstrip('0').rstrip('.')
+
+
+def series_table_text(series):
+    """line/bar/area按月份合并为一张CSV表格，写入提示词"""
+    lines = ['月份,类型,收入,利润,净利润率,余额,经营,投资,筹资']
+    for line, bar, area in zip(series['line'], series['bar'], series['area']):
+        values = [line['收入'], line['利润'], line['净利润率'], bar['余额'], area['经营'], area['投资'], area['筹资']]
+        lines.append(','.join([line['month'], line['type']] + [_cell(v) for v in values]))
+    return '\n'.join(lines)
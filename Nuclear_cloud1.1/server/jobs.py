@@ -0,0 +1,184 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFull(Exception):
+    """排队任务已达上限"""
+
+
+def _worker_id():
+    # 在执行时取pid：导入后才fork出的worker进程（如gunicorn --preload）各自不同
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _process_gone(worker):
+    """执行任务的进程是否已退出：本机进程按pid判断，其他主机或未记录时返回None（无法判断）"""
+    host, _, pid = (worker or '').rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return None
+    if int(pid) == os.getpid():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+class JobQueue:
+    """后台任务队列：任务状态持久化在SQLite（服务重启后可恢复），由有界线程池执行
+
+    runner通过register注册，签名为 func(params, progress) -> 可JSON序列化的结果，
+    progress(pct, message) 用于上报进度（同时作为心跳）。
+    运行中的任务记录执行进程（主机:pid），只有该进程已退出时才重新排队；
+    无法判断的（其他主机上的进程）按心跳超时 stale_seconds 判断。
+    """
+
+    def __init__(self, db_path, workers=2, max_pending=20, stale_seconds=600):
+        self.db_path = db_path
+        self.max_pending = max_pending
+        self.stale_seconds = stale_seconds
+        self._runners = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT,
+                params TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)')
+            # 旧版数据库没有worker列
+            c.execute('PRAGMA table_info(jobs)')
+            if 'worker' not in [row[1] for row in c.fetchall()]:
+                c.execute('ALTER TABLE jobs ADD COLUMN worker TEXT')
+            conn.commit()
+
+    def register(self, kind, func):
+        self._runners[kind] = func
+
+    def submit(self, kind, user_id, params):
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            with sqlite3.connect(self.db_path) as conn:
+                c = conn.cursor()
+                c.execute("SELECT COUNT(*) FROM jobs WHERE status='queued'")
+                if c.fetchone()[0] >= self.max_pending:
+                    raise QueueFull()
+                c.execute('''INSERT INTO jobs (id, kind, user_id, status, progress, message, params, created_at, updated_at)
+                             VALUES (?, ?, ?, 'queued', 0, '排队中', ?, ?, ?)''',
+                          (job_id, kind, str(user_id), json.dumps(params, ensure_ascii=False), now, now))
+                conn.commit()
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id, user_id):
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''SELECT id, kind, status, progress, message, result, error, created_at, updated_at, worker
+                         FROM jobs WHERE id=? AND user_id=?''', (job_id, str(user_id)))
+            row = c.fetchone()
+        if not row:
+            return None
+        job = {
+            'job_id': row[0],
+            'kind': row[1],
+            'status': row[2],
+            'progress': row[3],
+            'message': row[4],
+            'result': json.loads(row[5]) if row[5] else None,
+            'error': row[6],
+            'created_at': row[7],
+            'updated_at': row[8],
+        }
+        # 执行该任务的进程已退出，重新排队（本进程正在执行的任务即使长时间没有心跳也不会被重复执行）
+        if job['status'] == 'running' and self._orphaned(row[9], job['updated_at']):
+            if self._requeue(job_id, row[9]):
+                job['status'] = 'queued'
+        return job
+
+    def _orphaned(self, worker, updated_at):
+        gone = _process_gone(worker)
+        if gone is None:
+            return time.time() - updated_at > self.stale_seconds
+        return gone
+
+    def resume(self):
+        """服务启动时恢复未完成的任务：排队中的任务和执行进程已退出的运行中任务"""
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute("SELECT id, status, worker, updated_at FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at")
+            jobs = c.fetchall()
+        for job_id, status, worker, updated_at in jobs:
+            if status == 'queued':
+                self._executor.submit(self._run, job_id)
+            elif self._orphaned(worker, updated_at):
+                self._requeue(job_id, worker)
+
+    def _requeue(self, job_id, worker):
+        # 只有任务仍由该进程持有时才改回queued，避免多个轮询请求同时重新排队
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute("UPDATE jobs SET status='queued', message='排队中', updated_at=? WHERE id=? AND status='running' AND worker IS ?",
+                      (time.time(), job_id, worker))
+            conn.commit()
+            if c.rowcount != 1:
+                return False
+        self._executor.submit(self._run, job_id)
+        return True
+
+    def _claim(self, job_id):
+        # 原子地把任务从queued改为running，避免多个进程/线程重复执行
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute("UPDATE jobs SET status='running', message='开始执行', worker=?, updated_at=? WHERE id=? AND status='queued'",
+                      (_worker_id(), time.time(), job_id))
+            conn.commit()
+            if c.rowcount != 1:
+                return None
+            c.execute('SELECT kind, params FROM jobs WHERE id=?', (job_id,))
+            return c.fetchone()
+
+    def _update(self, job_id, **fields):
+        fields['updated_at'] = time.time()
+        cols = ', '.join(f'{k}=?' for k in fields)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(f'UPDATE jobs SET {cols} WHERE id=?', list(fields.values()) + [job_id])
+            conn.commit()
+
+    def _run(self, job_id):
+        claimed = self._claim(job_id)
+        if not claimed:
+            return
+        kind, params = claimed
+
+        def progress(pct, message):
+            self._update(job_id, progress=pct, message=message)
+
+        try:
+            result = self._runners[kind](json.loads(params), progress)
+            self._update(job_id, status='done', progress=1.0, message='完成',
+                         result=json.dumps(result, ensure_ascii=False))
+        except Exception as e:
+            print(f'任务执行失败: {job_id}')
+            print(traceback.format_exc())
+            self._update(job_id, status='failed', message='失败', error=str(e))
@@ -0,0 +1,148 @@
+import json
+
+
+class StreamingJSONParser:
+    """增量解析大模型输出的JSON
+
+    每次feed一段文本，返回其中新完成的值：[(path, value), ...]，
+    path为从根开始的key/下标元组，只返回深度不超过max_depth的值。
+    例如 ('line', 0) 表示line数组的第一个元素，('advice', '分析结论') 表示advice的一个字段。
+    根值开始前的内容（如```json代码块标记）和根值结束后的内容都会被忽略；
+    根值解析完成后done为True，root为整个对象。
+
+    只保留尚未完成的值对应的文本，已完成部分及时丢弃，整体为线性开销。
+    """
+
+    def __init__(self, max_depth=2):
+        self.max_depth = max_depth
+        self.text = ''
+        self.base = 0          # self.text[0] 在整段输出中的绝对位置
+        self.started = False
+        self.done = False
+        self.root = None
+        self._stack = []       # 每层容器：type('{'/'['), start, key, index, expect
+        self._in_string = False
+        self._escape = False
+        self._scalar = False
+        self._token_start = None
+        self._key_token = False
+
+    def feed(self, chunk):
+        events = []
+        if self.done or not chunk:
+            return events
+        i = self.base + len(self.text)
+        self.text += chunk
+        for ch in chunk:
+            if self.done:
+                break
+            self._step(ch, i, events)
+            i += 1
+        self._trim()
+        return events
+
+    def _slice(self, start, end):
+        return self.text[start - self.base:end - self.base]
+
+    def _path(self):
+        return tuple(f['key'] if f['type'] == '{' else f['index'] for f in self._stack)
+
+    def _begin_value(self):
+        if self._stack and self._stack[-1]['type'] == '[':
+            self._stack[-1]['index'] += 1
+
+    def _complete(self, raw, events):
+        path = self._path()
+        if not path:
+            # 根值是标量的情况
+            self.root = json.loads(raw)
+            self.done = True
+            return
+        if len(path) > self.max_depth:
+            return
+        value = json.loads(raw)
+        if len(path) == 1:
+            if isinstance(self.root, dict):
+                self.root[path[0]] = value
+            else:
+                self.root.append(value)
+        events.append((path, value))
+
+    def _step(self, ch, i, events):
+        if not self.started:
+            if ch in '{[':
+                self.started = True
+                self.root = {} if ch == '{' else []
+                self._stack.append({'type': ch, 'start': i, 'key': None, 'index': -1, 'expect': 'key'})
+            return
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == '\\':
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                raw = self._slice(self._token_start, i + 1)
+                self._token_start = None
+                if self._key_token:
+                    self._key_token = False
+                    self._stack[-1]['key'] = json.loads(raw)
+                    self._stack[-1]['expect'] = 'colon'
+                else:
+                    self._complete(raw, events)
+            return
+        if self._scalar:
+            if ch in ',}]' or ch.isspace():
+                self._scalar = False
+                raw = self._slice(self._token_start, i)
+                self._token_start = None
+                self._complete(raw, events)
+            else:
+                return
+        if ch.isspace():
+            return
+        top = self._stack[-1]
+        if ch == '"':
+            self._in_string = True
+            self._token_start = i
+            self._key_token = top['type'] == '{' and top['expect'] == 'key'
+            if not self._key_token:
+                self._begin_value()
+        elif ch in '{[':
+            self._begin_value()
+            self._stack.append({'type': ch, 'start': i, 'key': None, 'index': -1, 'expect': 'key'})
+        elif ch in '}]':
+            frame = self._stack.pop()
+            if not self._stack:
+                # 根容器结束，root已由各个一级值逐步拼装完成
+                self.done = True
+                return
+            raw = self._slice(frame['start'], i + 1)
+            self._complete(raw, events)
+        elif ch == ':':
+            top['expect'] = 'value'
+        elif ch == ',':
+            top['expect'] = 'key'
+        else:
+            self._begin_value()
+            self._scalar = True
+            self._token_start = i
+
+    def _trim(self):
+        # 丢弃已不会再被引用的前缀：只需保留最外层未完成的一级值（及正在读取的token）
+        keep = [f['start'] for f in self._stack[1:]]
+        if self._token_start is not None:
+            keep.append(self._token_start)
+        cut = min(keep) if keep else self.base + len(self.text)
+        if cut > self.base:
+            self.text = self.text[cut - self.base:]
+            self.base = cut
+
+
+def parse_model_json(text):
+    """从大模型输出中取出第一个完整的JSON对象/数组（自动忽略代码块标记和前后说明文字）"""
+    parser = StreamingJSONParser(max_depth=1)
+    parser.feed(text)
+    if not parser.done:
+        raise ValueError('未找到完整的JSON内容')
+    return parser.root
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LLMCache:
+    """DeepSeek响应缓存：内存LRU + SQLite磁盘层（带TTL和总大小上限）
+
+    key为 (model, messages, temperature, max_tokens) 规范化后的SHA-256，
+    相同的分析请求直接返回上次的结果。
+    """
+
+    def __init__(self, db_path, memory_items=256, ttl=7 * 24 * 3600, max_bytes=200 * 1024 * 1024):
+        self.db_path = db_path
+        self.memory_items = memory_items
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)')
+            conn.commit()
+
+    @staticmethod
+    def make_key(payload):
+        normalized = {
+            'model': payload.get('model'),
+            'messages': [{'role': m.get('role'), 'content': m.get('content')} for m in payload.get('messages', [])],
+            'temperature': payload.get('temperature'),
+            'max_tokens': payload.get('max_tokens'),
+        }
+        raw = json.dumps(normalized, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                value, created_at = item
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits_memory += 1
+                    return value
+                del self._memory[key]
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('SELECT value, created_at FROM llm_cache WHERE key=?', (key,))
+            row = c.fetchone()
+            if row and now - row[1] <= self.ttl:
+                c.execute('UPDATE llm_cache SET accessed_at=? WHERE key=?', (now, key))
+                conn.commit()
+            else:
+                row = None
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits_disk += 1
+            self._remember(key, row[0], row[1])
+        return row[0]
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+        size = len(value.encode('utf-8'))
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                      (key, value, size, now, now))
+            self._evict(c, now)
+            conn.commit()
+
+    def _remember(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self, c, now):
+        # 先清理过期条目，再按最近访问时间淘汰，直到总大小低于上限
+        c.execute('DELETE FROM llm_cache WHERE created_at < ?', (now - self.ttl,))
+        c.execute('SELECT COALESCE(SUM(size), 0) FROM llm_cache')
+        total = c.fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        c.execute('SELECT key, size FROM llm_cache ORDER BY accessed_at ASC')
+        evicted = []
+        for key, size in c.fetchall():
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        c.executemany('DELETE FROM llm_cache WHERE key=?', evicted)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits_memory': self.hits_memory,
+                'hits_disk': self.hits_disk,
+                'misses': self.misses,
+                'memory_items': len(self._memory),
+            }
@@ -0,0 +1,144 @@
+import json
+import requests
+from requests.adapters import HTTPAdapter
+from config import (DEEPSEEK_API_TOKEN, DEEPSEEK_API_URL, DEEPSEEK_MODEL,
+                    LLM_POOL_SIZE, LLM_CONNECT_TIMEOUT, LLM_TIMEOUTS,
+                    LLM_CACHE_ENDPOINTS, LLM_CACHE_PATH, LLM_CACHE_MEMORY_ITEMS,
+                    LLM_CACHE_TTL, LLM_CACHE_MAX_BYTES,
+                    LLM_MAX_CONCURRENCY, LLM_RATE_PER_SECOND, LLM_BURST, LLM_MAX_QUEUE,
+                    LLM_QUEUE_TIMEOUT, LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX,
+                    LLM_COALESCE_ENDPOINTS)
+from llm_cache import LLMCache
+from single_flight import SingleFlight
+from upstream_limiter import UpstreamLimiter
+
+
+class LLMError(Exception):
+    """DeepSeek返回非200时抛出，text为上游原始响应内容"""
+
+    def __init__(self, status_code, text):
+        super().__init__(text)
+        self.status_code = status_code
+        self.text = text
+
+
+class LLMClient:
+    """所有DeepSeek调用共用的客户端：keep-alive连接池 + 统一的请求头/payload/超时"""
+
+    def __init__(self, api_url, token, model, pool_size=10, connect_timeout=5, timeouts=None,
+                 cache=None, cache_endpoints=(), limiter=None, coalesce_endpoints=()):
+        self.api_url = api_url
+        self.token = token
+        self.model = model
+        self.connect_timeout = connect_timeout
+        self.timeouts = timeouts or {}
+        # 响应缓存按接口开启，只有cache_endpoints中的接口会读写缓存
+        self.cache = cache
+        self.cache_endpoints = set(cache_endpoints)
+        self.limiter = limiter
+        # 相同payload的并发请求只发一次上游调用
+        self.single_flight = SingleFlight()
+        self.coalesce_endpoints = set(coalesce_endpoints)
+        self.session = requests.Session()
+        # pool_block=True：连接池用满时排队等待，而不是新建连接，从而限制上游总并发
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(self.build_headers())
+
+    def build_headers(self):
+        return {
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": "application/json"
+        }
+
+    def build_payload(self, messages, temperature, max_tokens, stream=False):
+        return {
+            "model": self.model,
+            "messages": messages,
+            "stream": stream,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+
+    def timeout_for(self, endpoint):
+        return (self.connect_timeout, self.timeouts.get(endpoint, 60))
+
+    def post(self, payload, endpoint, stream=False):
+        def send():
+            return self.session.post(self.api_url, json=payload, timeout=self.timeout_for(endpoint), stream=stream)
+        if self.limiter is None:
+            return send()
+        # 流式调用时限流只覆盖到拿到响应头为止，之后的读取由连接池大小兜底
+        return self.limiter.call(send)
+
+    def chat(self, messages, temperature, max_tokens, endpoint):
+        """非流式调用，返回answer文本；上游报错时抛出LLMError"""
+        payload = self.build_payload(messages, temperature, max_tokens)
+        key = LLMCache.make_key(payload)
+        use_cache = self.cache is not None and endpoint in self.cache_endpoints
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        if endpoint in self.coalesce_endpoints:
+            return self.single_flight.do(key, lambda: self._fetch(payload, endpoint, key if use_cache else None))
+        return self._fetch(payload, endpoint, key if use_cache else None)
+
+    def _fetch(self, payload, endpoint, cache_key):
+        resp = self.post(payload, endpoint)
+        if resp.status_code != 200:
+            raise LLMError(resp.status_code, resp.text)
+        resp_json = resp.json()
+        if "choices" not in resp_json:
+            raise LLMError(resp.status_code, str(resp_json.get('error', resp_json)))
+        content = resp_json["choices"][0]["message"]["content"]
+        if cache_key is not None:
+            self.cache.put(cache_key, content)
+        return content
+
+    def open_stream(self, messages, temperature, max_tokens, endpoint):
+        """发起流式调用并检查状态码，返回尚未读取的响应；配合iter_deltas使用"""
+        payload = self.build_payload(messages, temperature, max_tokens, stream=True)
+        resp = self.post(payload, endpoint, stream=True)
+        if resp.status_code != 200:
+            text = resp.text
+            resp.close()
+            raise LLMError(resp.status_code, text)
+        return resp
+
+    @staticmethod
+    def iter_deltas(resp):
+        """逐段产出上游SSE中的增量文本：每行 "data: {...}"，以 "data: [DONE]" 结束"""
+        try:
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                choices = json.loads(data).get('choices') or [{}]
+                delta = (choices[0].get('delta') or {}).get('content')
+                if delta:
+                    yield delta
+        finally:
+            resp.close()
+
+    def stats(self):
+        return {
+            'cache': self.cache.stats() if self.cache is not None else None,
+            'limiter': self.limiter.stats() if self.limiter is not None else None,
+            'single_flight': self.single_flight.stats(),
+        }
+
+
+llm = LLMClient(DEEPSEEK_API_URL, DEEPSEEK_API_TOKEN, DEEPSEEK_MODEL,
+                pool_size=LLM_POOL_SIZE, connect_timeout=LLM_CONNECT_TIMEOUT, timeouts=LLM_TIMEOUTS,
+                cache=LLMCache(LLM_CACHE_PATH, memory_items=LLM_CACHE_MEMORY_ITEMS,
+                               ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES),
+                cache_endpoints=LLM_CACHE_ENDPOINTS,
+                limiter=UpstreamLimiter(LLM_MAX_CONCURRENCY, rate=LLM_RATE_PER_SECOND, burst=LLM_BURST,
+                                        max_queue=LLM_MAX_QUEUE, queue_timeout=LLM_QUEUE_TIMEOUT,
+                                        max_retries=LLM_MAX_RETRIES, backoff_base=LLM_BACKOFF_BASE,
+                                        backoff_max=LLM_BACKOFF_MAX),
+                coalesce_endpoints=LLM_COALESCE_ENDPOINTS)
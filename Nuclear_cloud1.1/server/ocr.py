@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytesseract
+from PIL import Image, ImageOps
+
+# 没有可信DPI信息时（手机照片、截图通常写72/96），按图片长边对应A4纸长边（英寸）估算DPI
+PAGE_LONG_SIDE_INCHES = 11.69
+TRUSTED_MIN_DPI = 150
+
+
+def estimate_dpi(img):
+    dpi = img.info.get('dpi')
+    if dpi and dpi[0] and float(dpi[0]) >= TRUSTED_MIN_DPI:
+        return float(dpi[0])
+    return max(img.size) / PAGE_LONG_SIDE_INCHES
+
+
+def otsu_threshold(gray):
+    """灰度图的Otsu二值化阈值（按256级直方图计算）"""
+    hist = gray.histogram()[:256]
+    total = sum(hist)
+    sum_all = sum(i * h for i, h in enumerate(hist))
+    sum_bg = 0
+    weight_bg = 0
+    best, threshold = -1, 127
+    for i, h in enumerate(hist):
+        weight_bg += h
+        if not weight_bg:
+            continue
+        weight_fg = total - weight_bg
+        if not weight_fg:
+            break
+        sum_bg += i * h
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best:
+            best, threshold = between, i
+    return threshold
+
+
+def preprocess(img, target_dpi=300, grayscale=True, binarize=True, timings=None):
+    """OCR前的预处理：灰度化、缩小到目标DPI（不放大）、二值化；timings不为None时记录各步骤耗时（毫秒）"""
+    timings = {} if timings is None else timings
+
+    def stage(name, func):
+        start = time.perf_counter()
+        result = func()
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    if grayscale or binarize:
+        # 先灰度化，后续缩放只需处理一个通道
+        img = stage('grayscale', lambda: img.convert('L'))
+    scale = target_dpi / estimate_dpi(img) if target_dpi else 1
+    if scale < 1:
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = stage('resize', lambda: img.resize(size, Image.Resampling.LANCZOS))
+    if binarize:
+        def to_binary():
+            threshold = otsu_threshold(img)
+            return img.point([255 if i > threshold else 0 for i in range(256)])
+        img = stage('binarize', to_binary)
+    return img
+
+
+def ocr_image(path, target_dpi=300, grayscale=True, binarize=True):
+    """读取图片、预处理并识别文字（在OCR子进程中执行），返回 {'text', 'size', 'timings'}"""
+    timings = {}
+    start = time.perf_counter()
+    img = Image.open(path)
+    # 手机照片按EXIF方向摆正后再识别
+    img = ImageOps.exif_transpose(img)
+    img.load()
+    timings['decode'] = round((time.perf_counter() - start) * 1000, 1)
+    size = img.size
+    img = preprocess(img, target_dpi, grayscale, binarize, timings)
+    stage_start = time.perf_counter()
+    text = pytesseract.image_to_string(img)
+    timings['ocr'] = round((time.perf_counter() - stage_start) * 1000, 1)
+    timings['total'] = round((time.perf_counter() - start) * 1000, 1)
+    return {'text': text, 'size': size, 'timings': timings}
+
+
+class OcrStats:
+    """OCR次数、缓存命中数与各阶段累计/最大耗时（毫秒），供 /api/llm/stats 查看"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.cache_hits = 0
+        self.stage_total = {}
+        self.stage_max = {}
+
+    def record(self, timings):
+        """timings为None表示命中缓存"""
+        with self._lock:
+            if timings is None:
+                self.cache_hits += 1
+                return
+            self.images += 1
+            for name, ms in timings.items():
+                self.stage_total[name] = self.stage_total.get(name, 0) + ms
+                self.stage_max[name] = max(self.stage_max.get(name, 0), ms)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'images': self.images,
+                'cache_hits': self.cache_hits,
+                'avg_ms': {k: round(v / self.images, 1) for k, v in self.stage_total.items()} if self.images else {},
+                'max_ms': dict(self.stage_max),
+            }
@@ -0,0 +1,182 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from single_flight import SingleFlight
+
+
+def _sizeof(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sum(_sizeof(v) for v in value.values()) + 64 * len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_sizeof(v) for v in value) + 8 * len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, bytes):
+        return len(value)
+    return 64
+
+
+def _copy(value):
+    # DataFrame可能被调用方原地修改，返回副本保护缓存
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+class ParseCache:
+    """上传文件解析结果缓存
+
+    key为文件内容的SHA-256加上解析方式（variant），同一份文件无论以什么文件名、
+    在哪个接口出现都只解析一次。内存层为按字节数限制的LRU，磁盘层为pickle文件，
+    超出总大小时按最近访问时间淘汰。
+    """
+
+    def __init__(self, cache_dir, memory_bytes=256 * 1024 * 1024, disk_bytes=2 * 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._hashes = OrderedDict()
+        self._lock = threading.Lock()
+        self._single_flight = SingleFlight()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def file_hash(self, path):
+        """文件内容的SHA-256；按 (路径, mtime, 大小) 记忆，未变化的文件不重复计算"""
+        st = os.stat(path)
+        memo_key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            digest = self._hashes.get(memo_key)
+            if digest:
+                self._hashes.move_to_end(memo_key)
+                return digest
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(block)
+        digest = h.hexdigest()
+        with self._lock:
+            self._hashes[memo_key] = digest
+            while len(self._hashes) > 4096:
+                self._hashes.popitem(last=False)
+        return digest
+
+    def get_or_parse(self, path, variant, parse):
+        """返回path按variant方式解析的结果，未命中时调用parse()并写入缓存"""
+        key = self.file_hash(path) + '-' + hashlib.sha1(variant.encode('utf-8')).hexdigest()[:16]
+        value = self._get(key)
+        if value is None:
+            value = self._single_flight.do(key, lambda: self._parse_and_put(key, parse))
+        return _copy(value)
+
+    def _parse_and_put(self, key, parse):
+        value = self._get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            self.misses += 1
+        value = parse()
+        self._remember(key, value)
+        self._write_disk(key, value)
+        return value
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.pkl')
+
+    def _get(self, key):
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return item[0]
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        with self._lock:
+            self.hits_disk += 1
+        self._remember(key, value)
+        return value
+
+    def _remember(self, key, value):
+        size = _sizeof(value)
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_size -= old[1]
+            self._memory[key] = (value, size)
+            self._memory_size += size
+            while self._memory_size > self.memory_bytes:
+                _, (_, evicted) = self._memory.popitem(last=False)
+                self._memory_size -= evicted
+
+    def _write_disk(self, key, value):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except (OSError, pickle.PicklingError) as e:
+            print(f'解析缓存写入失败: {e}')
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        entries = []
+        total = 0
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith('.pkl'):
+                    continue
+                fpath = os.path.join(root, name)
+                try:
+                    st = os.stat(fpath)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, fpath))
+                total += st.st_size
+        if total <= self.disk_bytes:
+            return
+        for _, size, fpath in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(fpath)
+                total -= size
+            except OSError:
+                continue
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits_memory': self.hits_memory,
+                'hits_disk': self.hits_disk,
+                'misses': self.misses,
+                'memory_items': len(self._memory),
+                'memory_bytes': self._memory_size,
+            }
@@ -0,0 +1,167 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+
+# 子进程异常退出导致进程池不可用时，一次调用最多重试的次数
+CRASH_RETRIES = 2
+
+
+class ParseTimeout(Exception):
+    """单个文件解析超时"""
+
+
+def _noop():
+    return None
+
+
+def _call(func, args):
+    """子进程中的调用入口：异常统一转为RuntimeError抛回主进程
+
+    部分库的异常（如pytesseract.TesseractNotFoundError）能序列化却无法在主进程反序列化，
+    直接抛出会让整个进程池被判定为异常退出，同时在执行的其他调用也随之失败。
+    """
+    try:
+        return func(*args)
+    except Exception as e:
+        raise RuntimeError(f'{type(e).__name__}: {e}') from None
+
+
+class _Workers:
+    """一代子进程池；retired为已被终止，timed_out为终止原因是其中某个调用超时"""
+
+    def __init__(self, workers):
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+        self.retired = False
+        self.timed_out = False
+        # fork方式下首次submit会一次性启动全部子进程
+        self.executor.submit(_noop).result()
+
+
+class ParsePool:
+    """CPU密集的文件解析放到子进程执行，绕开GIL，多个文件并行解析
+
+    run(func, *args) 在子进程中执行func并等待结果，超过timeout秒抛出ParseTimeout，
+    同时重建进程池（超时的子进程无法单独取消，只能整体终止）；func抛出的异常以RuntimeError('类型名: 信息')抛出。
+    map(calls) 并行执行一组调用，按输入顺序返回 [{'ok': True, 'value': ...} 或 {'ok': False, 'error': ...}]，
+    单个文件失败不影响其他文件。
+
+    子进程用fork方式启动（不会重新导入app.py）；不支持fork的平台（Windows）退化为线程池。
+    子进程由start()一次性全部启动：应在导入阶段（尚无其他线程）、且子进程要执行的函数都已定义之后调用，
+    避免子进程继承其他线程正在持有的锁而卡死，或因模块尚未执行完而找不到要执行的函数。
+    进程池被终止后，由start()启动的专用重建线程立即fork新的进程池，调用方只等待新池就绪，
+    不会在请求线程或解析线程（可能正持有其他锁）中fork。
+    """
+
+    def __init__(self, workers=4, timeout=60):
+        self.workers = workers
+        self.timeout = timeout
+        self._ready = threading.Condition()
+        self._workers = None
+        self._broken = threading.Event()
+        self._rebuilder = None
+        self._retry_lock = threading.Lock()
+        self._fork = 'fork' in multiprocessing.get_all_start_methods()
+        self._threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='parse')
+
+    def start(self):
+        if not self._fork or self._rebuilder is not None:
+            return
+        self._workers = _Workers(self.workers)
+        self._rebuilder = threading.Thread(target=self._rebuild_loop, name='parse-pool-rebuild', daemon=True)
+        self._rebuilder.start()
+
+    def _rebuild_loop(self):
+        while True:
+            self._broken.wait()
+            self._broken.clear()
+            try:
+                workers = _Workers(self.workers)
+            except Exception as e:
+                print(f'解析进程池重建失败: {e}')
+                time.sleep(1)
+                self._broken.set()
+                continue
+            with self._ready:
+                self._workers = workers
+                self._ready.notify_all()
+
+    def _get_pool(self):
+        if self._rebuilder is None:
+            raise RuntimeError('解析进程池尚未启动（需先调用start）')
+        with self._ready:
+            if not self._ready.wait_for(lambda: self._workers is not None, timeout=self.timeout):
+                raise BrokenProcessPool('解析进程池不可用')
+            return self._workers
+
+    def _restart(self, workers, timed_out=False):
+        with self._ready:
+            if workers.retired:
+                return
+            workers.retired = True
+            workers.timed_out = timed_out
+            if self._workers is workers:
+                self._workers = None
+                self._broken.set()
+        # 终止卡住的子进程，其他正在使用该进程池的调用会收到BrokenProcessPool并重试
+        pool = workers.executor
+        for process in list((getattr(pool, '_processes', None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _attempt(self, func, args):
+        """执行一次调用；进程池因其他调用超时被终止时换新池继续，子进程异常退出时抛出BrokenProcessPool"""
+        while True:
+            workers = self._get_pool()
+            try:
+                future = workers.executor.submit(_call, func, args)
+            except BrokenProcessPool:
+                self._restart(workers)
+                continue
+            except RuntimeError:
+                # 进程池刚被其他调用终止（shutdown后submit抛RuntimeError），换新池重试
+                if not workers.retired:
+                    raise
+                continue
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                self._restart(workers, timed_out=True)
+                raise ParseTimeout(f'解析超时（超过{self.timeout}秒）')
+            except BrokenProcessPool:
+                with self._ready:
+                    timed_out = workers.retired and workers.timed_out
+                self._restart(workers)
+                if not timed_out:
+                    raise
+
+    def run(self, func, *args):
+        if not self._fork:
+            return func(*args)
+        for attempt in range(CRASH_RETRIES + 1):
+            try:
+                if not attempt:
+                    return self._attempt(func, args)
+                # 子进程异常退出后的重试逐个执行：导致退出的调用再次执行时只会让它自己失败，不连累其他重试的调用
+                with self._retry_lock:
+                    return self._attempt(func, args)
+            except BrokenProcessPool:
+                if attempt == CRASH_RETRIES:
+                    raise
+
+    def submit(self, call):
+        """在后台线程中执行call（不等待结果），call内部可再通过run使用子进程"""
+        return self._threads.submit(call)
+
+    def map(self, calls):
+        """calls为 [callable, ...]（在当前进程的线程中调用，callable内部再通过run使用子进程）"""
+        futures = [self._threads.submit(call) for call in calls]
+        results = []
+        for future in futures:
+            try:
+                results.append({'ok': True, 'value': future.result()})
+            except Exception as e:
+                results.append({'ok': False, 'error': str(e) or e.__class__.__name__})
+        return results
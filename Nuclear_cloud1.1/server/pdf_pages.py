@@ -0,0 +1,61 @@
+import re
+
+import pdfplumber
+import PyPDF2
+
+_RANGE_RE = re.compile(r'(\d*)\s*-\s*(\d*)|(\d+)')
+
+
+def page_count(path):
+    return len(PyPDF2.PdfReader(path).pages)
+
+
+def parse_page_ranges(spec, total, max_pages):
+    """把 '1-5,8,20-' 形式的页码范围（从1开始，闭区间）转为从0开始的页号列表
+
+    spec为空时取全部页；结果去重并按页序排列，最多max_pages页。格式错误时抛出ValueError。
+    """
+    if not spec or not spec.strip():
+        pages = list(range(total))
+    else:
+        selected = set()
+        for part in spec.split(','):
+            part = part.strip()
+            m = _RANGE_RE.fullmatch(part)
+            if not m or part == '-':
+                raise ValueError(f'页码范围格式错误: {part}')
+            if m.group(3):
+                start = end = int(m.group(3))
+            else:
+                start = int(m.group(1) or 1)
+                end = int(m.group(2)) if m.group(2) else total
+            if start < 1 or end < start:
+                raise ValueError(f'页码范围格式错误: {part}')
+            selected.update(range(start - 1, min(end, total)))
+        pages = sorted(selected)
+    return pages[:max_pages] if max_pages else pages
+
+
+def extract_pages(path, pages):
+    """提取指定页（从0开始）的文本，在解析子进程中执行
+
+    先用PyPDF2直接读取文字层（快）；某页读取失败或没有文字时，再用pdfplumber做版面分析。
+    """
+    reader = PyPDF2.PdfReader(path)
+    plumber = None
+    texts = []
+    try:
+        for i in pages:
+            try:
+                text = reader.pages[i].extract_text() or ''
+            except Exception:
+                text = ''
+            if not text.strip():
+                if plumber is None:
+                    plumber = pdfplumber.open(path)
+                text = plumber.pages[i].extract_text() or ''
+            texts.append(text)
+    finally:
+        if plumber is not None:
+            plumber.close()
+    return texts
@@ -0,0 +1,77 @@
+import numpy as np
+
+from statement_normalizer import METRIC_NAMES
+
+# 比率名及说明，按输出顺序排列；增长率为较月份轴上前一期的变化（前一期缺失或为0时为空）
+RATIOS = [
+    ('毛利率', '(营业收入-营业成本)/营业收入'),
+    ('营业利润率', '营业利润/营业收入'),
+    ('净利润率', '净利润/营业收入'),
+    ('流动比率', '流动资产合计/流动负债合计'),
+    ('速动比率', '(流动资产合计-存货)/流动负债合计'),
+    ('现金比率', '货币资金/流动负债合计'),
+    ('资产负债率', '负债合计/资产合计'),
+    ('权益乘数', '资产合计/所有者权益合计'),
+    ('ROE', '净利润/所有者权益合计'),
+    ('ROA', '净利润/资产合计'),
+    ('净现比', '经营现金流/净利润'),
+    ('收入增长率', '营业收入较上一期的增长率'),
+    ('净利润增长率', '净利润较上一期的增长率'),
+]
+RATIO_NAMES = [name for name, _ in RATIOS]
+_INDEX = {name: k for k, name in enumerate(METRIC_NAMES)}
+
+
+def metric_cube(data):
+    """{公司: {月份: {指标名: 数值}}} 转为 (公司列表, 月份列表, 数组[公司, 月份, 指标])，缺失值为NaN"""
+    companies = sorted(data)
+    months = sorted({m for by_month in data.values() for m in by_month})
+    month_pos = {m: j for j, m in enumerate(months)}
+    cube = np.full((len(companies), len(months), len(METRIC_NAMES)), np.nan)
+    cells = [(i, month_pos[month], values) for i, company in enumerate(companies)
+             for month, values in data[company].items()]
+    if cells:
+        rows, cols, values = zip(*cells)
+        # 一次转换为数组后整体写入，None转为NaN
+        cube[list(rows), list(cols)] = np.array([[v.get(name) for name in METRIC_NAMES] for v in values], dtype=float)
+    return companies, months, cube
+
+
+def _div(a, b):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(b != 0, a / b, np.nan)
+
+
+def _growth(x):
+    """沿月份轴（最后一维）较前一期的增长率，以前一期的绝对值为基数"""
+    out = np.full(x.shape, np.nan)
+    prev = x[..., :-1]
+    out[..., 1:] = _div(x[..., 1:] - prev, np.abs(prev))
+    return out
+
+
+def compute_ratios(cube):
+    """对 数组[公司, 月份, 指标] 一次性计算全部比率，返回 {比率名: 数组[公司, 月份]}，无法计算的为NaN"""
+    m = {name: cube[..., k] for name, k in _INDEX.items()}
+    revenue = np.where(np.isnan(m['营业收入']), m['营业总收入'], m['营业收入'])
+    return {
+        '毛利率': _div(revenue - m['营业成本'], revenue),
+        '营业利润率': _div(m['营业利润'], revenue),
+        '净利润率': _div(m['净利润'], revenue),
+        '流动比率': _div(m['流动资产合计'], m['流动负债合计']),
+        '速动比率': _div(m['流动资产合计'] - m['存货'], m['流动负债合计']),
+        '现金比率': _div(m['货币资金'], m['流动负债合计']),
+        '资产负债率': _div(m['负债合计'], m['资产合计']),
+        '权益乘数': _div(m['资产合计'], m['所有者权益合计']),
+        'ROE': _div(m['净利润'], m['所有者权益合计']),
+        'ROA': _div(m['净利润'], m['资产合计']),
+        '净现比': _div(m['经营现金流'], m['净利润']),
+        '收入增长率': _growth(revenue),
+        '净利润增长率': _growth(m['净利润']),
+    }
+
+
+def to_lists(array, digits=4):
+    """数组转为嵌套列表，NaN为None，便于jsonify"""
+    rounded = np.round(array, digits)
+    return np.where(np.isnan(rounded), None, rounded).tolist()
@@ -0,0 +1,177 @@
+import re
+from datetime import date, datetime
+
+import pandas as pd
+
+from account_taxonomy import accounts
+from statement_tables import HEADER_SCAN_ROWS
+
+# 标准指标：(指标名, 所属报表)，按输出顺序排列；指标名是 config.ACCOUNT_SYNONYMS 中的标准科目，
+# 报表中的科目名（去掉序号、“其中：”等前缀和单位后）统一由 account_taxonomy.accounts 归并
+METRICS = [
+    ('营业总收入', '利润表'),
+    ('营业收入', '利润表'),
+    ('营业成本', '利润表'),
+    ('营业利润', '利润表'),
+    ('利润总额', '利润表'),
+    ('净利润', '利润表'),
+    ('归母净利润', '利润表'),
+    ('货币资金', '资产负债表'),
+    ('存货', '资产负债表'),
+    ('流动资产合计', '资产负债表'),
+    ('资产合计', '资产负债表'),
+    ('流动负债合计', '资产负债表'),
+    ('负债合计', '资产负债表'),
+    ('所有者权益合计', '资产负债表'),
+    ('经营现金流', '现金流量表'),
+    ('投资现金流', '现金流量表'),
+    ('筹资现金流', '现金流量表'),
+    ('现金净增加额', '现金流量表'),
+    ('期末现金余额', '现金流量表'),
+]
+METRIC_NAMES = [name for name, _ in METRICS]
+_KINDS = dict(METRICS)
+
+# 科目名前的标记与序号：*、一、（一）、1、其中：加：减：
+_LABEL_PREFIX = re.compile(r'^[*＊\s]*(?:[一二三四五六七八九十]+、|[（(][一二三四五六七八九十]+[)）]|\d+[、.．])?\s*'
+                           r'(?:(?:其中|加|减)[:：])?\s*')
+_LABEL_UNIT = re.compile(r'[（(](元|千元|万元|百万元|亿元)[)）]\s*$')
+_UNIT_SCALE = {'元': 1, '千元': 1e3, '万元': 1e4, '百万元': 1e6, '亿元': 1e8}
+_DATE_RE = re.compile(r'(\d{4})\s*[-/.年]\s*(\d{1,2})')
+
+
+def clean_label(value):
+    """科目名去掉前缀标记和单位，返回 (科目名, 单位换算倍数)"""
+    text = re.sub(r'\s+', '', str(value))
+    scale = 1
+    m = _LABEL_UNIT.search(text)
+    if m:
+        scale = _UNIT_SCALE[m.group(1)]
+        text = text[:m.start()]
+    return _LABEL_PREFIX.sub('', text), scale
+
+
+def to_number(value):
+    """单元格转为数值：'--'、空白等返回None，支持千分位和括号表示的负数"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if pd.isna(value) else value
+    text = str(value).strip().replace(',', '').replace('，', '')
+    negative = text.startswith(('(', '（')) and text.endswith((')', '）'))
+    if negative:
+        text = text[1:-1]
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return -number if negative else number
+
+
+def cell_month(value):
+    """表头单元格中的日期转为YYYY-MM，不是日期返回None"""
+    if isinstance(value, (datetime, date)):
+        return f'{value.year:04d}-{value.month:02d}'
+    m = _DATE_RE.search(str(value)) if isinstance(value, str) else None
+    if m and 1 <= int(m.group(2)) <= 12:
+        return f'{m.group(1)}-{int(m.group(2)):02d}'
+    return None
+
+
+def normalize_sheet(raw, month):
+    """识别一张利润表/资产负债表/现金流量表（科目在一列、金额在右侧列的版式），提取标准指标
+
+    raw为header=None读出的原始表格。金额列优先取表头日期与month相同的列，否则取科目列右侧第一个有数值的列。
+    返回 (报表类型, {指标名: 数值})，不是这种版式时返回 (None, {})。
+    科目名由account_taxonomy.accounts归并，科目列中没有一个科目名恰好是同义词时（如带编码的明细账）不算报表。
+    同一指标出现多次时（核心指标区与全部指标区）取第一个有值的；科目名就是指标名的行优先于恰好是其他同义词的行
+    （如“主营业务收入”），再优先于只是包含同义词的行；优先的行数值仍不相同（明细账等）的指标不采用。
+    """
+    if raw.empty:
+        return None, {}
+    rows = raw.astype(object).values.tolist()
+    # 科目列：能对上标准科目名最多的一列
+    best_col, best_hits = None, []
+    for j in range(raw.shape[1]):
+        hits = []
+        for i, row in enumerate(rows):
+            if isinstance(row[j], str):
+                label, scale = clean_label(row[j])
+                name = accounts.match(label)
+                if name in _KINDS:
+                    rank = 2 if label == name else int(accounts.exact(label) == name)
+                    hits.append((i, name, scale, rank))
+        if len(hits) > len(best_hits):
+            best_col, best_hits = j, hits
+    if not any(rank for _, _, _, rank in best_hits):
+        return None, {}
+    value_cols = [j for j in range(best_col + 1, raw.shape[1])
+                  if any(to_number(rows[i][j]) is not None for i, _, _, _ in best_hits)]
+    if not value_cols:
+        return None, {}
+    value_col = value_cols[0]
+    for j in value_cols:
+        if any(cell_month(row[j]) == month for row in rows[:HEADER_SCAN_ROWS]):
+            value_col = j
+            break
+    candidates = {}
+    kinds = {}
+    for i, name, scale, rank in best_hits:
+        number = to_number(rows[i][value_col])
+        if number is None:
+            continue
+        kinds[_KINDS[name]] = kinds.get(_KINDS[name], 0) + 1
+        candidates.setdefault(name, []).append((rank, number * scale))
+    values = {}
+    for name, found in candidates.items():
+        top = max(rank for rank, _ in found)
+        preferred = [number for rank, number in found if rank == top]
+        if len(set(preferred)) == 1:
+            values[name] = preferred[0]
+    if not values:
+        return None, {}
+    return max(kinds, key=kinds.get), values
+
+
+def statement_company(filename):
+    """从报表文件名推断公司名：去掉扩展名、括号注释、日期数字和报表类型，剩余为空时返回'默认'
+
+    如 '华为2024.9利润表（无时间）.xlsx' -> '华为'，'2024.12资产负债表.xlsx' -> '默认'。
+    """
+    stem = filename.rsplit('.', 1)[0] if '.' in filename else filename
+    stem = re.sub(r'[（(][^）)]*[）)]', '', stem)
+    stem = re.sub(r'合并|母公司|利润表|资产负债表|现金流量表|财务报表|报表', '', stem)
+    stem = re.sub(r'\d+\s*(?:年|月|日|季度)?|[Qq]\d|[-_.、\s]+', '', stem)
+    return stem or '默认'
+
+
+def merge_metrics(metrics, month, values):
+    """把一张报表的指标并入 metrics[月份]，已有值的指标不覆盖"""
+    target = metrics.setdefault(month, {})
+    for name, value in values.items():
+        if target.get(name) is None:
+            target[name] = value
+
+
+def _format_number(value):
+    if value is None:
+        return ''
+    if float(value).is_integer():
+        return str(int(value))
+    return f'{value:.2f}'.rstrip('0').rstrip('.')
+
+
+def metric_table_text(metrics):
+    """月份×指标的紧凑表格（CSV格式，金额单位为元），只包含至少有一个月有值的指标"""
+    months = sorted(metrics)
+    names = [n for n in METRIC_NAMES if any(metrics[m].get(n) is not None for m in months)]
+    lines = [','.join(['月份'] + names)]
+    for month in months:
+        lines.append(','.join([month] + [_format_number(metrics[month].get(n)) for n in names]))
+    return '\n'.join(lines)
+
+
+def table_text(df):
+    """未识别为标准报表的表格：去掉全空的行和列后按CSV输出，比to_string少了对齐用的空格"""
+    df = df.dropna(how='all').dropna(axis=1, how='all')
+    return df.to_csv(index=False).strip()
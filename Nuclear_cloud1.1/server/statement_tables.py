@@ -0,0 +1,77 @@
+import pandas as pd
+
+from account_taxonomy import header_roles
+
+# 表头自动检测：在前HEADER_SCAN_ROWS行内查找同时包含科目类和金额类表头词（config.HEADER_ROLE_SYNONYMS）的行
+HEADER_SCAN_ROWS = 6
+
+
+def detect_header_row(raw):
+    """raw为header=None读出的表格，返回表头所在行号，未找到返回None"""
+    for i in range(min(HEADER_SCAN_ROWS, len(raw))):
+        roles = set()
+        for value in raw.iloc[i].tolist():
+            roles |= header_roles.matches(str(value))
+        if 'subject' in roles and 'amount' in roles:
+            return i
+    return None
+
+
+def header_names(values):
+    """表头行的值转为列名，与pd.read_excel一致：空表头为Unnamed: n，重名加.n后缀"""
+    columns = []
+    seen = {}
+    for j, value in enumerate(values):
+        name = f'Unnamed: {j}' if pd.isna(value) else value
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def apply_header(raw, header_row):
+    """以第header_row行作为表头，结果与 pd.read_excel(header=header_row) 一致"""
+    df = raw.iloc[header_row + 1:].reset_index(drop=True)
+    df.columns = header_names(raw.iloc[header_row].tolist())
+    # header=None读出的列夹杂表头文字，去掉表头后重新推断数值类型
+    return df.infer_objects()
+
+
+def statement_header_row(sheet):
+    """列式副本中一个sheet的表头行：csv读取时已带表头返回None，未检测到表头时回退为首行（与pd.read_excel默认行为一致）"""
+    if sheet.header_fixed:
+        return None
+    header_row = detect_header_row(sheet.head)
+    return header_row if header_row is not None else 0
+
+
+def extract_amount_rows(df, subject_col, amount_col, date_col=None):
+    """向量化提取有金额的数据行，返回subject/amount/date三列的DataFrame
+
+    有效行的判定与逐行处理时一致：amount非空、不是空字符串，且为数值或字符串
+    """
+    amount = df[amount_col]
+    if pd.api.types.is_bool_dtype(amount) or pd.api.types.is_numeric_dtype(amount):
+        mask = amount.notna()
+    elif isinstance(amount.dtype, pd.StringDtype):
+        mask = amount.notna() & (amount != '')
+    elif amount.dtype == object:
+        # 混合类型列只能逐个判断类型，但不再为每行构造Series
+        mask = pd.Series([isinstance(v, (int, float, str)) and v != '' for v in amount.tolist()], index=df.index) & amount.notna()
+    else:
+        # 日期等其他类型的金额列不是有效金额
+        mask = pd.Series(False, index=df.index)
+    mask = mask.fillna(False).astype(bool)
+    return pd.DataFrame({
+        'subject': df[subject_col][mask],
+        'amount': amount[mask],
+        'date': df[date_col][mask] if date_col is not None else '',
+    }).reset_index(drop=True)
+
+
+def to_records(df, columns):
+    """等价于 df[columns].to_dict(orient='records')，按列tolist后拼装，百万行时快数倍"""
+    return [dict(zip(columns, values)) for values in zip(*(df[col].tolist() for col in columns))]
@@ -0,0 +1,62 @@
+import importlib.util
+
+import pandas as pd
+
+from config import EXCEL_ENGINES, CSV_ENGINES
+
+# 各Excel引擎能读取的文件类型，以及需要安装的包
+EXCEL_ENGINE_EXTS = {
+    'calamine': {'xlsx', 'xlsm', 'xls', 'xlsb', 'ods'},
+    'openpyxl': {'xlsx', 'xlsm'},
+    'xlrd': {'xls'},
+    'pyxlsb': {'xlsb'},
+    'odf': {'ods'},
+}
+ENGINE_PACKAGES = {
+    'calamine': 'python_calamine',
+    'openpyxl': 'openpyxl',
+    'xlrd': 'xlrd',
+    'pyxlsb': 'pyxlsb',
+    'odf': 'odf',
+    'pyarrow': 'pyarrow',
+}
+
+_available = {}
+
+
+def engine_available(engine):
+    package = ENGINE_PACKAGES.get(engine)
+    if package is None:
+        # pandas内置的csv引擎（c/python）
+        return True
+    if engine not in _available:
+        _available[engine] = importlib.util.find_spec(package) is not None
+    return _available[engine]
+
+
+def engines_for(ext):
+    """按配置顺序返回可用于该文件类型的已安装引擎"""
+    if ext == 'csv':
+        return [e for e in CSV_ENGINES if engine_available(e)]
+    return [e for e in EXCEL_ENGINES if ext in EXCEL_ENGINE_EXTS.get(e, ()) and engine_available(e)]
+
+
+def read_spreadsheet(source, ext, **kwargs):
+    """读取csv/Excel：按配置的引擎顺序尝试，引擎不支持该文件或参数（如pyarrow不支持nrows）时回退到下一个
+
+    source可以是路径或可seek的文件对象；所有引擎都失败时抛出最后一个错误。
+    """
+    reader = pd.read_csv if ext == 'csv' else pd.read_excel
+    engines = engines_for(ext)
+    if not engines:
+        return reader(source, **kwargs)
+    start = source.tell() if hasattr(source, 'seek') else None
+    last_error = None
+    for engine in engines:
+        if start is not None:
+            source.seek(start)
+        try:
+            return reader(source, engine=engine, **kwargs)
+        except Exception as e:
+            last_error = e
+    raise last_error
@@ -0,0 +1,83 @@
+import os
+
+import openpyxl
+import pandas as pd
+
+from statement_tables import apply_header
+from table_engines import read_spreadsheet
+
+# 预览只读取表头和前PREVIEW_ROWS行，内存占用与预览大小成正比，与文件大小无关
+PREVIEW_ROWS = 100
+# 估算CSV总行数时采样的字节数
+ROW_COUNT_SAMPLE_BYTES = 64 * 1024
+
+
+def _stream_size(stream):
+    pos = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(pos)
+    return size
+
+
+def estimate_csv_rows(stream):
+    """按开头一段的平均行长估算CSV数据行数（不含表头）；文件不超过采样大小时为精确值"""
+    size = _stream_size(stream)
+    pos = stream.tell()
+    sample = stream.read(ROW_COUNT_SAMPLE_BYTES)
+    stream.seek(pos)
+    if not sample:
+        return 0
+    lines = sample.count(b'\n') + (0 if sample.endswith(b'\n') else 1)
+    if len(sample) >= size:
+        return max(lines - 1, 0)
+    return max(int(size / (len(sample) / max(lines, 1))) - 1, 0)
+
+
+def preview_csv(stream, nrows=PREVIEW_ROWS):
+    """返回 [(None, DataFrame, 估算总行数)]，只解析前nrows行"""
+    total = estimate_csv_rows(stream)
+    df = read_spreadsheet(stream, 'csv', nrows=nrows)
+    return [(None, df, max(total, len(df)))]
+
+
+def preview_xlsx(stream, nrows=PREVIEW_ROWS):
+    """openpyxl只读模式逐行读取各sheet的表头和前nrows行，返回 [(sheet名, DataFrame, 估算总行数)]
+
+    总行数取自工作表的dimension信息（无需遍历全表），缺失时为None。
+    """
+    wb = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        sheets = []
+        for ws in wb.worksheets:
+            rows = []
+            truncated = False
+            for row in ws.iter_rows(values_only=True):
+                if len(rows) > nrows:
+                    truncated = True
+                    break
+                rows.append(row)
+            # 与pd.read_excel一致：去掉表尾的全空行和右侧的全空列
+            if not truncated:
+                while rows and all(v is None for v in rows[-1]):
+                    rows.pop()
+            width = max((i + 1 for row in rows for i, v in enumerate(row) if v is not None), default=0)
+            if not rows or not width:
+                sheets.append((ws.title, pd.DataFrame(), 0))
+                continue
+            df = apply_header(pd.DataFrame([row[:width] for row in rows]), 0)
+            total = ws.max_row - 1 if ws.max_row else None
+            sheets.append((ws.title, df, max(total, len(df)) if total is not None else None))
+        return sheets
+    finally:
+        wb.close()
+
+
+def preview_table(stream, ext, nrows=PREVIEW_ROWS):
+    """直接从上传流（或其spool缓冲）读取表格预览，不落临时文件"""
+    if ext == 'csv':
+        return preview_csv(stream, nrows)
+    if ext == 'xlsx':
+        return preview_xlsx(stream, nrows)
+    # xls没有流式读取方式，仍按行数限制读取
+    return [(name, df, None) for name, df in read_spreadsheet(stream, ext, sheet_name=None, nrows=nrows).items()]
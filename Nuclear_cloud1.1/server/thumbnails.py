@@ -0,0 +1,33 @@
+import os
+import uuid
+
+from PIL import Image, ImageOps
+
+
+def thumbnail_path(path, size):
+    """图片的缩略图（长边不超过size像素），首次请求时生成并保存在原文件旁，之后直接返回已生成的文件
+
+    返回 (缩略图路径, mimetype)：带透明通道的图片为PNG，其余为JPEG。
+    """
+    for ext, mimetype in (('jpg', 'image/jpeg'), ('png', 'image/png')):
+        out = f'{path}.thumb{size}.{ext}'
+        if os.path.exists(out):
+            return out, mimetype
+    with Image.open(path) as img:
+        # JPEG可以直接按缩小的比例解码，大照片不必完整解码
+        img.draft('RGB', (size, size))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)
+        alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        ext, fmt, mimetype = ('png', 'PNG', 'image/png') if alpha else ('jpg', 'JPEG', 'image/jpeg')
+        if not alpha and img.mode != 'RGB':
+            img = img.convert('RGB')
+        out = f'{path}.thumb{size}.{ext}'
+        tmp = f'{out}.{uuid.uuid4().hex}.tmp'
+        try:
+            img.save(tmp, fmt, quality=85) if fmt == 'JPEG' else img.save(tmp, fmt)
+            os.replace(tmp, out)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return out, mimetype
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+
+
+class UploadStore:
+    """内容寻址的上传文件存储
+
+    文件内容按SHA-256命名，分两级目录存放在 root/<h[:2]>/<h[2:4]>/<h>，相同内容只存一份；
+    引用计数和逻辑文件名映射保存在SQLite：
+      upload_blobs  每个内容块的大小与引用计数，计数归零时删除磁盘文件及其派生文件
+      upload_files  (owner, scope, name) -> 内容块，owner为用户ID，scope为月份/会话等分组
+    重复上传已有内容只需计算一次哈希、写一行映射，不再产生新的磁盘副本。
+    派生文件（列式副本、缩略图等）放在内容块旁，命名为 <h>.<后缀>。
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, db_path, root):
+        self.db_path = db_path
+        self.root = root
+        self._tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''CREATE TABLE IF NOT EXISTS upload_blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                refcount INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            )''')
+            c.execute('''CREATE TABLE IF NOT EXISTS upload_files (
+                owner TEXT NOT NULL,
+                scope TEXT NOT NULL,
+                name TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (owner, scope, name)
+            )''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_upload_files_hash ON upload_files (hash)')
+            conn.commit()
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def _connect(self):
+        # isolation_level=None后手动BEGIN IMMEDIATE，保证引用计数增减与磁盘文件的放置/删除互斥
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _spool(self, stream):
+        """边读边算哈希写入临时文件，返回 (hash, size, 临时文件路径)"""
+        sha = hashlib.sha256()
+        size = 0
+        tmp_path = os.path.join(self._tmp_dir, uuid.uuid4().hex)
+        with open(tmp_path, 'wb') as out:
+            while True:
+                chunk = stream.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        return sha.hexdigest(), size, tmp_path
+
+    def _remove_derived(self, digest):
+        folder = os.path.dirname(self.blob_path(digest))
+        try:
+            names = os.listdir(folder)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.startswith(digest + '.'):
+                continue
+            derived = os.path.join(folder, name)
+            if os.path.isdir(derived):
+                shutil.rmtree(derived, ignore_errors=True)
+            else:
+                try:
+                    os.remove(derived)
+                except FileNotFoundError:
+                    pass
+
+    def _decref(self, c, digest):
+        c.execute('UPDATE upload_blobs SET refcount=refcount-1 WHERE hash=?', (digest,))
+        c.execute('SELECT refcount FROM upload_blobs WHERE hash=?', (digest,))
+        row = c.fetchone()
+        if row and row[0] <= 0:
+            c.execute('DELETE FROM upload_blobs WHERE hash=?', (digest,))
+            try:
+                os.remove(self.blob_path(digest))
+            except FileNotFoundError:
+                pass
+            self._remove_derived(digest)
+
+    def put(self, owner, scope, name, stream):
+        """保存上传内容（任意带read()的对象，如FileStorage.stream），同名文件会被替换，返回内容哈希"""
+        digest, size, tmp_path = self._spool(stream)
+        now = time.time()
+        conn = self._connect()
+        try:
+            c = conn.cursor()
+            c.execute('BEGIN IMMEDIATE')
+            try:
+                path = self.blob_path(digest)
+                if os.path.exists(path):
+                    os.remove(tmp_path)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)
+                c.execute('SELECT hash FROM upload_files WHERE owner=? AND scope=? AND name=?',
+                          (str(owner), scope, name))
+                row = c.fetchone()
+                if row and row[0] == digest:
+                    # 内容未变化，只刷新时间
+                    c.execute('UPDATE upload_files SET created_at=? WHERE owner=? AND scope=? AND name=?',
+                              (now, str(owner), scope, name))
+                else:
+                    c.execute('''INSERT INTO upload_blobs (hash, size, refcount, created_at) VALUES (?, ?, 1, ?)
+                                 ON CONFLICT(hash) DO UPDATE SET refcount=refcount+1''', (digest, size, now))
+                    c.execute('''INSERT OR REPLACE INTO upload_files (owner, scope, name, hash, size, created_at)
+                                 VALUES (?, ?, ?, ?, ?, ?)''', (str(owner), scope, name, digest, size, now))
+                    if row:
+                        self._decref(c, row[0])
+                c.execute('COMMIT')
+            except Exception:
+                c.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest
+
+    def path(self, owner, scope, name):
+        """逻辑文件名对应的磁盘路径，不存在时返回None"""
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('SELECT hash FROM upload_files WHERE owner=? AND scope=? AND name=?',
+                      (str(owner), scope, name))
+            row = c.fetchone()
+        return self.blob_path(row[0]) if row else None
+
+    def list(self, owner, scope):
+        """某个分组下的文件：[{'name', 'size', 'path'}]，按上传顺序"""
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''SELECT name, size, hash FROM upload_files WHERE owner=? AND scope=?
+                         ORDER BY created_at''', (str(owner), scope))
+            rows = c.fetchall()
+        return [{'name': name, 'size': size, 'path': self.blob_path(digest)} for name, size, digest in rows]
+
+    def scopes(self, owner, prefix=''):
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''SELECT DISTINCT scope FROM upload_files WHERE owner=? AND substr(scope, 1, ?)=?
+                         ORDER BY scope''', (str(owner), len(prefix), prefix))
+            return [row[0] for row in c.fetchall()]
+
+    def _delete_where(self, where, args):
+        conn = self._connect()
+        try:
+            c = conn.cursor()
+            c.execute('BEGIN IMMEDIATE')
+            try:
+                c.execute(f'SELECT hash FROM upload_files WHERE {where}', args)
+                hashes = [row[0] for row in c.fetchall()]
+                c.execute(f'DELETE FROM upload_files WHERE {where}', args)
+                for digest in hashes:
+                    self._decref(c, digest)
+                c.execute('COMMIT')
+            except Exception:
+                c.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+        return len(hashes)
+
+    def delete(self, owner, scope, name):
+        """删除一个逻辑文件，返回是否存在"""
+        return self._delete_where('owner=? AND scope=? AND name=?', (str(owner), scope, name)) > 0
+
+    def delete_scope(self, owner, prefix):
+        """删除scope以prefix开头的所有逻辑文件，返回删除的文件数"""
+        return self._delete_where('owner=? AND substr(scope, 1, ?)=?', (str(owner), len(prefix), prefix))
+
+    def stats(self):
+        with sqlite3.connect(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM upload_files')
+            files, logical_bytes = c.fetchone()
+            c.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM upload_blobs')
+            blobs, stored_bytes = c.fetchone()
+        return {
+            'files': files,
+            'blobs': blobs,
+            'logical_bytes': logical_bytes,
+            'stored_bytes': stored_bytes,
+        }
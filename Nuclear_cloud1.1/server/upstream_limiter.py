@@ -0,0 +1,127 @@
+import random
+import threading
+import time
+
+
+class UpstreamBusy(Exception):
+    """上游排队已满或排队超时，retry_after为建议客户端重试的秒数"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'上游服务繁忙，请{retry_after}秒后重试')
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """令牌桶：平均每秒rate个请求，最多允许burst个突发"""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class UpstreamLimiter:
+    """包在所有上游调用外层：全局并发信号量 + 令牌桶 + 429/5xx抖动指数退避重试
+
+    排队人数超过max_queue或等待超过queue_timeout时立即抛出UpstreamBusy，
+    由接口层转换为带Retry-After的503。
+    """
+
+    def __init__(self, max_concurrency=8, rate=5, burst=10, max_queue=50, queue_timeout=30,
+                 max_retries=3, backoff_base=1, backoff_max=30):
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(rate, burst)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def _retry_hint(self):
+        return max(1, int(self.queue_timeout / 2))
+
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+        raise UpstreamBusy(self._retry_hint())
+
+    def _backoff(self, attempt, resp):
+        # 优先遵循上游的Retry-After（秒数形式），否则full jitter指数退避
+        retry_after = resp.headers.get('Retry-After') if resp is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def call(self, send):
+        """send() 发起一次上游请求并返回response；遇到429/5xx按退避策略重试"""
+        deadline = time.monotonic() + self.queue_timeout
+        if not self._semaphore.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    raise UpstreamBusy(self._retry_hint())
+                self.waiting += 1
+            try:
+                acquired = self._semaphore.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                self._reject()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            attempt = 0
+            while True:
+                if not self._bucket.acquire(deadline):
+                    self._reject()
+                resp = send()
+                if (resp.status_code == 429 or resp.status_code >= 500) and attempt < self.max_retries:
+                    delay = self._backoff(attempt, resp)
+                    print(f'DeepSeek返回{resp.status_code}，{delay:.1f}秒后第{attempt + 1}次重试')
+                    resp.close()
+                    with self._lock:
+                        self.retries += 1
+                    time.sleep(delay)
+                    attempt += 1
+                    # 每次重试重新计算等待令牌的截止时间
+                    deadline = time.monotonic() + self.queue_timeout
+                    continue
+                return resp
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'retries': self.retries,
+                'rejected': self.rejected,
+            }